@@ -0,0 +1,78 @@
+import os
+import logging
+import tempfile
+
+import requests
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = (10, 300)
+
+
+def stream_asset(asset, file, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Streams an asset from its presigned download URI into an open binary file.
+
+    Args:
+        asset (Asset): The job result asset; must have a download URI.
+        file (file): Destination, written from its current position.
+        chunk_size (int): Bytes per read from the HTTP response.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    written = 0
+    with requests.get(asset.get_download_uri(), stream=True, timeout=DOWNLOAD_TIMEOUT) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            file.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def write_content(pdf_services, asset, file):
+    """Writes an asset read whole through ``pdf_services.get_content``; returns the bytes written."""
+    content = pdf_services.get_content(asset).get_input_stream()
+    file.write(content)
+    return len(content)
+
+
+def download_asset(pdf_services, asset, output_path, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Streams a result asset to ``output_path`` in fixed-size chunks.
+
+    Result assets of PDF Services jobs carry a presigned download URI, which is read
+    with a streaming GET so only one chunk is held in memory at a time. A client with a
+    ``download`` method (``ScheduledPDFServices``) runs that GET under its retry policy
+    and rate budget. The file is written next to the destination and renamed into place,
+    so an interrupted download never leaves a truncated ZIP or PDF behind. Assets without
+    a download URI fall back to ``pdf_services.get_content``.
+
+    Args:
+        pdf_services (PDFServices): Client that produced the asset.
+        asset (Asset): The job result asset.
+        output_path (str): Destination file.
+        chunk_size (int): Bytes per read from the HTTP response.
+
+    Returns:
+        int: Number of bytes written.
+    """
+    download_uri = asset.get_download_uri() if hasattr(asset, 'get_download_uri') else None
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            if not download_uri:
+                logging.debug("Asset has no download URI, falling back to get_content")
+                written = write_content(pdf_services, asset, file)
+            elif hasattr(pdf_services, 'download'):
+                written = pdf_services.download(asset, file, chunk_size)
+            else:
+                written = stream_asset(asset, file, chunk_size)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return written
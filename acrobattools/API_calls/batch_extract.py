@@ -0,0 +1,168 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from functools import partial
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from simpletext_extract import create_pdf_services, extract_text_from_pdf
+from extraction_cache import ExtractionCache
+from extraction_profiles import DEFAULT_PROFILE, PROFILES, get_extract_params
+from job_scheduler import JobState, RateBudget, RetryPolicy, ScheduledPDFServices
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def collect_inputs(source, output_dir):
+    """
+    Builds the list of (input_pdf, output_zip) pairs for a batch run.
+
+    Args:
+        source (str): A directory containing PDFs, or a manifest file with one entry per
+            line in the form ``input.pdf`` or ``input.pdf,output.zip``. Blank lines and
+            lines starting with ``#`` are ignored.
+        output_dir (str): Directory for ZIPs that have no explicit output in the manifest.
+
+    Returns:
+        list[tuple[str, str]]: The extraction jobs in a stable order.
+    """
+    jobs = []
+
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            if name.lower().endswith('.pdf'):
+                input_pdf = os.path.join(source, name)
+                output_zip = os.path.join(output_dir, os.path.splitext(name)[0] + '.zip')
+                jobs.append((input_pdf, output_zip))
+        return jobs
+
+    manifest_dir = os.path.dirname(os.path.abspath(source))
+    with open(source, 'r', encoding='utf-8') as manifest:
+        for line in manifest:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            parts = [part.strip() for part in line.split(',')]
+            input_pdf = os.path.join(manifest_dir, parts[0])
+            if len(parts) > 1 and parts[1]:
+                output_zip = os.path.join(output_dir, parts[1])
+            else:
+                stem = os.path.splitext(os.path.basename(input_pdf))[0]
+                output_zip = os.path.join(output_dir, stem + '.zip')
+            jobs.append((input_pdf, output_zip))
+
+    return jobs
+
+
+def extract_batch(jobs, max_workers=4, pdf_services=None, extract_fn=extract_text_from_pdf, state=None):
+    """
+    Runs many extractions with one shared client and at most ``max_workers`` jobs in flight.
+
+    Each ZIP is written by its worker as soon as its job finishes, so a slow document
+    does not hold back the others.
+
+    Args:
+        jobs (list[tuple[str, str]]): (input_pdf, output_zip) pairs, see ``collect_inputs``.
+        max_workers (int): Number of concurrent upload/submit/poll/download cycles.
+        pdf_services (PDFServices, optional): Client to share between jobs. Created from
+            the environment credentials when omitted.
+        extract_fn (callable): Single-document extraction with the signature of
+            ``extract_text_from_pdf``.
+        state (JobState, optional): Records every outcome; jobs it already holds as done
+            are skipped, so an interrupted batch resumes where it stopped.
+
+    Returns:
+        dict: Summary with per-job results (including per-call timings when the client
+        is a ``ScheduledPDFServices``), total wall time and throughput in jobs/sec.
+    """
+    if pdf_services is None:
+        pdf_services = create_pdf_services()
+
+    skipped = 0
+    if state is not None:
+        pending = [job for job in jobs if not state.is_done(*job)]
+        skipped = len(jobs) - len(pending)
+        if skipped:
+            logging.info(f"Resuming: {skipped} of {len(jobs)} jobs already done")
+        jobs = pending
+
+    for _, output_zip in jobs:
+        output_parent = os.path.dirname(output_zip)
+        if output_parent:
+            os.makedirs(output_parent, exist_ok=True)
+
+    job_timings = getattr(pdf_services, 'job_timings', nullcontext)
+
+    def run_job(input_pdf, output_zip):
+        started = time.perf_counter()
+        with job_timings() as timings:
+            ok = extract_fn(input_pdf, output_zip, pdf_services=pdf_services)
+        seconds = time.perf_counter() - started
+        if state is not None:
+            state.record(input_pdf, output_zip, ok, seconds=seconds, timings=timings)
+        return ok, seconds, timings
+
+    results = []
+    batch_started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_job, input_pdf, output_zip): (input_pdf, output_zip)
+                   for input_pdf, output_zip in jobs}
+        for future in as_completed(futures):
+            input_pdf, output_zip = futures[future]
+            ok, seconds, timings = future.result()
+            results.append({'input': input_pdf, 'output': output_zip, 'ok': ok, 'seconds': seconds,
+                            'timings': timings})
+            logging.info(f"[{len(results)}/{len(jobs)}] {'done' if ok else 'FAILED'} "
+                         f"{os.path.basename(input_pdf)} in {seconds:.2f}s")
+
+    wall_seconds = time.perf_counter() - batch_started
+    succeeded = sum(1 for result in results if result['ok'])
+
+    return {
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'skipped': skipped,
+        'wall_seconds': wall_seconds,
+        'jobs_per_sec': len(results) / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract many PDFs concurrently with Adobe PDF Services.")
+    parser.add_argument("source", help="Directory of PDFs or manifest file (input.pdf[,output.zip] per line)")
+    parser.add_argument("-o", "--output-dir", default="extracted", help="Directory for the result ZIPs")
+    parser.add_argument("-j", "--jobs", type=int, default=4, help="Number of extraction jobs in flight")
+    parser.add_argument("--profile", choices=list(PROFILES), default=DEFAULT_PROFILE,
+                        help="Extraction profile (see extraction_profiles.py)")
+    parser.add_argument("--cache-dir", help="Reuse results of unchanged PDFs from this directory")
+    parser.add_argument("--cache-max-mb", type=int, default=2048, help="Size cap of the result cache")
+    parser.add_argument("--retries", type=int, default=5, help="Attempts per PDF Services call")
+    parser.add_argument("--rate-per-minute", type=int, help="Cap on PDF Services calls per minute")
+    parser.add_argument("--state", help="Job state file; rerun with the same file to resume a batch")
+    args = parser.parse_args()
+
+    batch_jobs = collect_inputs(args.source, args.output_dir)
+    if not batch_jobs:
+        logging.error(f"No PDFs found in {args.source}")
+        sys.exit(1)
+
+    cache = ExtractionCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024) if args.cache_dir else None
+    scheduled_services = ScheduledPDFServices(
+        create_pdf_services(), retry_policy=RetryPolicy(max_attempts=args.retries),
+        rate_budget=RateBudget(args.rate_per_minute) if args.rate_per_minute else None)
+    summary = extract_batch(batch_jobs, max_workers=args.jobs, pdf_services=scheduled_services,
+                            extract_fn=partial(extract_text_from_pdf, cache=cache,
+                                               extract_pdf_params=get_extract_params(args.profile)),
+                            state=JobState(args.state) if args.state else None)
+
+    logging.info(f"Batch finished: {summary['succeeded']} succeeded, {summary['failed']} failed, "
+                 f"{summary['skipped']} skipped, "
+                 f"{summary['wall_seconds']:.1f}s wall, {summary['jobs_per_sec']:.2f} jobs/sec")
+    logging.info(f"PDF Services calls: {scheduled_services.stats()}")
+    if cache is not None:
+        logging.info(f"Extraction cache: {cache.stats()}")
+    sys.exit(0 if summary['failed'] == 0 else 1)
@@ -0,0 +1,104 @@
+import os
+import sys
+import math
+import logging
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from doc_pipeline import convert_and_extract
+from doc_to_pdf import convert_doc_to_pdf
+from fake_pdf_services import FakePDFServices
+from simpletext_extract import extract_text_from_pdf
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from bench_util import format_header, format_row, timed
+
+COLUMNS = [("operation", "<24"), ("jobs", ">6"), ("failed", ">8"), ("jobs/sec", ">10.2f"), ("p50 (s)", ">10.3f"),
+           ("p95 (s)", ">10.3f")]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers (0 for an empty list)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100.0 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def run_benchmark(name, operation, inputs, work_dir, concurrency):
+    """
+    Runs ``operation(input_path, output_path)`` once per input and measures each call end to end.
+
+    Returns:
+        dict: Jobs/sec, p50/p95 latency in seconds and the failure count.
+    """
+    def timed_job(index, input_path):
+        return timed(operation, input_path, os.path.join(work_dir, f"{name}_{index}.out"))
+
+    def run_all():
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(timed_job, range(len(inputs)), inputs))
+
+    outcomes, wall_seconds = timed(run_all)
+
+    latencies = [seconds for ok, seconds in outcomes if ok]
+    return {
+        'name': name,
+        'jobs': len(inputs),
+        'failed': sum(1 for ok, _ in outcomes if not ok),
+        'jobs_per_sec': len(inputs) / wall_seconds if wall_seconds > 0 else 0.0,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+    }
+
+
+def make_inputs(work_dir, extension, count, size_kb):
+    """Writes ``count`` dummy input files of ``size_kb`` KiB; the fake service does not parse them."""
+    paths = []
+    for index in range(count):
+        path = os.path.join(work_dir, f"input_{index}{extension}")
+        with open(path, 'wb') as file:
+            file.write(os.urandom(size_kb * 1024))
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingestion throughput against the local fake PDF Services.")
+    parser.add_argument("-n", "--jobs", type=int, default=20, help="Documents per benchmark")
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="Jobs in flight")
+    parser.add_argument("--input-kb", type=int, default=512, help="Size of each dummy input document")
+    parser.add_argument("--upload-latency", type=float, default=0.05)
+    parser.add_argument("--processing-latency", type=float, default=0.5)
+    parser.add_argument("--download-latency", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Probability of an injected HTTP 500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as work_dir, FakePDFServices(
+            upload_latency=args.upload_latency, processing_latency=args.processing_latency,
+            download_latency=args.download_latency, failure_rate=args.failure_rate, seed=args.seed) as fake:
+        pdf_inputs = make_inputs(work_dir, '.pdf', args.jobs, args.input_kb)
+        doc_inputs = make_inputs(work_dir, '.docx', args.jobs, args.input_kb)
+
+        reports = [
+            run_benchmark('extract_text_from_pdf',
+                          lambda src, dst: extract_text_from_pdf(src, dst, pdf_services=fake),
+                          pdf_inputs, work_dir, args.concurrency),
+            run_benchmark('convert_doc_to_pdf',
+                          lambda src, dst: convert_doc_to_pdf(src, dst, pdf_services=fake),
+                          doc_inputs, work_dir, args.concurrency),
+            run_benchmark('convert_and_extract',
+                          lambda src, dst: convert_and_extract(src, dst, pdf_services=fake),
+                          doc_inputs, work_dir, args.concurrency),
+        ]
+
+        print(format_header(COLUMNS))
+        for report in reports:
+            print(format_row(COLUMNS, [report['name'], report['jobs'], report['failed'], report['jobs_per_sec'],
+                                       report['p50'], report['p95']]))
+        print(f"fake service counters: {fake.stats()}")
@@ -0,0 +1,84 @@
+import os
+import sys
+import logging
+import argparse
+
+from adobe.pdfservices.operation.exception.exceptions import ServiceApiException, ServiceUsageException, SdkException
+from adobe.pdfservices.operation.pdfjobs.jobs.create_pdf_job import CreatePDFJob
+from adobe.pdfservices.operation.pdfjobs.result.create_pdf_result import CreatePDFResult
+
+from asset_io import download_asset
+from doc_to_pdf import get_media_type
+from simpletext_extract import create_pdf_services, default_extract_params, run_extract_job
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def convert_and_extract(input_doc_path, output_zip_path, output_pdf_path=None, pdf_services=None,
+                        extract_pdf_params=None):
+    """
+    Converts a Word/Excel/PowerPoint document to PDF and extracts it in one service session.
+
+    The CreatePDFJob result asset is passed straight into the ExtractPDFJob, so the
+    document is uploaded once and only the extraction ZIP is downloaded. The
+    intermediate PDF is downloaded only when ``output_pdf_path`` is given.
+
+    Args:
+        input_doc_path (str): The document to convert (e.g. the eCRF specification .docx).
+        output_zip_path (str): The path where the extraction ZIP will be saved.
+        output_pdf_path (str, optional): Where to also save the converted PDF.
+        pdf_services (PDFServices, optional): An existing client to reuse.
+        extract_pdf_params (ExtractPDFParams, optional): Defaults to text-only extraction.
+
+    Returns:
+        bool: True if the ZIP (and the PDF, if requested) were written.
+    """
+    try:
+        media_type = get_media_type(input_doc_path)
+
+        if pdf_services is None:
+            pdf_services = create_pdf_services()
+        if extract_pdf_params is None:
+            extract_pdf_params = default_extract_params()
+
+        logging.info(f"Uploading {input_doc_path}...")
+        with open(input_doc_path, 'rb') as file:
+            input_asset = pdf_services.upload(file, media_type)
+
+        logging.info("Creating PDF...")
+        location = pdf_services.submit(CreatePDFJob(input_asset))
+        pdf_asset = pdf_services.get_job_result(location, CreatePDFResult).get_result().get_asset()
+
+        if output_pdf_path:
+            logging.info(f"Saving PDF to {output_pdf_path}...")
+            download_asset(pdf_services, pdf_asset, output_pdf_path)
+
+        logging.info("Extracting the converted PDF...")
+        run_extract_job(pdf_services, pdf_asset, extract_pdf_params, output_zip_path)
+
+        logging.info(f"Successfully converted and extracted. Output saved to: {output_zip_path}")
+        return True
+
+    except (ServiceApiException, ServiceUsageException, SdkException) as e:
+        logging.error(f"Adobe PDF Services error: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"An error occurred: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a document to PDF and extract it without re-uploading.")
+    parser.add_argument("input_doc", help="Word, Excel, PowerPoint, text or RTF document")
+    parser.add_argument("output_zip", nargs="?", help="Extraction ZIP (default: <input basename>.zip)")
+    parser.add_argument("--pdf", help="Also save the converted PDF to this path")
+    args = parser.parse_args()
+
+    output_zip = args.output_zip or os.path.splitext(args.input_doc)[0] + ".zip"
+    success = convert_and_extract(args.input_doc, output_zip, output_pdf_path=args.pdf)
+
+    if success:
+        print("✅ Document conversion and extraction completed successfully!")
+    else:
+        print("❌ Document conversion and extraction failed!")
+    sys.exit(0 if success else 1)
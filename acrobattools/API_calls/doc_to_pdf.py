@@ -7,48 +7,60 @@ from adobe.pdfservices.operation.pdf_services_media_type import PDFServicesMedia
 from adobe.pdfservices.operation.pdfjobs.jobs.create_pdf_job import CreatePDFJob
 from adobe.pdfservices.operation.pdfjobs.result.create_pdf_result import CreatePDFResult
 
+from asset_io import download_asset
+
 logging.basicConfig(level=logging.INFO)
 
 
-def convert_doc_to_pdf(input_doc_path, output_pdf_path):
+def get_media_type(input_doc_path):
+    """
+    Map a document's file extension to its PDF Services media type.
+    """
+    file_extension = os.path.splitext(input_doc_path)[1].lower()
+
+    if file_extension == '.docx':
+        return PDFServicesMediaType.DOCX
+    elif file_extension == '.doc':
+        return PDFServicesMediaType.DOC
+    elif file_extension == '.xlsx':
+        return PDFServicesMediaType.XLSX
+    elif file_extension == '.xls':
+        return PDFServicesMediaType.XLS
+    elif file_extension == '.pptx':
+        return PDFServicesMediaType.PPTX
+    elif file_extension == '.ppt':
+        return PDFServicesMediaType.PPT
+    elif file_extension == '.txt':
+        return PDFServicesMediaType.TXT
+    elif file_extension == '.rtf':
+        return PDFServicesMediaType.RTF
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}")
+
+
+def convert_doc_to_pdf(input_doc_path, output_pdf_path, pdf_services=None):
     """
     Convert a document (Word, Excel, PowerPoint) to PDF using Adobe PDF Services API.
+
+    An existing PDFServices client can be passed in to avoid re-authenticating for every document.
     """
     try:
-        # Load credentials from environment variables
-        client_id = os.getenv("PDF_SERVICES_CLIENT_ID")
-        client_secret = os.getenv("PDF_SERVICES_CLIENT_SECRET")
+        if pdf_services is None:
+            # Load credentials from environment variables
+            client_id = os.getenv("PDF_SERVICES_CLIENT_ID")
+            client_secret = os.getenv("PDF_SERVICES_CLIENT_SECRET")
 
-        if not client_id or not client_secret:
-            raise ValueError("PDF_SERVICES_CLIENT_ID and PDF_SERVICES_CLIENT_SECRET environment variables must be set.")
+            if not client_id or not client_secret:
+                raise ValueError("PDF_SERVICES_CLIENT_ID and PDF_SERVICES_CLIENT_SECRET environment variables must be set.")
 
-        # Create credentials
-        credentials = ServicePrincipalCredentials(client_id, client_secret)
+            # Create credentials
+            credentials = ServicePrincipalCredentials(client_id, client_secret)
 
-        # Create PDF Services instance
-        pdf_services = PDFServices(credentials)
+            # Create PDF Services instance
+            pdf_services = PDFServices(credentials)
 
         # Determine media type based on file extension
-        file_extension = os.path.splitext(input_doc_path)[1].lower()
-
-        if file_extension == '.docx':
-            media_type = PDFServicesMediaType.DOCX
-        elif file_extension == '.doc':
-            media_type = PDFServicesMediaType.DOC
-        elif file_extension == '.xlsx':
-            media_type = PDFServicesMediaType.XLSX
-        elif file_extension == '.xls':
-            media_type = PDFServicesMediaType.XLS
-        elif file_extension == '.pptx':
-            media_type = PDFServicesMediaType.PPTX
-        elif file_extension == '.ppt':
-            media_type = PDFServicesMediaType.PPT
-        elif file_extension == '.txt':
-            media_type = PDFServicesMediaType.TXT
-        elif file_extension == '.rtf':
-            media_type = PDFServicesMediaType.RTF
-        else:
-            raise ValueError(f"Unsupported file type: {file_extension}")
+        media_type = get_media_type(input_doc_path)
 
         # Upload the input document
         logging.info(f"Uploading {input_doc_path}...")
@@ -66,12 +78,9 @@ def convert_doc_to_pdf(input_doc_path, output_pdf_path):
         # Get result asset
         result_asset = pdf_services_response.get_result().get_asset()
 
-        # Download and save the result
+        # Stream the result to disk
         logging.info(f"Saving PDF to {output_pdf_path}...")
-        stream_asset = pdf_services.get_content(result_asset)
-
-        with open(output_pdf_path, "wb") as file:
-            file.write(stream_asset.get_input_stream())
+        download_asset(pdf_services, result_asset, output_pdf_path)
 
         logging.info(f"Successfully created PDF: {output_pdf_path}")
         return True
@@ -93,7 +102,6 @@ if __name__ == "__main__":
 
     input_path = sys.argv[1]
     output_path = sys.argv[2]
-    convert_doc_to_pdf(input_path, output_path)
     success = convert_doc_to_pdf(input_path, output_path)
 
     if success:
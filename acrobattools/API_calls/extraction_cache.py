@@ -0,0 +1,160 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path):
+    """
+    Computes the SHA-256 of a file without reading it into memory at once.
+
+    Args:
+        path (str): The file to hash.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def params_fingerprint(extract_pdf_params):
+    """
+    Serializes the ExtractPDFParams fields that change the extraction output.
+
+    Args:
+        extract_pdf_params (ExtractPDFParams): The parameters of the extraction job.
+
+    Returns:
+        str: A canonical JSON string; equal parameters give equal strings.
+    """
+    if extract_pdf_params is None:
+        return "null"
+
+    elements = extract_pdf_params.get_elements_to_extract()
+    renditions = extract_pdf_params.get_elements_to_extract_renditions()
+    tagged = extract_pdf_params.get_tag_encapsulated_text()
+    return json.dumps({
+        'elements': sorted(elements) if elements else None,
+        'renditions': sorted(renditions) if renditions else None,
+        'table_structure': str(extract_pdf_params.get_table_structure_type()),
+        'char_info': extract_pdf_params.get_add_char_info(),
+        'styling_info': extract_pdf_params.get_styling_info(),
+        'header_footer': extract_pdf_params.get_include_header_footer(),
+        'tag_encapsulated_text': sorted(tagged) if tagged else None,
+    }, sort_keys=True)
+
+
+class ExtractionCache:
+    """
+    On-disk, content-addressed store of Adobe extraction ZIPs.
+
+    Entries are keyed by the SHA-256 of the input PDF plus the extraction parameters,
+    so an unchanged protocol extracted with the same settings never goes back to the
+    service. The total size is capped; the least recently used entries are evicted
+    first (recency is tracked through the entry file's modification time, which a hit
+    refreshes).
+    """
+
+    def __init__(self, cache_dir, max_bytes=2 * 1024 ** 3):
+        """
+        Args:
+            cache_dir (str): Directory holding the cached ZIPs. Created if missing.
+            max_bytes (int): Size cap for all entries together.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, input_pdf_path, extract_pdf_params=None):
+        """
+        Builds the cache key for a PDF and its extraction parameters.
+
+        Returns:
+            str: Hex digest identifying the extraction result.
+        """
+        digest = hashlib.sha256()
+        digest.update(file_sha256(input_pdf_path).encode('ascii'))
+        digest.update(params_fingerprint(extract_pdf_params).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.zip")
+
+    def get(self, key, output_zip_path):
+        """
+        Copies a cached result to ``output_zip_path`` if present.
+
+        Returns:
+            bool: True on a cache hit, False on a miss.
+        """
+        entry = self._entry_path(key)
+        with self._lock:
+            if not os.path.exists(entry):
+                self.misses += 1
+                return False
+            self.hits += 1
+            os.utime(entry)
+            shutil.copyfile(entry, output_zip_path)
+        return True
+
+    def put(self, key, zip_path):
+        """
+        Stores a freshly downloaded extraction ZIP and evicts old entries if over the cap.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            shutil.copyfile(zip_path, tmp_path)
+            os.replace(tmp_path, self._entry_path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.zip'):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+
+        entries.sort()
+        while total > self.max_bytes and entries:
+            _, size, name = entries.pop(0)
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+            self.evictions += 1
+            logging.info(f"Evicted cached extraction {name}")
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit/miss/eviction counters of this process and the current cache size.
+        """
+        entries = [name for name in os.listdir(self.cache_dir) if name.endswith('.zip')]
+        size = sum(os.path.getsize(os.path.join(self.cache_dir, name)) for name in entries)
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(entries),
+            'bytes': size,
+        }
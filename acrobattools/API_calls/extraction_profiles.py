@@ -0,0 +1,149 @@
+import os
+import io
+import sys
+import time
+import logging
+import argparse
+import tempfile
+import contextlib
+
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_element_type import ExtractElementType
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_pdf_params import ExtractPDFParams
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_renditions_element_type import \
+    ExtractRenditionsElementType
+from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.table_structure_type import TableStructureType
+
+# What each downstream stage reads from an extraction:
+#   text        - json_struct hierarchy, SoA from TR/TD nodes, form extractors (Text + Path only)
+#   ecrf-forms  - as text, plus Table elements with NumRow/NumCol for the eCRF form tables
+#   soa-only    - as ecrf-forms, plus the xlsx table renditions read by TableStore
+#   full        - everything, including figure PNGs, styling and character bounds
+PROFILES = {
+    'text': dict(
+        elements_to_extract=[ExtractElementType.TEXT],
+    ),
+    'ecrf-forms': dict(
+        elements_to_extract=[ExtractElementType.TEXT, ExtractElementType.TABLES],
+    ),
+    'soa-only': dict(
+        elements_to_extract=[ExtractElementType.TEXT, ExtractElementType.TABLES],
+        elements_to_extract_renditions=[ExtractRenditionsElementType.TABLES],
+        table_structure_type=TableStructureType.XLSX,
+    ),
+    'full': dict(
+        elements_to_extract=[ExtractElementType.TEXT, ExtractElementType.TABLES],
+        elements_to_extract_renditions=[ExtractRenditionsElementType.TABLES, ExtractRenditionsElementType.FIGURES],
+        table_structure_type=TableStructureType.XLSX,
+        styling_info=True,
+        add_char_info=True,
+    ),
+}
+
+DEFAULT_PROFILE = 'text'
+
+
+def get_extract_params(profile=DEFAULT_PROFILE):
+    """
+    Builds the ExtractPDFParams of a named extraction profile.
+
+    Args:
+        profile (str): One of ``PROFILES``.
+
+    Returns:
+        ExtractPDFParams: A fresh parameters object.
+
+    Raises:
+        ValueError: If the profile is unknown.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown extraction profile '{profile}', expected one of: {', '.join(PROFILES)}")
+    return ExtractPDFParams(**PROFILES[profile])
+
+
+def schedule_from_zip(zip_path):
+    """
+    Runs the SoA parser on an extraction ZIP, silencing its progress output.
+
+    Returns:
+        tuple: ``(schedule, visit_order, procedure_order)`` as from ``parse_protocol_schedule``.
+    """
+    base_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+    for folder in ("structuring_protocol_json", "Schedule_of_activities"):
+        if os.path.join(base_dir, folder) not in sys.path:
+            sys.path.insert(0, os.path.join(base_dir, folder))
+    from json_struct import load_structured_data, parse_hierarchy
+    from soa_works_for_all import parse_protocol_schedule
+
+    hierarchy = parse_hierarchy(load_structured_data(zip_path).get('elements', []))
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse_protocol_schedule(hierarchy)
+
+
+def profile_report(input_pdf_path, work_dir, profiles=None, pdf_services=None):
+    """
+    Extracts one PDF with every profile and measures what each one costs.
+
+    Args:
+        input_pdf_path (str): A representative protocol PDF.
+        work_dir (str): Where the result ZIPs are written.
+        profiles (list[str], optional): Defaults to all of ``PROFILES``.
+        pdf_services (PDFServices, optional): An existing client to reuse.
+
+    Returns:
+        list[dict]: Per profile the ZIP size in bytes, the job latency in seconds, and
+        whether the extracted schedule equals the one from the ``full`` profile.
+    """
+    from simpletext_extract import create_pdf_services, extract_text_from_pdf
+
+    profiles = profiles or list(PROFILES)
+    if pdf_services is None:
+        pdf_services = create_pdf_services()
+
+    reports = []
+    for profile in profiles:
+        output_zip = os.path.join(work_dir, f"{profile}.zip")
+        started = time.perf_counter()
+        ok = extract_text_from_pdf(input_pdf_path, output_zip, pdf_services=pdf_services,
+                                   extract_pdf_params=get_extract_params(profile))
+        latency = time.perf_counter() - started
+        reports.append({
+            'profile': profile,
+            'ok': ok,
+            'zip_bytes': os.path.getsize(output_zip) if ok else None,
+            'seconds': latency,
+            'schedule': schedule_from_zip(output_zip) if ok else None,
+        })
+
+    reference = next((report['schedule'] for report in reports if report['profile'] == 'full'), None)
+    for report in reports:
+        report['same_schedule'] = None if reference is None or not report['ok'] else report['schedule'] == reference
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare ZIP size, latency and schedules of the extraction profiles.")
+    parser.add_argument("input_pdf")
+    parser.add_argument("-p", "--profile", action="append", choices=list(PROFILES),
+                        help="Profile to run (repeatable; default: all)")
+    parser.add_argument("--fake", action="store_true", help="Run against the local fake service instead of Adobe")
+    args = parser.parse_args()
+
+    # Before simpletext_extract is imported, so its INFO-level basicConfig does not apply
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.ExitStack() as stack:
+        services = None
+        if args.fake:
+            from fake_pdf_services import FakePDFServices
+            services = stack.enter_context(FakePDFServices())
+        results = profile_report(args.input_pdf, work_dir, profiles=args.profile, pdf_services=services)
+
+    print(f"{'profile':<12}{'ZIP (KiB)':>11}{'latency (s)':>13}{'visits':>8}{'procedures':>12}  same schedule as full")
+    for result in results:
+        if not result['ok']:
+            print(f"{result['profile']:<12}{'failed':>11}")
+            continue
+        _, visits, procedures = result['schedule']
+        same = {True: '✅', False: '❌', None: '-'}[result['same_schedule']]
+        print(f"{result['profile']:<12}{result['zip_bytes'] / 1024:>11.0f}{result['seconds']:>13.2f}"
+              f"{len(visits or []):>8}{len(procedures or []):>12}  {same}")
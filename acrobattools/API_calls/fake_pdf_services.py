@@ -0,0 +1,384 @@
+import io
+import os
+import json
+import re
+import sys
+import time
+import uuid
+import random
+import zipfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+from adobe.pdfservices.operation.exception.exceptions import ServiceApiException, ServiceUsageException, SdkException
+from adobe.pdfservices.operation.io.cloud_asset import CloudAsset
+from adobe.pdfservices.operation.io.stream_asset import StreamAsset
+from adobe.pdfservices.operation.pdf_services_job_status import PDFServicesJobStatus
+from adobe.pdfservices.operation.pdf_services_response import PDFServicesResponse
+from adobe.pdfservices.operation.pdfjobs.result.create_pdf_result import CreatePDFResult
+from adobe.pdfservices.operation.pdfjobs.result.extract_pdf_result import ExtractPDFResult
+from adobe.pdfservices.operation.pdfjobs.result.split_pdf_result import SplitPDFResult
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from json_struct import STRUCTURED_DATA_MEMBER, load_structured_data
+
+API_CALLS_DIR = os.path.dirname(os.path.abspath(__file__))
+TEXT_RESULT_ZIP = os.path.join(API_CALLS_DIR, 'extractTextInfoFromPDF.zip')
+TEXT_TABLE_RESULT_ZIP = os.path.join(API_CALLS_DIR, 'ExtractTextTableInfoFromPDF.zip')
+
+# Smallest well-formed PDF (one empty page), returned for CreatePDFJob
+MINIMAL_PDF = (
+    b"%PDF-1.4\n"
+    b"1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+    b"xref\n0 4\n0000000000 65535 f \n0000000009 00000 n \n0000000052 00000 n \n0000000101 00000 n \n"
+    b"trailer<</Size 4/Root 1 0 R>>\nstartxref\n164\n%%EOF\n"
+)
+
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+# Page objects of an uncompressed PDF, used to size SplitPDFJob results without a PDF parser
+PAGE_OBJECT_PATTERN = re.compile(rb'/Type\s*/Page(?![a-zA-Z])')
+
+# Path segments (``Table[12]``) and rendition files (``tables/fileoutpart3.xlsx``) of a structuredData document
+SEGMENT_PATTERN = re.compile(r'^([^\[\]]+)(?:\[(\d+)\])?$')
+RENDITION_PATTERN = re.compile(r'fileoutpart\d+')
+
+
+def _job_field(job, field):
+    """Reads a private attribute of an SDK job object (e.g. ``__input_asset``)."""
+    return getattr(job, f"_{type(job).__name__}{field}", None)
+
+
+class FakePDFServices:
+    """
+    Offline stand-in for ``PDFServices`` covering the upload/submit/poll/download cycle.
+
+    Uploaded content is kept in memory, jobs complete after ``processing_latency``
+    seconds of polling, and result assets are served over a local HTTP server so the
+    download path behaves like the presigned URLs of the real service. Extraction jobs
+    return the checked-in ``extractTextInfoFromPDF.zip`` (text only) or
+    ``ExtractTextTableInfoFromPDF.zip`` (tables or renditions requested); conversion
+    jobs return a one-page PDF, and split jobs return one such PDF per page range
+    (inputs without readable page objects count as one page). Extracting one of those
+    parts returns the canned result cut to the part's pages and numbered as an extraction
+    of its own (pages, top-level paths and renditions from 0), the way the service
+    answers for a page range of the canned document.
+
+    Use as a context manager, or call ``close()`` to stop the HTTP server.
+    """
+
+    def __init__(self, upload_latency=0.05, processing_latency=0.5, download_latency=0.05,
+                 poll_interval=0.1, failure_rate=0.0, usage_failure_rate=0.0, seed=None,
+                 text_result_zip=TEXT_RESULT_ZIP, text_table_result_zip=TEXT_TABLE_RESULT_ZIP):
+        """
+        Args:
+            upload_latency (float): Seconds spent in every ``upload`` call.
+            processing_latency (float): Seconds between ``submit`` and the job being done.
+            download_latency (float): Seconds before the first byte of a download.
+            poll_interval (float): Sleep between status polls in ``get_job_result``.
+            failure_rate (float): Probability that an ``upload`` or ``submit`` call raises
+                ServiceApiException (HTTP 500).
+            usage_failure_rate (float): Probability that an ``upload`` or ``submit`` call raises
+                ServiceUsageException (HTTP 429).
+            seed (int, optional): Seed for the failure injection, for reproducible runs.
+            text_result_zip (str): Canned result for text-only extractions.
+            text_table_result_zip (str): Canned result for extractions with tables or renditions.
+        """
+        self.upload_latency = upload_latency
+        self.processing_latency = processing_latency
+        self.download_latency = download_latency
+        self.poll_interval = poll_interval
+        self.failure_rate = failure_rate
+        self.usage_failure_rate = usage_failure_rate
+        self.text_result_zip = text_result_zip
+        self.text_table_result_zip = text_table_result_zip
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._assets = {}
+        self._jobs = {}
+        self._page_ranges = {}
+        self._results = {}
+        self.counters = {'uploads': 0, 'submits': 0, 'polls': 0, 'downloads': 0, 'injected_failures': 0}
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._server_thread.start()
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Stops the local download server."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        fake = self
+
+        class AssetHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                asset_id = self.path.rsplit('/', 1)[-1]
+                with fake._lock:
+                    asset = fake._assets.get(asset_id)
+                    if asset is not None:
+                        fake.counters['downloads'] += 1
+                if asset is None:
+                    self.send_error(404)
+                    return
+
+                content, mime_type = asset
+                time.sleep(fake.download_latency)
+                self.send_response(200)
+                self.send_header('Content-Type', mime_type)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                for start in range(0, len(content), DOWNLOAD_CHUNK_SIZE):
+                    self.wfile.write(content[start:start + DOWNLOAD_CHUNK_SIZE])
+
+            def log_message(self, format, *args):
+                pass
+
+        return AssetHandler
+
+    def _store(self, content, mime_type):
+        asset_id = uuid.uuid4().hex
+        with self._lock:
+            self._assets[asset_id] = (content, mime_type)
+        return CloudAsset(asset_id, f"{self.base_url}/assets/{asset_id}")
+
+    def _maybe_fail(self, operation):
+        with self._lock:
+            draw = self._random.random()
+            if draw < self.failure_rate:
+                self.counters['injected_failures'] += 1
+                raise ServiceApiException(f"Injected failure in {operation}", uuid.uuid4().hex, 500, 'INTERNAL_ERROR')
+            if draw < self.failure_rate + self.usage_failure_rate:
+                self.counters['injected_failures'] += 1
+                raise ServiceUsageException(f"Injected quota error in {operation}", uuid.uuid4().hex, 429,
+                                            'TOO_MANY_REQUESTS')
+
+    def _asset_content(self, asset):
+        with self._lock:
+            stored = self._assets.get(asset.get_asset_id())
+        if stored is None:
+            raise SdkException(f"Unknown asset {asset.get_asset_id()}")
+        return stored
+
+    def _run_job(self, job):
+        """Builds the SDK result object that the submitted job will return."""
+        job_type = type(job).__name__
+        input_asset = _job_field(job, '__input_asset')
+        input_content = self._asset_content(input_asset)[0] if input_asset is not None else b''
+
+        if job_type == 'ExtractPDFJob':
+            result_zip = self.result_zip_for(_job_field(job, '__extract_pdf_params'))
+            with self._lock:
+                page_range = self._page_ranges.get(input_asset.get_asset_id()) if input_asset is not None else None
+            if page_range is not None:
+                content = self._page_range_result(result_zip, *page_range)
+            else:
+                with open(result_zip, 'rb') as file:
+                    content = file.read()
+            resource = self._store(content, 'application/zip')
+            return ExtractPDFResult(None, resource, None)
+
+        if job_type == 'CreatePDFJob':
+            return CreatePDFResult(self._store(MINIMAL_PDF, 'application/pdf'))
+
+        if job_type == 'SplitPDFJob':
+            params = _job_field(job, '__split_pdf_params')
+            page_count = max(len(PAGE_OBJECT_PATTERN.findall(input_content)), 1)
+            pages_per_part = (params.get_page_count() if params else None) or page_count
+            parts = (page_count + pages_per_part - 1) // pages_per_part
+            assets = []
+            for part in range(parts):
+                asset = self._store(MINIMAL_PDF, 'application/pdf')
+                with self._lock:
+                    self._page_ranges[asset.get_asset_id()] = (part * pages_per_part,
+                                                               min((part + 1) * pages_per_part, page_count))
+                assets.append(asset)
+            return SplitPDFResult(assets, None)
+
+        raise SdkException(f"FakePDFServices does not support {job_type}")
+
+    def result_zip_for(self, extract_pdf_params):
+        """The canned result an extraction with these parameters returns."""
+        elements = (extract_pdf_params.get_elements_to_extract() or []) if extract_pdf_params else []
+        renditions = (extract_pdf_params.get_elements_to_extract_renditions() or []) if extract_pdf_params else []
+        return self.text_table_result_zip if ('tables' in elements or renditions) else self.text_result_zip
+
+    def _page_range_result(self, result_zip, first_page, end_page):
+        """
+        The canned result ZIP of pages ``[first_page, end_page)``, as its own extraction.
+
+        Takes the elements on those pages (a cell without a Page is on the page of the
+        next cell of its row, or of the element before it) and numbers them the way an
+        extraction of only those pages does: pages from 0, top-level segments per tag
+        from 1 and renditions from ``fileoutpart0``. Below a parent that starts on
+        earlier pages, the part gets its own copy of the parent element (with its
+        bounds) and numbers the children from 1; a table cut by the range counts only
+        the rows on its pages.
+        """
+        with self._lock:
+            data = self._results.get(result_zip)
+        if data is None:
+            data = load_structured_data(result_zip)
+            with self._lock:
+                self._results[result_zip] = data
+
+        source_elements = data.get('elements') or []
+        source_parts = [tuple(part for part in (elem.get('Path') or '').split('/')[3:] if part)
+                        for elem in source_elements]
+        # Pages of elements without one: the next element with a Page in the same parent, else the previous one
+        pages = [elem.get('Page') if isinstance(elem.get('Page'), int) else None for elem in source_elements]
+        following = (None, None)
+        for index in range(len(source_elements) - 1, -1, -1):
+            if pages[index] is None and following[0] is not None and \
+                    source_parts[index][:-1] == following[1][:len(source_parts[index]) - 1]:
+                pages[index] = following[0]
+            if isinstance(source_elements[index].get('Page'), int):
+                following = (pages[index], source_parts[index])
+        current_page = 0
+        for index, page in enumerate(pages):
+            current_page = page if page is not None else current_page
+            pages[index] = current_page
+
+        by_path = {}
+        inside, outside = [], set()
+        for elem, parts, page in zip(source_elements, source_parts, pages):
+            by_path.setdefault(parts, elem)
+            if first_page <= page < end_page:
+                inside.append((elem, parts, page))
+            else:
+                outside.update(parts[:level] for level in range(1, len(parts)))
+        own_paths = {parts for _, parts, _ in inside}
+
+        elements = []
+        own = {}            # path -> its element in this part
+        copies = {}         # parent path -> copy of the parent element in this part
+        top_counters, top_map, child_base = Counter(), {}, {}
+        for elem, parts, page in inside:
+            new_elem = dict(elem)
+            own.setdefault(parts, new_elem)
+            new_parts = list(parts)
+            for level, part in enumerate(parts):
+                tag, index = SEGMENT_PATTERN.match(part).groups()
+                if level == 0:
+                    if part not in top_map:
+                        top_counters[tag] += 1
+                        top_map[part] = tag if top_counters[tag] == 1 else f"{tag}[{top_counters[tag]}]"
+                    new_parts[0] = top_map[part]
+                    continue
+                prefix = parts[:level]
+                if prefix in own_paths:
+                    continue
+                if prefix not in copies and prefix in by_path:
+                    parent = {key: value for key, value in by_path[prefix].items() if key not in ('filePaths', 'ObjectID')}
+                    parent['Path'] = '//Document/' + '/'.join(new_parts[:level])
+                    parent['Page'] = page - first_page
+                    copies[prefix] = parent
+                    elements.append(parent)
+                if (prefix, tag) not in child_base:
+                    child_base[(prefix, tag)] = int(index or 1) - 1
+                number = int(index or 1) - child_base[(prefix, tag)]
+                new_parts[level] = tag if number == 1 else f"{tag}[{number}]"
+            if parts:
+                new_elem['Path'] = '//Document/' + '/'.join(new_parts)
+            if isinstance(elem.get('Page'), int):
+                new_elem['Page'] = elem['Page'] - first_page
+            elements.append(new_elem)
+
+        # A table cut by the range counts the rows on its pages
+        for prefix, elem in list(copies.items()) + [(prefix, own[prefix]) for prefix in own_paths & outside]:
+            if 'NumRow' in (elem.get('attributes') or {}):
+                rows = {parts[len(prefix)] for _, parts, _ in inside
+                        if len(parts) > len(prefix) and parts[:len(prefix)] == prefix}
+                elem['attributes'] = dict(elem['attributes'], NumRow=len(rows))
+
+        # Renditions are numbered per extraction, in element order
+        renames = {}
+        for elem in elements:
+            if elem.get('filePaths'):
+                for file_path in elem['filePaths']:
+                    if file_path not in renames:
+                        renames[file_path] = RENDITION_PATTERN.sub(f"fileoutpart{len(renames)}", file_path)
+                elem['filePaths'] = [renames[file_path] for file_path in elem['filePaths']]
+
+        shard = {key: value for key, value in data.items() if key not in ('elements', 'pages')}
+        if 'extended_metadata' in shard:
+            shard['extended_metadata'] = dict(shard['extended_metadata'], page_count=end_page - first_page)
+        shard['elements'] = elements
+        shard['pages'] = [dict(page, page_number=page['page_number'] - first_page)
+                          for page in data.get('pages') or [] if first_page <= page.get('page_number', -1) < end_page]
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(result_zip) as source, zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(STRUCTURED_DATA_MEMBER, json.dumps(shard, ensure_ascii=False))
+            for old_name, new_name in renames.items():
+                if old_name in source.namelist():
+                    archive.writestr(new_name, source.read(old_name))
+        return buffer.getvalue()
+
+    def upload(self, input_stream, mime_type):
+        self._maybe_fail('upload')
+        time.sleep(self.upload_latency)
+        content = input_stream.read() if hasattr(input_stream, 'read') else bytes(input_stream)
+        with self._lock:
+            self.counters['uploads'] += 1
+        return self._store(content, mime_type)
+
+    def submit(self, pdf_services_job, notify_config_list=None):
+        self._maybe_fail('submit')
+        result = self._run_job(pdf_services_job)
+        location = f"{self.base_url}/jobs/{uuid.uuid4().hex}"
+        with self._lock:
+            self.counters['submits'] += 1
+            self._jobs[location] = (time.monotonic() + self.processing_latency, result)
+        return location
+
+    def get_job_result(self, polling_url, result_type):
+        with self._lock:
+            job = self._jobs.get(polling_url)
+        if job is None:
+            raise SdkException(f"Unknown job {polling_url}")
+
+        ready_at, result = job
+        while True:
+            with self._lock:
+                self.counters['polls'] += 1
+            if time.monotonic() >= ready_at:
+                break
+            time.sleep(min(self.poll_interval, max(ready_at - time.monotonic(), 0)))
+
+        return PDFServicesResponse(PDFServicesJobStatus.DONE.get_value(), {}, result)
+
+    def get_content(self, asset):
+        response = requests.get(asset.get_download_uri())
+        response.raise_for_status()
+        return StreamAsset(response.content, response.headers.get('content-type'))
+
+    def refresh_download_uri(self, asset):
+        self._asset_content(asset)
+        return CloudAsset(asset.get_asset_id(), f"{self.base_url}/assets/{asset.get_asset_id()}")
+
+    def delete_asset(self, asset):
+        with self._lock:
+            self._assets.pop(asset.get_asset_id(), None)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Call counters since construction.
+        """
+        with self._lock:
+            return dict(self.counters)
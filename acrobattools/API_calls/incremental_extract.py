@@ -0,0 +1,237 @@
+import os
+import sys
+import json
+import shutil
+import difflib
+import hashlib
+import logging
+import argparse
+import tempfile
+
+from adobe.pdfservices.operation.exception.exceptions import ServiceApiException, ServiceUsageException, SdkException
+from adobe.pdfservices.operation.pdf_services_media_type import PDFServicesMediaType
+from pypdf import PdfReader, PdfWriter
+
+from extraction_cache import params_fingerprint
+from sharded_extract import write_merged_zip
+from simpletext_extract import create_pdf_services, default_extract_params, run_extract_job
+from structured_data_merge import merge_structured_data, page_count_of, split_structured_data_at
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from json_struct import load_structured_data
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def page_hashes(pdf_path):
+    """
+    Fingerprints every page of a PDF by what it draws.
+
+    The hash covers the decoded content stream, the page box and rotation, and the
+    data of the images/forms the page places, so a reflowed paragraph or a replaced
+    figure changes it while re-saving the file (new object numbers, metadata) does not.
+
+    Returns:
+        list[str]: One SHA-256 hex digest per page, in page order.
+    """
+    hashes = []
+    for page in PdfReader(pdf_path).pages:
+        digest = hashlib.sha256()
+        contents = page.get_contents()
+        digest.update(contents.get_data() if contents is not None else b'')
+        digest.update(repr([float(value) for value in page.mediabox]).encode())
+        digest.update(str(page.get('/Rotate', 0)).encode())
+
+        resources = page.get('/Resources')
+        xobjects = resources.get_object().get('/XObject') if resources is not None else None
+        if xobjects is not None:
+            xobjects = xobjects.get_object()
+            for name in sorted(xobjects):
+                digest.update(name.encode())
+                digest.update(xobjects[name].get_object().get_data())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+def manifest_path_for(zip_path):
+    """The page manifest is stored next to the extraction ZIP it describes."""
+    return os.path.splitext(zip_path)[0] + '.pages.json'
+
+
+def load_manifest(zip_path):
+    manifest_path = manifest_path_for(zip_path)
+    if not os.path.exists(zip_path) or not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def write_manifest(zip_path, input_pdf_path, hashes, extract_pdf_params):
+    manifest_path = manifest_path_for(zip_path)
+    manifest = {
+        'pdf': os.path.basename(input_pdf_path),
+        'params': params_fingerprint(extract_pdf_params),
+        'page_hashes': hashes,
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(manifest_path)), suffix='.part')
+    with os.fdopen(fd, 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def plan_page_runs(old_hashes, new_hashes):
+    """
+    Matches the pages of the new PDF to the previous extraction by hash.
+
+    Pages are aligned as sequences, so an inserted or deleted page only marks itself as
+    changed and the pages after it are reused under their new numbers.
+
+    Returns:
+        tuple[list[tuple], list[int]]: Runs of consecutive new pages in order, each
+        ``("previous", first_old_page, length)`` or ``("fresh", first_changed_index, length)``;
+        and the 0-based new pages that must be extracted again.
+    """
+    runs = []
+    changed = []
+    matcher = difflib.SequenceMatcher(None, old_hashes, new_hashes, autojunk=False)
+    for tag, old_start, old_end, new_start, new_end in matcher.get_opcodes():
+        if tag == 'equal':
+            runs.append(('previous', old_start, old_end - old_start))
+        elif new_end > new_start:
+            runs.append(('fresh', len(changed), new_end - new_start))
+            changed.extend(range(new_start, new_end))
+    return runs, changed
+
+
+def splice_structured_data(previous, fresh, runs):
+    """
+    Builds the structuredData of the new PDF from reused and freshly extracted page runs.
+
+    The previous document is cut at the boundaries of the reused runs and the fresh one
+    (the extraction of the changed pages only) at the boundaries of the fresh runs; the
+    pieces are then merged in new page order, which renumbers ``Page``, ``ObjectID``,
+    paths and renditions. Tables are only stitched where two runs are consecutive pages
+    of the same source; where previous and fresh pages meet, the two extractions have
+    nothing to say about whether a table continues, so the parts stay separate.
+
+    Args:
+        previous (dict): structuredData of the previous version.
+        fresh (dict): structuredData of a PDF holding only the changed pages, in order.
+        runs (list[tuple]): As returned by ``plan_page_runs``.
+
+    Returns:
+        tuple[dict, list[dict], list[str]]: The spliced document, the rendition renames
+        per run, and per run whether it came from ``"previous"`` or ``"fresh"``.
+    """
+    sources = {'previous': previous, 'fresh': fresh}
+    pieces = {}
+    for source, data in sources.items():
+        starts = sorted({0} | {start for kind, start, _ in runs if kind == source}
+                        | {start + length for kind, start, length in runs if kind == source})
+        starts = [start for start in starts if start < max(page_count_of(data), 1)]
+        pieces[source] = dict(zip(starts, split_structured_data_at(data, starts)))
+
+    shards = [pieces[kind][start] for kind, start, _ in runs]
+    contiguous = [kind == next_kind and start + length == next_start
+                  for (kind, start, length), (next_kind, next_start, _) in zip(runs, runs[1:])]
+    merged, renames = merge_structured_data(shards, contiguous)
+    return merged, renames, [kind for kind, _, _ in runs]
+
+
+def extract_incremental(input_pdf_path, output_zip_path, previous_zip_path=None, pdf_services=None,
+                        extract_pdf_params=None):
+    """
+    Re-extracts only the pages of a PDF that changed since the previous extraction.
+
+    Every extraction writes a page manifest (``<zip>.pages.json``) with the per-page
+    hashes. On the next version of the document, pages whose hash is unchanged are
+    taken from the previous ZIP, the changed pages are copied into a small PDF and sent
+    to Adobe as one job, and the two are spliced into a complete structuredData.json.
+    Without a usable manifest (first run, or different extraction parameters) the whole
+    document is extracted.
+
+    Args:
+        input_pdf_path (str): The new version of the PDF.
+        output_zip_path (str): Where the up-to-date ZIP will be saved.
+        previous_zip_path (str, optional): ZIP of the previous version; defaults to
+            ``output_zip_path``, i.e. updating the extraction in place.
+        pdf_services (PDFServices, optional): An existing client to reuse.
+        extract_pdf_params (ExtractPDFParams, optional): Defaults to text-only extraction.
+
+    Returns:
+        bool: True if the ZIP and its manifest were written.
+    """
+    try:
+        previous_zip_path = previous_zip_path or output_zip_path
+        if extract_pdf_params is None:
+            extract_pdf_params = default_extract_params()
+
+        new_hashes = page_hashes(input_pdf_path)
+        manifest = load_manifest(previous_zip_path)
+        if manifest is not None and manifest.get('params') != params_fingerprint(extract_pdf_params):
+            logging.info("Previous extraction used different parameters, extracting everything")
+            manifest = None
+
+        if manifest is None:
+            runs, changed = [('fresh', 0, len(new_hashes))], list(range(len(new_hashes)))
+        else:
+            runs, changed = plan_page_runs(manifest['page_hashes'], new_hashes)
+        logging.info(f"{len(changed)} of {len(new_hashes)} pages need extraction")
+
+        if not changed:
+            if os.path.abspath(previous_zip_path) != os.path.abspath(output_zip_path):
+                shutil.copyfile(previous_zip_path, output_zip_path)
+            write_manifest(output_zip_path, input_pdf_path, new_hashes, extract_pdf_params)
+            return True
+
+        if pdf_services is None:
+            pdf_services = create_pdf_services()
+
+        output_dir = os.path.dirname(os.path.abspath(output_zip_path))
+        with tempfile.TemporaryDirectory(dir=output_dir) as work_dir:
+            if manifest is None:
+                with open(input_pdf_path, 'rb') as file:
+                    input_asset = pdf_services.upload(file, mime_type=PDFServicesMediaType.PDF)
+                run_extract_job(pdf_services, input_asset, extract_pdf_params, output_zip_path)
+            else:
+                changed_pdf_path = os.path.join(work_dir, 'changed_pages.pdf')
+                reader = PdfReader(input_pdf_path)
+                writer = PdfWriter()
+                for page_number in changed:
+                    writer.add_page(reader.pages[page_number])
+                with open(changed_pdf_path, 'wb') as file:
+                    writer.write(file)
+
+                fresh_zip_path = os.path.join(work_dir, 'changed_pages.zip')
+                with open(changed_pdf_path, 'rb') as file:
+                    input_asset = pdf_services.upload(file, mime_type=PDFServicesMediaType.PDF)
+                run_extract_job(pdf_services, input_asset, extract_pdf_params, fresh_zip_path)
+
+                merged, renames, sources = splice_structured_data(
+                    load_structured_data(previous_zip_path), load_structured_data(fresh_zip_path), runs)
+                zip_paths = {'previous': previous_zip_path, 'fresh': fresh_zip_path}
+                write_merged_zip(output_zip_path, merged, [zip_paths[source] for source in sources], renames)
+
+        write_manifest(output_zip_path, input_pdf_path, new_hashes, extract_pdf_params)
+        logging.info(f"Successfully updated extraction. Output saved to: {output_zip_path}")
+        return True
+
+    except (ServiceApiException, ServiceUsageException, SdkException, ValueError) as e:
+        logging.error(f"An exception occurred: {e}", exc_info=True)
+    except FileNotFoundError as e:
+        logging.error(f"File not found: {e.filename}", exc_info=True)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}", exc_info=True)
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract only the pages that changed since the last extraction.")
+    parser.add_argument("input_pdf", help="New version of the PDF")
+    parser.add_argument("output_zip", nargs="?", help="Extraction ZIP to update (default: <input basename>.zip)")
+    parser.add_argument("--previous", help="ZIP of the previous version, if not the output ZIP itself")
+    args = parser.parse_args()
+
+    output_zip = args.output_zip or os.path.splitext(args.input_pdf)[0] + ".zip"
+    success = extract_incremental(args.input_pdf, output_zip, previous_zip_path=args.previous)
+    sys.exit(0 if success else 1)
@@ -0,0 +1,294 @@
+import os
+import json
+import time
+import random
+import logging
+import tempfile
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+import requests
+from adobe.pdfservices.operation.exception.exceptions import ServiceApiException, ServiceUsageException
+
+from asset_io import DOWNLOAD_CHUNK_SIZE, stream_asset, write_content
+
+# HTTP statuses of ServiceApiException that are worth another attempt (0 = no response)
+RETRYABLE_STATUS_CODES = {0, 408, 429, 500, 502, 503, 504}
+
+
+class RateBudget:
+    """
+    Sliding-window limit of calls per minute shared by all worker threads.
+
+    ``acquire()`` returns immediately while the last 60 seconds hold fewer than
+    ``requests_per_minute`` calls, and otherwise sleeps until the oldest call leaves the
+    window. Workers therefore run back to back up to the quota and queue only at the limit.
+    """
+
+    def __init__(self, requests_per_minute, window_seconds=60.0, clock=time.monotonic, sleep=time.sleep):
+        self.requests_per_minute = requests_per_minute
+        self.window_seconds = window_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def acquire(self):
+        """Blocks until a call fits in the budget and records it. Returns the seconds waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                while self._calls and now - self._calls[0] >= self.window_seconds:
+                    self._calls.popleft()
+                if len(self._calls) < self.requests_per_minute:
+                    self._calls.append(now)
+                    self.waited_seconds += waited
+                    return waited
+                delay = self.window_seconds - (now - self._calls[0])
+            self._sleep(delay)
+            waited += delay
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for transient PDF Services errors.
+
+    The delay before retry ``n`` (1-based) is drawn uniformly from
+    ``[0, min(max_delay, base_delay * 2 ** (n - 1))]``, which spreads the retries of
+    concurrent workers instead of having them hit the service again in lockstep.
+    """
+
+    def __init__(self, max_attempts=5, base_delay=1.0, max_delay=60.0, seed=None):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def is_retryable(self, error):
+        """Quota errors, 5xx/timeouts and dropped connections are retried; other errors are final."""
+        if isinstance(error, ServiceUsageException):
+            return True
+        if isinstance(error, ServiceApiException):
+            return error.status_code in RETRYABLE_STATUS_CODES
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code in RETRYABLE_STATUS_CODES
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def delay(self, retry_number):
+        cap = min(self.max_delay, self.base_delay * 2 ** (retry_number - 1))
+        with self._lock:
+            return self._random.uniform(0, cap)
+
+
+class ScheduledPDFServices:
+    """
+    Wraps a ``PDFServices`` client so every call goes through the rate budget and retry policy.
+
+    It has the same methods as the client, so it can be passed as ``pdf_services`` to
+    ``extract_text_from_pdf`` and the other extraction functions unchanged. Calls made
+    inside ``job_timings()`` are timed per method on the calling thread, which gives
+    per-job upload/submit/poll figures while many jobs share one client.
+
+    Note that the budget counts calls made through this wrapper; the status polls that
+    ``get_job_result`` issues internally are not counted separately.
+    """
+
+    def __init__(self, pdf_services, retry_policy=None, rate_budget=None, sleep=time.sleep):
+        self.pdf_services = pdf_services
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_budget = rate_budget
+        self._sleep = sleep
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.counters = {'calls': 0, 'retries': 0, 'gave_up': 0}
+
+    @contextmanager
+    def job_timings(self):
+        """
+        Collects timings of the calls made by the current thread.
+
+        Yields:
+            dict: Filled with ``{method: seconds}``, plus ``retries`` and ``budget_wait``.
+        """
+        timings = {'retries': 0, 'budget_wait': 0.0}
+        self._local.timings = timings
+        try:
+            yield timings
+        finally:
+            self._local.timings = None
+
+    def _call(self, name, method, *args, rewind=None, **kwargs):
+        timings = getattr(self._local, 'timings', None)
+        attempt = 1
+        while True:
+            if self.rate_budget is not None:
+                waited = self.rate_budget.acquire()
+                if timings is not None:
+                    timings['budget_wait'] += waited
+            if rewind is not None:
+                rewind()
+
+            started = time.perf_counter()
+            try:
+                with self._lock:
+                    self.counters['calls'] += 1
+                return method(*args, **kwargs)
+            except Exception as e:
+                if not self.retry_policy.is_retryable(e) or attempt >= self.retry_policy.max_attempts:
+                    if attempt > 1:
+                        with self._lock:
+                            self.counters['gave_up'] += 1
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                logging.warning(f"{name} failed (attempt {attempt}/{self.retry_policy.max_attempts}), "
+                                f"retrying in {delay:.1f}s: {e}")
+                with self._lock:
+                    self.counters['retries'] += 1
+                if timings is not None:
+                    timings['retries'] += 1
+                self._sleep(delay)
+                attempt += 1
+            finally:
+                if timings is not None:
+                    timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+
+    def upload(self, input_stream, mime_type):
+        # A retried upload must send the stream from the start again
+        rewind = (lambda: input_stream.seek(0)) if hasattr(input_stream, 'seek') else None
+        return self._call('upload', self.pdf_services.upload, input_stream, mime_type, rewind=rewind)
+
+    def submit(self, pdf_services_job, *args, **kwargs):
+        return self._call('submit', self.pdf_services.submit, pdf_services_job, *args, **kwargs)
+
+    def get_job_result(self, polling_url, result_type):
+        return self._call('get_job_result', self.pdf_services.get_job_result, polling_url, result_type)
+
+    def get_content(self, asset):
+        return self._call('get_content', self.pdf_services.get_content, asset)
+
+    def download(self, asset, file, chunk_size=DOWNLOAD_CHUNK_SIZE):
+        """
+        Streams an asset into ``file`` (see ``asset_io.stream_asset``), retried and counted
+        against the budget like the other calls. A download that fails for good, such as an
+        expired presigned URI, is read through ``get_content`` instead.
+
+        Returns:
+            int: Number of bytes written.
+        """
+        def rewind():
+            file.seek(0)
+            file.truncate()
+
+        try:
+            return self._call('download', stream_asset, asset, file, chunk_size, rewind=rewind)
+        except requests.RequestException as e:
+            if self.retry_policy.is_retryable(e):
+                raise
+            logging.warning(f"Streamed download failed, reading the asset through get_content: {e}")
+            rewind()
+            return write_content(self, asset, file)
+
+    def refresh_download_uri(self, asset):
+        return self._call('refresh_download_uri', self.pdf_services.refresh_download_uri, asset)
+
+    def delete_asset(self, asset):
+        return self._call('delete_asset', self.pdf_services.delete_asset, asset)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Call, retry and give-up counters, and the total rate-budget wait.
+        """
+        with self._lock:
+            stats = dict(self.counters)
+        stats['budget_wait_seconds'] = self.rate_budget.waited_seconds if self.rate_budget else 0.0
+        return stats
+
+
+class JobState:
+    """
+    Per-job outcome of a batch, persisted to a JSON file after every job.
+
+    A job is keyed by its input path. An interrupted batch that is started again with
+    the same state file skips every job that finished successfully and whose output
+    still exists, and runs the rest (including earlier failures).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.jobs = {}
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as file:
+                self.jobs = json.load(file).get('jobs', {})
+
+    def is_done(self, input_pdf, output_zip):
+        entry = self.jobs.get(input_pdf)
+        return bool(entry and entry.get('status') == 'done' and entry.get('output') == output_zip
+                    and os.path.exists(output_zip))
+
+    def record(self, input_pdf, output_zip, ok, **details):
+        """Stores the outcome of one job and rewrites the state file atomically."""
+        with self._lock:
+            entry = self.jobs.get(input_pdf, {})
+            entry.update(details, output=output_zip, status='done' if ok else 'failed',
+                         runs=entry.get('runs', 0) + 1, finished_at=time.time())
+            self.jobs[input_pdf] = entry
+
+            state_dir = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=state_dir, suffix='.part')
+            with os.fdopen(fd, 'w', encoding='utf-8') as file:
+                json.dump({'jobs': self.jobs}, file, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from batch_extract import extract_batch
+    from bench_ingestion import make_inputs
+    from fake_pdf_services import FakePDFServices
+    from simpletext_extract import extract_text_from_pdf
+
+    parser = argparse.ArgumentParser(description="Run a batch against the local fake service with injected errors.")
+    parser.add_argument("-n", "--jobs", type=int, default=12)
+    parser.add_argument("-j", "--concurrency", type=int, default=4)
+    parser.add_argument("--failure-rate", type=float, default=0.15, help="Probability of an injected HTTP 500")
+    parser.add_argument("--usage-failure-rate", type=float, default=0.05, help="Probability of an injected 429")
+    parser.add_argument("--rate-per-minute", type=int, default=600)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as work_dir, FakePDFServices(
+            processing_latency=0.2, failure_rate=args.failure_rate,
+            usage_failure_rate=args.usage_failure_rate, seed=args.seed) as fake:
+        batch_jobs = [(path, os.path.splitext(path)[0] + '.zip') for path in make_inputs(work_dir, '.pdf', args.jobs, 64)]
+        state = JobState(os.path.join(work_dir, 'state.json'))
+
+        # First pass without retries: injected errors drop documents, as before the scheduler
+        first = extract_batch(batch_jobs, max_workers=args.concurrency, extract_fn=extract_text_from_pdf, state=state,
+                              pdf_services=ScheduledPDFServices(fake, RetryPolicy(max_attempts=1)))
+
+        # Second pass resumes from the state file, with backoff and a rate budget
+        services = ScheduledPDFServices(fake, RetryPolicy(max_attempts=6, base_delay=0.05, seed=args.seed),
+                                        RateBudget(args.rate_per_minute))
+        second = extract_batch(batch_jobs, max_workers=args.concurrency, extract_fn=extract_text_from_pdf, state=state,
+                               pdf_services=services)
+
+        print(f"pass 1 (no retries):   {first['succeeded']} done, {first['failed']} failed")
+        print(f"pass 2 (resume+retry): {second['skipped']} skipped, {second['succeeded']} done, "
+              f"{second['failed']} failed")
+        print(f"{'job':<16}{'seconds':>9}{'retries':>9}{'upload':>9}{'submit':>9}{'poll':>9}{'download':>10}")
+        for result in second['results']:
+            timings = result['timings']
+            print(f"{os.path.basename(result['input']):<16}{result['seconds']:>9.3f}{timings['retries']:>9}"
+                  f"{timings.get('upload', 0):>9.3f}{timings.get('submit', 0):>9.3f}"
+                  f"{timings.get('get_job_result', 0):>9.3f}{timings.get('download', 0):>10.3f}")
+        print(f"scheduler counters: {services.stats()}")
+        print(f"fake service counters: {fake.stats()}")
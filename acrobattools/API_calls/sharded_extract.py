@@ -0,0 +1,210 @@
+import os
+import sys
+import json
+import logging
+import zipfile
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+
+from adobe.pdfservices.operation.exception.exceptions import ServiceApiException, ServiceUsageException, SdkException
+from adobe.pdfservices.operation.pdf_services_media_type import PDFServicesMediaType
+from adobe.pdfservices.operation.pdfjobs.jobs.split_pdf_job import SplitPDFJob
+from adobe.pdfservices.operation.pdfjobs.params.split_pdf.split_pdf_params import SplitPDFParams
+from adobe.pdfservices.operation.pdfjobs.result.split_pdf_result import SplitPDFResult
+
+from extraction_profiles import PROFILES, get_extract_params
+from simpletext_extract import create_pdf_services, default_extract_params, run_extract_job
+from structured_data_merge import merge_structured_data, page_count_of, structured_data_differences
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from json_struct import STRUCTURED_DATA_MEMBER, load_structured_data
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_PAGES_PER_SHARD = 25
+
+
+def split_pdf_asset(pdf_services, input_asset, pages_per_shard):
+    """
+    Splits an uploaded PDF into consecutive page ranges on the service side.
+
+    Args:
+        pdf_services (PDFServices): The client that owns the asset.
+        input_asset (Asset): The uploaded PDF.
+        pages_per_shard (int): Pages per output document (the last one may be shorter).
+
+    Returns:
+        list[Asset]: One asset per page range, in page order.
+    """
+    split_pdf_job = SplitPDFJob(input_asset, SplitPDFParams(page_count=pages_per_shard))
+    location = pdf_services.submit(split_pdf_job)
+    return pdf_services.get_job_result(location, SplitPDFResult).get_result().get_assets()
+
+
+def write_merged_zip(output_zip_path, merged, shard_zip_paths, renames):
+    """
+    Writes the stitched structuredData.json and the renamed rendition files of every shard.
+
+    The ZIP is built next to ``output_zip_path`` and renamed into place once complete.
+    """
+    output_dir = os.path.dirname(os.path.abspath(output_zip_path))
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, suffix='.part')
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr(STRUCTURED_DATA_MEMBER, json.dumps(merged, ensure_ascii=False, indent=4))
+            for shard_zip_path, shard_renames in zip(shard_zip_paths, renames):
+                with zipfile.ZipFile(shard_zip_path) as shard_archive:
+                    for old_name, new_name in shard_renames.items():
+                        if old_name in shard_archive.namelist():
+                            archive.writestr(new_name, shard_archive.read(old_name))
+        os.replace(tmp_path, output_zip_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def extract_pdf_sharded(input_pdf_path, output_zip_path, pages_per_shard=DEFAULT_PAGES_PER_SHARD, max_workers=4,
+                        pdf_services=None, extract_pdf_params=None):
+    """
+    Extracts a long PDF as parallel page-range jobs and stitches the results into one ZIP.
+
+    The PDF is uploaded once and split by a SplitPDFJob; every part is extracted by its
+    own ExtractPDFJob with at most ``max_workers`` in flight, so the wall time of a
+    200-page protocol is bounded by the slowest part instead of the whole document. The
+    part results are merged by ``merge_structured_data`` into a structuredData.json with
+    document-wide page numbers, element paths and rendition names, which the hierarchy
+    builders read like a single-shot extraction.
+
+    Args:
+        input_pdf_path (str): The PDF to extract.
+        output_zip_path (str): Where the merged ZIP will be saved.
+        pages_per_shard (int): Pages per extraction job.
+        max_workers (int): Extraction jobs in flight.
+        pdf_services (PDFServices, optional): An existing client to reuse.
+        extract_pdf_params (ExtractPDFParams, optional): Defaults to text-only extraction.
+
+    Returns:
+        bool: True if the merged ZIP was written.
+    """
+    try:
+        if pdf_services is None:
+            pdf_services = create_pdf_services()
+        if extract_pdf_params is None:
+            extract_pdf_params = default_extract_params()
+
+        logging.info(f"Uploading {input_pdf_path}...")
+        with open(input_pdf_path, 'rb') as file:
+            input_asset = pdf_services.upload(file, mime_type=PDFServicesMediaType.PDF)
+
+        shard_assets = split_pdf_asset(pdf_services, input_asset, pages_per_shard)
+        logging.info(f"Split into {len(shard_assets)} parts of up to {pages_per_shard} pages")
+
+        output_dir = os.path.dirname(os.path.abspath(output_zip_path))
+        with tempfile.TemporaryDirectory(dir=output_dir) as work_dir:
+            shard_zip_paths = [os.path.join(work_dir, f"shard_{index}.zip") for index in range(len(shard_assets))]
+
+            def extract_shard(index):
+                run_extract_job(pdf_services, shard_assets[index], extract_pdf_params, shard_zip_paths[index])
+                logging.info(f"Extracted part {index + 1}/{len(shard_assets)}")
+
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # list() re-raises the first failed part
+                list(executor.map(extract_shard, range(len(shard_assets))))
+
+            shards = [load_structured_data(path) for path in shard_zip_paths]
+            merged, renames = merge_structured_data(shards)
+            write_merged_zip(output_zip_path, merged, shard_zip_paths, renames)
+
+        logging.info(f"Successfully extracted {len(merged['elements'])} elements. Output saved to: {output_zip_path}")
+        return True
+
+    except (ServiceApiException, ServiceUsageException, SdkException, ValueError) as e:
+        logging.error(f"An exception occurred: {e}", exc_info=True)
+    except FileNotFoundError:
+        logging.error(f"Input PDF file not found at: {input_pdf_path}", exc_info=True)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred: {e}", exc_info=True)
+    return False
+
+
+def compare_with_single_shot(input_pdf_path, merged_zip_path, pdf_services, extract_pdf_params):
+    """
+    Extracts the PDF once more in a single job and compares the merged ZIP with that result.
+
+    The structuredData documents are compared by ``structured_data_differences``, and every
+    rendition file the merged document names must hold the bytes of the single-shot file.
+
+    Returns:
+        list[str]: One line per difference; empty if the sharded extraction matches.
+    """
+    single_zip_path = os.path.splitext(merged_zip_path)[0] + ".single.zip"
+    with open(input_pdf_path, 'rb') as file:
+        input_asset = pdf_services.upload(file, mime_type=PDFServicesMediaType.PDF)
+    run_extract_job(pdf_services, input_asset, extract_pdf_params, single_zip_path)
+
+    merged = load_structured_data(merged_zip_path)
+    differences = structured_data_differences(merged, load_structured_data(single_zip_path))
+    with zipfile.ZipFile(merged_zip_path) as merged_archive, zipfile.ZipFile(single_zip_path) as single_archive:
+        for elem in merged["elements"]:
+            for file_path in elem.get("filePaths") or []:
+                if file_path not in merged_archive.namelist() or file_path not in single_archive.namelist():
+                    differences.append(f"rendition {file_path} missing")
+                elif merged_archive.read(file_path) != single_archive.read(file_path):
+                    differences.append(f"rendition {file_path} differs")
+    return differences
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a long PDF as parallel page-range jobs.")
+    parser.add_argument("input_pdf", nargs="?", help="Required unless --fake")
+    parser.add_argument("output_zip", nargs="?", help="Merged ZIP (default: <input basename>.zip)")
+    parser.add_argument("-p", "--pages-per-shard", type=int, default=DEFAULT_PAGES_PER_SHARD)
+    parser.add_argument("-j", "--workers", type=int, default=4, help="Extraction jobs in flight")
+    parser.add_argument("--profile", choices=list(PROFILES), default="text", help="Extraction profile")
+    parser.add_argument("--compare", action="store_true",
+                        help="Also extract the PDF in one job and compare the merged result with it")
+    parser.add_argument("--fake", action="store_true",
+                        help="Run against the local fake service, which cuts each part's result from its canned "
+                             "extraction by page, and compare with its single-shot extraction; "
+                             "without input_pdf, a blank PDF with the pages of the fake's canned result is used")
+    args = parser.parse_args()
+    if args.input_pdf is None and not args.fake:
+        parser.error("input_pdf is required unless --fake is given")
+
+    extract_pdf_params = get_extract_params(args.profile)
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.ExitStack() as stack:
+        if args.fake:
+            from fake_pdf_services import FakePDFServices
+            pdf_services = stack.enter_context(FakePDFServices(processing_latency=0.1))
+        else:
+            pdf_services = create_pdf_services()
+
+        input_pdf = args.input_pdf
+        if input_pdf is None:
+            # The fake answers every PDF with its canned extraction, so give it as many pages
+            from pypdf import PdfWriter
+            writer = PdfWriter()
+            for _ in range(page_count_of(load_structured_data(pdf_services.result_zip_for(extract_pdf_params)))):
+                writer.add_blank_page(width=595, height=842)
+            input_pdf = os.path.join(work_dir, "blank.pdf")
+            with open(input_pdf, 'wb') as file:
+                writer.write(file)
+
+        output_zip = args.output_zip or os.path.splitext(input_pdf)[0] + ".zip"
+        success = extract_pdf_sharded(input_pdf, output_zip, pages_per_shard=args.pages_per_shard,
+                                      max_workers=args.workers, pdf_services=pdf_services,
+                                      extract_pdf_params=extract_pdf_params)
+        if success and (args.compare or args.fake):
+            differences = compare_with_single_shot(input_pdf, output_zip, pdf_services, extract_pdf_params)
+            for difference in differences[:20]:
+                print(difference)
+            if differences:
+                print(f"❌ merged extraction differs from the single-shot extraction in {len(differences)} places")
+            else:
+                print("✅ merged extraction has the elements, pages and renditions of the single-shot extraction")
+            success = not differences
+    sys.exit(0 if success else 1)
@@ -5,10 +5,11 @@ from adobe.pdfservices.operation.exception.exceptions import ServiceApiException
 from adobe.pdfservices.operation.pdf_services import PDFServices
 from adobe.pdfservices.operation.pdf_services_media_type import PDFServicesMediaType
 from adobe.pdfservices.operation.pdfjobs.jobs.extract_pdf_job import ExtractPDFJob
-from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_element_type import ExtractElementType
-from adobe.pdfservices.operation.pdfjobs.params.extract_pdf.extract_pdf_params import ExtractPDFParams
 from adobe.pdfservices.operation.pdfjobs.result.extract_pdf_result import ExtractPDFResult
 
+from asset_io import download_asset
+from extraction_profiles import DEFAULT_PROFILE, get_extract_params
+
 # Initialize the logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
@@ -34,41 +35,98 @@ def get_pdf_service_credentials():
     return ServicePrincipalCredentials(client_id, client_secret)
 
 
-def extract_text_from_pdf(input_pdf_path: str, output_zip_path: str):
+def create_pdf_services():
+    """
+    Builds an authenticated PDF Services client.
+
+    The client holds the access token and HTTP session, so callers that process
+    several documents should create it once and pass it to every extraction.
+
+    Returns:
+        PDFServices: The authenticated client.
+    """
+    return PDFServices(get_pdf_service_credentials())
+
+
+def default_extract_params():
+    """
+    Returns:
+        ExtractPDFParams: Text-only extraction, as used by the downstream hierarchy builders.
+    """
+    return get_extract_params(DEFAULT_PROFILE)
+
+
+def run_extract_job(pdf_services, input_asset, extract_pdf_params, output_zip_path):
+    """
+    Submits an ExtractPDFJob for an already uploaded asset and streams the result ZIP to disk.
+
+    The input asset can be a fresh upload or the result asset of an earlier job (for
+    example a CreatePDFJob), in which case the PDF never leaves the service.
+
+    Args:
+        pdf_services (PDFServices): The client that owns the asset.
+        input_asset (Asset): The PDF to extract.
+        extract_pdf_params (ExtractPDFParams): The extraction parameters.
+        output_zip_path (str): The path where the output ZIP file will be saved.
+    """
+    extract_pdf_job = ExtractPDFJob(input_asset=input_asset, extract_pdf_params=extract_pdf_params)
+
+    # Submit the job and get the result
+    location = pdf_services.submit(extract_pdf_job)
+    pdf_services_response = pdf_services.get_job_result(location, ExtractPDFResult)
+
+    # Stream the resulting asset to disk
+    result_asset = pdf_services_response.get_result().get_resource()
+    download_asset(pdf_services, result_asset, output_zip_path)
+
+
+def extract_text_from_pdf(input_pdf_path: str, output_zip_path: str, pdf_services=None, cache=None,
+                          extract_pdf_params=None):
     """
     Extracts text from a specified PDF file using the Adobe PDF Services API.
 
     Args:
         input_pdf_path (str): The path to the input PDF file.
         output_zip_path (str): The path where the output ZIP file will be saved.
+        pdf_services (PDFServices, optional): An existing client to reuse. A new one
+            is created from the environment credentials when omitted.
+        cache (ExtractionCache, optional): Result cache consulted before any network call
+            and filled after a successful extraction.
+        extract_pdf_params (ExtractPDFParams, optional): Defaults to text-only extraction;
+            see ``extraction_profiles`` for the named alternatives.
+
+    Returns:
+        bool: True if the ZIP was written, False if the extraction failed.
     """
     try:
         logging.info(f"Attempting to extract text from {input_pdf_path}")
 
-        credentials = get_pdf_service_credentials()
-        pdf_services = PDFServices(credentials)
+        # Define extraction parameters
+        if extract_pdf_params is None:
+            extract_pdf_params = default_extract_params()
+
+        # Reuse a previous result for the same PDF and parameters
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(input_pdf_path, extract_pdf_params)
+            if cache.get(cache_key, output_zip_path):
+                logging.info(f"Cache hit for {input_pdf_path}. Output saved to: {output_zip_path}")
+                return True
+
+        if pdf_services is None:
+            pdf_services = create_pdf_services()
 
         # Upload the PDF file
         with open(input_pdf_path, 'rb') as file:
             input_asset = pdf_services.upload(file, mime_type=PDFServicesMediaType.PDF)
 
-        # Define extraction parameters
-        extract_pdf_params = ExtractPDFParams(elements_to_extract=[ExtractElementType.TEXT])
-        extract_pdf_job = ExtractPDFJob(input_asset=input_asset, extract_pdf_params=extract_pdf_params)
-
-        # Submit the job and get the result
-        location = pdf_services.submit(extract_pdf_job)
-        pdf_services_response = pdf_services.get_job_result(location, ExtractPDFResult)
+        run_extract_job(pdf_services, input_asset, extract_pdf_params, output_zip_path)
 
-        # Get the content from the resulting asset
-        result_asset = pdf_services_response.get_result().get_resource()
-        stream_asset = pdf_services.get_content(result_asset)
-
-        # Save the result to a file
-        with open(output_zip_path, "wb") as file:
-            file.write(stream_asset.get_input_stream())
+        if cache is not None:
+            cache.put(cache_key, output_zip_path)
 
         logging.info(f"Successfully extracted text. Output saved to: {output_zip_path}")
+        return True
 
     except (ServiceApiException, ServiceUsageException, SdkException, ValueError) as e:
         logging.error(f"An exception occurred: {e}", exc_info=True)
@@ -76,10 +134,17 @@ def extract_text_from_pdf(input_pdf_path: str, output_zip_path: str):
         logging.error(f"Input PDF file not found at: {input_pdf_path}", exc_info=True)
     except Exception as e:
         logging.error(f"An unexpected error occurred: {e}", exc_info=True)
+    return False
 
 
 if __name__ == "__main__":
-    INPUT_PDF = '/home/ibab/Desktop/NovoNordisk/Documents_09Sep25/Protocol_REF.pdf'
+    import sys
+    from extraction_cache import ExtractionCache
+
+    INPUT_PDF = sys.argv[1] if len(sys.argv) > 1 else '/home/ibab/Desktop/NovoNordisk/Documents_09Sep25/Protocol_REF.pdf'
     OUTPUT_ZIP = 'extractTextInfoFromPDF.zip'
+    CACHE_DIR = os.getenv('PDF_EXTRACTION_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.extraction_cache'))
 
-    extract_text_from_pdf(INPUT_PDF, OUTPUT_ZIP)
\ No newline at end of file
+    cache = ExtractionCache(CACHE_DIR)
+    extract_text_from_pdf(INPUT_PDF, OUTPUT_ZIP, cache=cache)
+    logging.info(f"Extraction cache: {cache.stats()}")
\ No newline at end of file
@@ -0,0 +1,521 @@
+import re
+import copy
+import bisect
+from collections import Counter
+
+SEGMENT_PATTERN = re.compile(r'^([^\[\]]+)(?:\[(\d+)\])?$')
+RENDITION_PATTERN = re.compile(r'fileoutpart(\d+)')
+
+# Structures that Adobe keeps as one element when they run over a page break; a document
+# may wrap everything in one Sect, with its tables nested below it
+CONTINUABLE_TAGS = {"Table", "L", "TOC", "Sect"}
+# Points of slack when comparing element Bounds with page margins and column spans
+MARGIN_TOLERANCE = 2.0
+
+
+def parse_segment(segment):
+    """Split a path segment like ``Table[12]`` into ``("Table", 12)``; a bare tag has index 1."""
+    match = SEGMENT_PATTERN.match(segment)
+    if not match:
+        return segment, 1
+    return match.group(1), int(match.group(2) or 1)
+
+
+def format_segment(tag, index):
+    """Inverse of ``parse_segment``: Adobe omits the index of the first occurrence."""
+    return tag if index == 1 else f"{tag}[{index}]"
+
+
+def split_document_path(path):
+    """``//Document/Table[2]/TR/TD`` -> ``["Table[2]", "TR", "TD"]``."""
+    parts = [part for part in (path or "").split("/") if part]
+    if parts and parts[0] == "Document":
+        parts = parts[1:]
+    return parts
+
+
+def join_document_path(parts):
+    return "//Document/" + "/".join(parts) if parts else "//Document"
+
+
+def page_count_of(data):
+    """Number of pages covered by a structuredData document."""
+    metadata = data.get("extended_metadata") or {}
+    if metadata.get("page_count") is not None:
+        return metadata["page_count"]
+    return len(data.get("pages") or [])
+
+
+def _rename_rendition(file_path, offset):
+    return RENDITION_PATTERN.sub(lambda m: f"fileoutpart{int(m.group(1)) + offset}", file_path)
+
+
+def _child_counts(member_parts, prefix):
+    """Highest index per child tag directly below the container ``prefix`` (e.g. number of TR rows)."""
+    counts = Counter()
+    depth = len(prefix)
+    for parts in member_parts:
+        if len(parts) > depth and parts[:depth] == prefix:
+            tag, index = parse_segment(parts[depth])
+            counts[tag] = max(counts[tag], index)
+    return counts
+
+
+def _page_extent(elements, page):
+    """Lowest bottom and highest top of the element Bounds on one page, or None without any."""
+    bounds = [elem["Bounds"] for elem in elements if elem.get("Page") == page and elem.get("Bounds")]
+    if not bounds:
+        return None
+    return min(box[1] for box in bounds), max(box[3] for box in bounds)
+
+
+def _members_of(elements, top):
+    return [elem for elem in elements if split_document_path(elem.get("Path"))[:1] == [top]]
+
+
+def _starts_with_header_row(elements, table_parts):
+    """Whether the first row of a table consists of TH cells only, as a repeated or new table heading does."""
+    depth = len(table_parts)
+    first_row = None
+    cell_tags = set()
+    for elem in elements:
+        parts = split_document_path(elem.get("Path"))
+        if len(parts) <= depth or parts[:depth] != table_parts:
+            continue
+        if first_row is None:
+            first_row = parts[depth]
+        if parts[depth] == first_row and len(parts) > depth + 1:
+            cell_tags.add(parse_segment(parts[depth + 1])[0])
+        elif parts[depth] != first_row:
+            break
+    return cell_tags == {"TH"}
+
+
+def _same_column_span(previous_elem, first_elem):
+    previous_box = (previous_elem or {}).get("Bounds")
+    first_box = first_elem.get("Bounds")
+    if not previous_box or not first_box:
+        return True
+    return (abs(previous_box[0] - first_box[0]) <= MARGIN_TOLERANCE
+            and abs(previous_box[2] - first_box[2]) <= MARGIN_TOLERANCE)
+
+
+def _continued_depth(previous, elements, first_parts):
+    """How many of the leading containers of a shard's first element continue the ones that
+    ended the previous shard: 1 for a table cut by the boundary, 2 for a table inside a Sect.
+
+    Two containers of the same kind meeting at a boundary are often separate ones, so a
+    container only continues when the previous part runs down to the bottom of its last
+    page and this one starts at the top of the shard's first page; a table must also keep
+    its columns and not start with a header row.
+    """
+    if previous is None or not first_parts or not previous["reaches_bottom"]:
+        return 0
+    first_elem = next(elem for elem in elements if split_document_path(elem.get("Path")) == first_parts)
+    if first_elem.get("Page") not in (0, None):
+        return 0
+    extent = _page_extent(elements, 0)
+    first_part_extent = _page_extent(_members_of(elements, first_parts[0]), 0)
+    if extent is None or first_part_extent is None or first_part_extent[1] < extent[1] - MARGIN_TOLERANCE:
+        return 0
+    depth = 0
+    for level, (part, previous_part) in enumerate(zip(first_parts, previous["segments"])):
+        tag, _ = parse_segment(part)
+        if tag != parse_segment(previous_part)[0] or tag not in CONTINUABLE_TAGS:
+            break
+        if tag == "Table":
+            previous_elem = previous["elements"][level]
+            table_elem = next((elem for elem in elements
+                               if split_document_path(elem.get("Path")) == first_parts[:level + 1]), {})
+            previous_cols = (previous_elem or {}).get("attributes", {}).get("NumCol")
+            first_cols = table_elem.get("attributes", {}).get("NumCol")
+            if previous_cols is not None and first_cols is not None and previous_cols != first_cols:
+                break
+            if not _same_column_span(previous_elem, table_elem):
+                break
+            if _starts_with_header_row(elements, first_parts[:level + 1]):
+                break
+        depth += 1
+    return depth
+
+
+def merge_structured_data(shards, contiguous=None):
+    """
+    Merge the structuredData documents of consecutive page-range shards into one document.
+
+    Fixes up everything that Adobe numbers per document so the result looks like a
+    single-shot extraction:
+
+    - ``Page`` is shifted by the page count of the preceding shards,
+    - ``ObjectID`` values are shifted so they stay unique,
+    - top-level path segments (``H1[3]``, ``Table[12]``, ``P[40]``...) are renumbered
+      in document order,
+    - rendition files (``tables/fileoutpartN.xlsx``) are renumbered so shards do not collide,
+    - a Table/List/TOC/Sect that runs to the bottom of one shard and on from the top of the
+      next (see ``_continued_depth``) is stitched back into a single element: the repeated container element is dropped and the indices of its
+      children (``TR``, ``LI``, ``TOCI``, the tables of a Sect) continue the numbering of
+      the first part. Containers nested in a continued one (a table in a Sect) continue
+      the same way, level by level.
+
+    Indices further down (cells of a row, paragraphs of a cell) count siblings within
+    their parent, which lies whole in one shard, so they are kept as they are.
+
+    Args:
+        shards (list[dict]): structuredData documents in page order.
+        contiguous (list[bool], optional): Per boundary between two shards, whether they are
+            consecutive pages of the same source document; containers are only stitched
+            across such a boundary. Defaults to every boundary being contiguous, as for the
+            page-range shards of one PDF.
+
+    Returns:
+        tuple[dict, list[dict]]: The merged document, and per shard a mapping of original
+        to new rendition file names (for copying the files into the merged ZIP).
+    """
+    merged_elements = []
+    merged_pages = []
+    top_counters = Counter()
+    page_offset = 0
+    next_object_id = 0
+    rendition_offset = 0
+    previous = None
+    renames = []
+
+    for shard_index, shard in enumerate(shards):
+        elements = shard.get("elements") or []
+        shard_pages = page_count_of(shard)
+
+        object_ids = [elem["ObjectID"] for elem in elements if isinstance(elem.get("ObjectID"), int)]
+        object_shift = next_object_id - min(object_ids) if object_ids else 0
+
+        rendition_numbers = [int(number)
+                             for elem in elements for file_path in elem.get("filePaths") or []
+                             for number in RENDITION_PATTERN.findall(file_path)]
+        shard_renames = {file_path: _rename_rendition(file_path, rendition_offset)
+                         for elem in elements for file_path in elem.get("filePaths") or []}
+
+        top_map = {}
+        depth = 0
+        continued = []
+        first = next((elem for elem in elements if split_document_path(elem.get("Path"))), None)
+        if first is not None and (contiguous is None or shard_index == 0 or contiguous[shard_index - 1]):
+            first_parts = split_document_path(first.get("Path"))
+            depth = _continued_depth(previous, elements, first_parts)
+            continued = first_parts[:depth]
+        # Per continued container, how far the indices of its children move: past the
+        # previous part's children, and onto the previous part for a continued container
+        offsets = []
+        for level in range(depth):
+            level_offsets = Counter(previous["child_counts"][level])
+            if level + 1 < depth:
+                tag, index = parse_segment(continued[level + 1])
+                level_offsets[tag] = parse_segment(previous["segments"][level + 1])[1] - index
+            offsets.append(level_offsets)
+        if depth:
+            top_map[continued[0]] = previous["segments"][0]
+
+        def renumber(parts):
+            top = parts[0]
+            if top not in top_map:
+                tag, _ = parse_segment(top)
+                top_counters[tag] += 1
+                top_map[top] = format_segment(tag, top_counters[tag])
+            new_parts = [top_map[top]]
+            level = 1
+            while level < len(parts) and level <= depth and parts[level - 1] == continued[level - 1]:
+                if level < depth and parts[level] == continued[level]:
+                    new_parts.append(previous["segments"][level])
+                else:
+                    tag, index = parse_segment(parts[level])
+                    new_parts.append(format_segment(tag, index + offsets[level - 1][tag]))
+                level += 1
+            return new_parts + parts[level:]
+
+        for elem in elements:
+            parts = split_document_path(elem.get("Path"))
+            new_elem = dict(elem)
+
+            if parts:
+                if len(parts) <= depth and parts == continued[:len(parts)]:
+                    # Repeated container element of a continued table/list: fold into the first part
+                    kept = previous["elements"][len(parts) - 1]
+                    if kept is not None:
+                        if elem.get("filePaths"):
+                            kept["filePaths"] = (kept.get("filePaths") or []) + \
+                                [shard_renames[file_path] for file_path in elem["filePaths"]]
+                        kept_rows = kept.get("attributes", {}).get("NumRow")
+                        new_rows = elem.get("attributes", {}).get("NumRow")
+                        if kept_rows is not None and new_rows is not None:
+                            kept["attributes"] = dict(kept["attributes"], NumRow=kept_rows + new_rows)
+                    continue
+                new_elem["Path"] = join_document_path(renumber(parts))
+
+            if isinstance(elem.get("Page"), int):
+                new_elem["Page"] = elem["Page"] + page_offset
+            if isinstance(elem.get("ObjectID"), int):
+                new_elem["ObjectID"] = elem["ObjectID"] + object_shift
+            if elem.get("filePaths"):
+                new_elem["filePaths"] = [shard_renames[file_path] for file_path in elem["filePaths"]]
+            if "attributes" in elem:
+                new_elem["attributes"] = dict(elem["attributes"])
+
+            merged_elements.append(new_elem)
+
+        for page in shard.get("pages") or []:
+            new_page = dict(page)
+            if isinstance(page.get("page_number"), int):
+                new_page["page_number"] = page["page_number"] + page_offset
+            merged_pages.append(new_page)
+
+        # Remember the containers around the end of this shard, in case the next shard continues them
+        last = next((elem for elem in reversed(elements) if split_document_path(elem.get("Path"))), None)
+        if last is not None:
+            last_parts = split_document_path(last.get("Path"))
+            segments = renumber(last_parts)
+            last_extent = _page_extent(elements, shard_pages - 1)
+            last_part_extent = _page_extent(_members_of(elements, last_parts[0]), shard_pages - 1)
+            members = [elem for elem in merged_elements
+                       if split_document_path(elem.get("Path"))[:1] == segments[:1]]
+            member_parts = [split_document_path(elem["Path"]) for elem in members]
+            paths = [join_document_path(segments[:level + 1]) for level in range(len(segments))]
+            previous = {
+                "segments": segments,
+                "child_counts": [_child_counts(member_parts, segments[:level + 1]) for level in range(len(segments))],
+                "elements": [next((elem for elem in members if elem["Path"] == path), None) for path in paths],
+                "reaches_bottom": (last_extent is not None and last_part_extent is not None
+                                   and last_part_extent[0] <= last_extent[0] + MARGIN_TOLERANCE),
+            }
+        else:
+            previous = None
+
+        if object_ids:
+            next_object_id = max(object_ids) + object_shift + 1
+        if rendition_numbers:
+            rendition_offset += max(rendition_numbers) + 1
+        page_offset += shard_pages
+        renames.append(shard_renames)
+
+    merged = {key: copy.deepcopy(value) for key, value in shards[0].items()
+              if key not in ("elements", "pages")} if shards else {}
+    if "extended_metadata" in merged:
+        merged["extended_metadata"]["page_count"] = page_offset
+    merged["elements"] = merged_elements
+    merged["pages"] = merged_pages
+    return merged, renames
+
+
+def _unit_length(parts):
+    """Leading path segments that go to one shard together: the continuable containers
+    around an element and the segment below them (a row, list item or paragraph)."""
+    length = 0
+    while length < len(parts) and parse_segment(parts[length])[0] in CONTINUABLE_TAGS:
+        length += 1
+    return min(length + 1, len(parts))
+
+
+def split_structured_data(data, pages_per_shard):
+    """
+    Cut a single-shot structuredData document into the shards Adobe would return for page ranges.
+
+    Used to check ``merge_structured_data`` offline: every shard restarts top-level
+    numbering and page numbers at zero, and Tables/Lists/TOCs/Sects running over a shard
+    boundary are cut into two containers, as separate extractions produce them; the
+    part in the later shard numbers its children (and a table nested in a cut Sect its
+    rows) from 1 again and has its share of the table's NumRow.
+
+    Adobe's reading order occasionally steps back a page (in the reference protocol a
+    list on page 1 follows TOC rows on page 2). A shard boundary between those pages
+    moves the earlier-page elements ahead of the continuation, so very small shards can
+    differ from the single-shot order; shards of a few pages or more reproduce it.
+    """
+    total_pages = page_count_of(data)
+    return split_structured_data_at(data, list(range(0, max(total_pages, 1), pages_per_shard)))
+
+
+def split_structured_data_at(data, shard_starts):
+    """
+    Cut a structuredData document into shards starting at the given 0-based pages.
+
+    Args:
+        data (dict): structuredData document.
+        shard_starts (list[int]): Ascending first page of every shard; the first must be 0.
+
+    Returns:
+        list[dict]: One structuredData document per shard, numbered as its own extraction.
+    """
+    total_pages = page_count_of(data)
+    shard_count = len(shard_starts)
+    shard_ends = list(shard_starts[1:]) + [total_pages]
+    buckets = [[] for _ in range(shard_count)]
+
+    def shard_of(page):
+        return max(bisect.bisect_right(shard_starts, page) - 1, 0)
+
+    # Group elements by top-level segment, remembering the effective page of each element
+    groups = []
+    current_page = 0
+    for elem in data.get("elements") or []:
+        if isinstance(elem.get("Page"), int):
+            current_page = elem["Page"]
+        parts = split_document_path(elem.get("Path"))
+        top = parts[0] if parts else None
+        if not groups or groups[-1][0] != top:
+            groups.append((top, []))
+        groups[-1][1].append((elem, parts, current_page))
+
+    # Rows/items/paragraphs stay whole; each goes to the shard of its first page, never
+    # backwards within its top-level group
+    placed = []
+    for top, members in groups:
+        running_shard = shard_of(members[0][2])
+        unit_shard = {}
+        for elem, parts, page in members:
+            unit = tuple(parts[:_unit_length(parts)])
+            if unit not in unit_shard:
+                running_shard = max(running_shard, shard_of(page))
+                unit_shard[unit] = running_shard
+            placed.append((elem, parts, unit_shard[unit]))
+
+    started = {}        # container path -> shard it starts in
+    containers = {}     # container path -> its own element
+    duplicates = {}     # (shard, container path) -> copy of the container element in that shard
+    children = {}       # (container path, shard) -> child segments placed there
+    child_base = {}
+
+    def place(elem, parts, target):
+        # Below a container that started in an earlier shard, numbering restarts at 1
+        new_parts = list(parts)
+        for level in range(1, len(parts)):
+            prefix = tuple(parts[:level])
+            if started.get(prefix, target) >= target:
+                break
+            tag, index = parse_segment(parts[level])
+            key = (target, prefix, tag)
+            if key not in child_base:
+                child_base[key] = index - 1
+            new_parts[level] = format_segment(tag, index - child_base[key])
+        buckets[target].append((elem, new_parts))
+
+    for elem, parts, target in placed:
+        chain = 0
+        while chain < len(parts) and parse_segment(parts[chain])[0] in CONTINUABLE_TAGS:
+            chain += 1
+        if parts and chain == len(parts):
+            # A container's own element; copied, as its NumRow is shared out below
+            elem = dict(elem)
+            containers[tuple(parts)] = elem
+        for level in range(1, chain + 1):
+            prefix = tuple(parts[:level])
+            if prefix not in started:
+                started[prefix] = target
+            elif started[prefix] < target and (target, prefix) not in duplicates:
+                # The part of a cut container in a later shard comes with a copy of its element
+                container = containers.get(prefix)
+                duplicate = None
+                if container is not None:
+                    duplicate = {key: value for key, value in container.items() if key not in ("filePaths", "ObjectID")}
+                    duplicate["Page"] = shard_starts[target]
+                    place(duplicate, list(prefix), target)
+                duplicates[(target, prefix)] = duplicate
+            if level < len(parts):
+                children.setdefault((prefix, target), set()).add(parts[level])
+        place(elem, parts, target)
+
+    # A cut table's rows are shared out between its parts, as separate extractions count them
+    for (target, prefix), duplicate in duplicates.items():
+        if duplicate is None or duplicate.get("attributes", {}).get("NumRow") is None:
+            continue
+        container = containers[prefix]
+        part_rows = len(children.get((prefix, target), ()))
+        duplicate["attributes"] = dict(duplicate["attributes"], NumRow=part_rows)
+        container["attributes"] = dict(container["attributes"], NumRow=container["attributes"]["NumRow"] - part_rows)
+
+    shards = []
+    for index, bucket in enumerate(buckets):
+        start = shard_starts[index]
+        end = shard_ends[index]
+        counters = Counter()
+        top_map = {}
+        elements = []
+        for elem, parts in bucket:
+            new_elem = dict(elem)
+            if parts:
+                if parts[0] not in top_map:
+                    tag, _ = parse_segment(parts[0])
+                    counters[tag] += 1
+                    top_map[parts[0]] = format_segment(tag, counters[tag])
+                new_elem["Path"] = join_document_path([top_map[parts[0]]] + parts[1:])
+            if isinstance(elem.get("Page"), int):
+                new_elem["Page"] = elem["Page"] - start
+            elements.append(new_elem)
+
+        shard = {key: copy.deepcopy(value) for key, value in data.items() if key not in ("elements", "pages")}
+        if "extended_metadata" in shard:
+            shard["extended_metadata"]["page_count"] = end - start
+        shard["elements"] = elements
+        shard["pages"] = [dict(page, page_number=page["page_number"] - start)
+                          for page in data.get("pages") or [] if start <= page.get("page_number", -1) < end]
+        shards.append(shard)
+    return shards
+
+
+def structured_data_differences(merged, single):
+    """
+    Where a merged document differs from a single-shot extraction of the same PDF.
+
+    Elements are compared in order, field by field. ObjectIDs are only checked for
+    repeats (Adobe repeats a few itself): separate extractions number their objects on
+    their own, and the merge shifts them apart without restoring the single-shot numbers.
+
+    Returns:
+        list[str]: One line per difference; empty if the documents match.
+    """
+    differences = []
+    merged_elements = merged.get("elements") or []
+    single_elements = single.get("elements") or []
+    if len(merged_elements) != len(single_elements):
+        differences.append(f"{len(merged_elements)} elements, the single-shot extraction has {len(single_elements)}")
+    repeats = [len(ids) - len(set(ids)) for ids in
+               ([elem["ObjectID"] for elem in elements if "ObjectID" in elem]
+                for elements in (merged_elements, single_elements))]
+    if repeats[0] > repeats[1]:
+        differences.append(f"{repeats[0]} repeated ObjectIDs, the single-shot extraction has {repeats[1]}")
+    for index, (elem, expected) in enumerate(zip(merged_elements, single_elements)):
+        fields = sorted(key for key in set(elem) | set(expected)
+                        if key != "ObjectID" and elem.get(key) != expected.get(key))
+        if fields:
+            differences.append(f"element {index} ({expected.get('Path')}): {', '.join(fields)}")
+    for key in ("pages", "extended_metadata"):
+        if merged.get(key) != single.get(key):
+            differences.append(f"{key} differ")
+    return differences
+
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+    from json_struct import load_structured_data, parse_hierarchy
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    if len(sys.argv) > 1:
+        cases = [(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 10)]
+    else:
+        # The protocol, and the eCRF whose pages end and start with different tables
+        cases = [(os.path.join(here, "..", "structuring_protocol_json", "texttablestructured_protocol.json"), 10),
+                 (os.path.join(here, "ExtractTextTableInfoFromPDF.zip"), 2)]
+
+    all_identical = True
+    for input_file, pages_per_shard in cases:
+        original = load_structured_data(input_file)
+        shards = split_structured_data(original, pages_per_shard)
+        merged, _ = merge_structured_data(shards)
+
+        same_paths = [e.get("Path") for e in merged["elements"]] == [e.get("Path") for e in original["elements"]]
+        same_tree = parse_hierarchy(merged["elements"]) == parse_hierarchy(original["elements"])
+        print(f"{os.path.basename(input_file)}: {len(shards)} shards of {pages_per_shard} pages, "
+              f"{len(merged['elements'])} elements")
+        print(f"{'✅' if same_paths else '❌'} paths identical to single-shot extraction")
+        print(f"{'✅' if same_tree else '❌'} parse_hierarchy tree identical to single-shot extraction")
+        all_identical = all_identical and same_paths and same_tree
+    sys.exit(0 if all_identical else 1)
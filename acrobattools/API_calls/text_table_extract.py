@@ -1,12 +1,16 @@
-import json
+import os
+import sys
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from json_struct import load_structured_data
+
 json_file = "../structuring_protocol_json/texttablestructured_protocol.json"
 
 
 def extract_schedule_table(json_file):
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    # Accepts the structuredData.json file or the Adobe result ZIP directly
+    data = load_structured_data(json_file)
 
     # Look for structured table data (lists of dicts), not just keywords in strings
     def find_table_structures(obj, path=""):
@@ -210,6 +210,11 @@
 import json
 import re
 import pandas as pd
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import find_by_name_prefix, subtree_text
+from text_cache import SubtreeTextCache
 
 
 # -----------------------
@@ -221,39 +226,23 @@ def load_json(file_path):
         return json.load(f)
 
 
-def get_node_text(node):
+def get_node_text(node, text_cache=None):
     """Extract all text from a node and its children as a single string."""
-    if not node:
-        return ""
-    text = node.get("text", "") or ""
-    for child in node.get("children", []):
-        text += " " + get_node_text(child)
-    return text.replace('\n', ' ').replace('\r', ' ').strip()
+    if text_cache is not None:
+        return text_cache.subtree_text(node)
+    return subtree_text(node)
 
 
 def find_nodes_by_name(root, name_prefix):
     """Find all nodes whose 'name' starts with name_prefix."""
-    found = []
+    return find_by_name_prefix(root, name_prefix)
 
-    def walk(node):
-        if isinstance(node, dict):
-            if node.get("name", "").startswith(name_prefix):
-                found.append(node)
-            for child in node.get("children", []):
-                walk(child)
-        elif isinstance(node, list):
-            for item in node:
-                walk(item)
 
-    walk(root)
-    return found
-
-
-def flatten_row(row):
+def flatten_row(row, text_cache=None):
     """Flatten a table row into a list of cell texts."""
     texts = []
     for cell in row.get("children", []):
-        texts.append(get_node_text(cell))
+        texts.append(get_node_text(cell, text_cache))
     return texts
 
 
@@ -315,7 +304,7 @@ def is_valid_procedure_row(row):
 # Merge broken tables logic
 # -----------------------
 
-def merge_broken_tables(tables):
+def merge_broken_tables(tables, text_cache=None):
     """
     Merge consecutive tables if the later one has no visit header row
     (i.e., it's a continuation of the previous page's table).
@@ -328,7 +317,7 @@ def merge_broken_tables(tables):
 
     for table in tables:
         rows = find_nodes_by_name(table, "TR")
-        table_content = [flatten_row(row) for row in rows]
+        table_content = [flatten_row(row, text_cache) for row in rows]
         has_visits = any(any(re.search(r'(?:V|P)\d+', str(cell)) for cell in row) for row in table_content)
 
         if buffer is None:
@@ -338,6 +327,8 @@ def merge_broken_tables(tables):
 
         if not has_visits:
             buffer["children"].extend(rows)
+            if text_cache is not None:
+                text_cache.invalidate(buffer)
         else:
             if buffer_has_visits:
                 merged.append(buffer)
@@ -346,6 +337,8 @@ def merge_broken_tables(tables):
             else:
                 buf_rows = find_nodes_by_name(buffer, "TR")
                 table["children"] = buf_rows + table.get("children", [])
+                if text_cache is not None:
+                    text_cache.invalidate(table)
                 buffer = table
                 buffer_has_visits = True
 
@@ -359,15 +352,15 @@ def merge_broken_tables(tables):
 # Main parsing functions
 # -----------------------
 
-def find_all_schedule_tables(root):
+def find_all_schedule_tables(root, text_cache=None):
     """Return all tables that belong to the schedule (merge continuations)."""
     tables = find_nodes_by_name(root, "Table")
-    merged_tables = merge_broken_tables(tables)
+    merged_tables = merge_broken_tables(tables, text_cache)
 
     schedule_tables = []
     for table in merged_tables:
         rows = find_nodes_by_name(table, "TR")
-        table_content = [flatten_row(row) for row in rows]
+        table_content = [flatten_row(row, text_cache) for row in rows]
 
         # Check if this table has visit columns AND actual procedure rows
         has_visits = any(any(re.search(r'(?:V|P)\d+', str(cell)) for cell in row) for row in table_content)
@@ -381,8 +374,10 @@ def find_all_schedule_tables(root):
 
 def parse_protocol_schedule(protocol_data):
     """Parse all multi-page schedule tables into schedule dict {visit: [procedures]} and visit order list."""
+    # Cell texts of this protocol, each built once from its children's
+    text_cache = SubtreeTextCache()
     schedule = {}
-    tables = find_all_schedule_tables(protocol_data)
+    tables = find_all_schedule_tables(protocol_data, text_cache)
 
     if not tables:
         print("Error: No schedule tables found.")
@@ -391,7 +386,7 @@ def parse_protocol_schedule(protocol_data):
     all_rows = []
     for table in tables:
         rows = find_nodes_by_name(table, "TR")
-        all_rows.extend([flatten_row(row) for row in rows])
+        all_rows.extend([flatten_row(row, text_cache) for row in rows])
 
     visit_row = next((row for row in all_rows if any(re.search(r'(?:V|P)\d+', str(cell)) for cell in row)), None)
 
@@ -1,16 +1,22 @@
 # FINAL WORKING CODE
 import json
+import os
+import sys
+
 import pandas as pd
 import re
 
-# Load JSON
-with open("/home/ibab/novohackathon/Extraction/acrobattools/structuring_protocol_json/hierarchical_output_final.json",
-          "r") as f:
-    doc = json.load(f)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from node_index import NodeIndex, open_hierarchy
+
+# Load JSON; with a sidecar node index next to it only the SoA tables and the rationale section are read
+doc = open_hierarchy("/home/ibab/novohackathon/Extraction/acrobattools/structuring_protocol_json/hierarchical_output_final.json")
 
 
 # Recursively find SOA tables
 def find_all_soa_tables(node, soa_tables=None):
+    if isinstance(node, NodeIndex):
+        return node.find_all_soa_tables()
     if soa_tables is None:
         soa_tables = []
     if isinstance(node, dict):
@@ -97,6 +103,8 @@ def extract_visits_and_weeks(tables):
 # ------------------- NEW FUNCTIONS FOR EVENT GROUP -------------------
 def find_element_by_text(data, text_to_find):
     """Recursively search the JSON for an element containing specific text."""
+    if isinstance(data, NodeIndex):
+        return data.find_element_by_text(text_to_find)
     if isinstance(data, dict):
         if text_to_find.lower() in data.get('text', '').lower():
             return data
@@ -2,6 +2,10 @@ import json
 import re
 import sys
 import pandas as pd
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import find_by_name_prefix, subtree_text
+from text_cache import SubtreeTextCache
 
 
 # -----------------------
@@ -12,39 +16,23 @@ def load_json(file_path):
         return json.load(f)
 
 
-def get_node_text(node):
+def get_node_text(node, text_cache=None):
     """Extract all text from a node and its children as a single string."""
-    if not node:
-        return ""
-    text = node.get("text", "") or ""
-    for child in node.get("children", []):
-        text += " " + get_node_text(child)
-    return text.replace('\n', ' ').replace('\r', ' ').strip()
+    if text_cache is not None:
+        return text_cache.subtree_text(node)
+    return subtree_text(node)
 
 
 def find_nodes_by_name(root, name_prefix):
     """Find all nodes whose 'name' starts with name_prefix."""
-    found = []
+    return find_by_name_prefix(root, name_prefix)
 
-    def walk(node):
-        if isinstance(node, dict):
-            if node.get("name", "").startswith(name_prefix):
-                found.append(node)
-            for child in node.get("children", []):
-                walk(child)
-        elif isinstance(node, list):
-            for item in node:
-                walk(item)
 
-    walk(root)
-    return found
-
-
-def flatten_row(row):
+def flatten_row(row, text_cache=None):
     """Flatten a table row into a list of cell texts."""
     texts = []
     for cell in row.get("children", []):
-        texts.append(get_node_text(cell))
+        texts.append(get_node_text(cell, text_cache))
     return texts
 
 
@@ -114,7 +102,7 @@ def find_schedule_end(all_rows, column_to_visit, start_from=0):
 # -----------------------
 # Merge broken tables logic
 # -----------------------
-def merge_broken_tables(tables):
+def merge_broken_tables(tables, text_cache=None):
     """
     Merge consecutive tables if the later one has no visit header row
     (i.e., it's a continuation of the previous page's table).
@@ -127,7 +115,7 @@ def merge_broken_tables(tables):
 
     for table in tables:
         rows = find_nodes_by_name(table, "TR")
-        table_content = [flatten_row(row) for row in rows]
+        table_content = [flatten_row(row, text_cache) for row in rows]
 
         # does this table contain visit or phone headers (V1, P13, etc.) anywhere in its rows?
         has_visits = any(
@@ -143,6 +131,8 @@ def merge_broken_tables(tables):
         if not has_visits:
             # continuation → append TR nodes from this table to buffer's children
             buffer["children"].extend(rows)
+            if text_cache is not None:
+                text_cache.invalidate(buffer)
         else:
             # this table has headers:
             # flush buffer if buffer had headers, else (rare) merge buffer into this as continuation
@@ -156,6 +146,8 @@ def merge_broken_tables(tables):
                 # collect buffer TRs
                 buf_rows = find_nodes_by_name(buffer, "TR")
                 table["children"] = buf_rows + table.get("children", [])
+                if text_cache is not None:
+                    text_cache.invalidate(table)
                 buffer = table
                 buffer_has_visits = True
 
@@ -166,16 +158,16 @@ def merge_broken_tables(tables):
     return merged
 
 
-def find_all_schedule_tables(root):
+def find_all_schedule_tables(root, text_cache=None):
     """Return all tables that belong to the schedule (merge continuations)."""
     tables = find_nodes_by_name(root, "Table")
-    merged_tables = merge_broken_tables(tables)
+    merged_tables = merge_broken_tables(tables, text_cache)
 
     # keep only those merged tables that actually contain visits
     schedule_tables = []
     for table in merged_tables:
         rows = find_nodes_by_name(table, "TR")
-        table_content = [flatten_row(row) for row in rows]
+        table_content = [flatten_row(row, text_cache) for row in rows]
         if any(any(re.search(r'(?:V|P)\d+', str(cell)) for cell in row) for row in table_content):
             schedule_tables.append(table)
     return schedule_tables
@@ -183,8 +175,10 @@ def find_all_schedule_tables(root):
 
 def parse_protocol_schedule(protocol_data):
     """Parse schedule with smart end detection."""
+    # Cell texts of this protocol, each built once from its children's
+    text_cache = SubtreeTextCache()
     schedule = {}
-    tables = find_all_schedule_tables(protocol_data)
+    tables = find_all_schedule_tables(protocol_data, text_cache)
     if not tables:
         print("❌ No schedule tables found")
         return None, None, None
@@ -193,7 +187,7 @@ def parse_protocol_schedule(protocol_data):
     all_rows = []
     for table in tables:
         rows = find_nodes_by_name(table, "TR")
-        all_rows.extend([flatten_row(row) for row in rows])
+        all_rows.extend([flatten_row(row, text_cache) for row in rows])
 
     # Find visit header row
     visit_row = next(
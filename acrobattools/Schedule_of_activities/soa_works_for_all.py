@@ -1,7 +1,14 @@
+import argparse
 import json
+import os
 import re
 import sys
+from functools import lru_cache
 import pandas as pd
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import find_by_name_prefix, subtree_text
+from text_cache import SubtreeTextCache
+from subtree_hash import ResultCache, hash_of, subtree_hashes
 
 # -----------------------
 # ENHANCED CONFIGURATION
@@ -27,6 +34,19 @@ CONFIG = {
 }
 
 
+# Every visit pattern in one alternation, in order of precedence, each as a named group:
+# a single scan finds the matches of all of them and match.lastgroup tells which one matched.
+# The patterns all start with \b; it is written once in front of the groups, which lets the
+# regex engine skip to word starts instead of trying twelve groups at every position
+WORD_BOUNDARY = r"\b"
+VISIT_PATTERN = re.compile(WORD_BOUNDARY + "(?:" + "|".join(f"(?P<visit{index}>{pattern.removeprefix(WORD_BOUNDARY)})"
+                                                         for index, pattern in enumerate(CONFIG["VISIT_PATTERNS"]))
+                           + ")", re.IGNORECASE)
+VISIT_PRECEDENCE = {f"visit{index}": index for index in range(len(CONFIG["VISIT_PATTERNS"]))}
+
+CELL_PATH_PATTERN = re.compile(r'^(.*/TR(?:\[\d+\])?/T[DH](?:\[\d+\])?)(?:/|$)')
+
+
 # -----------------------
 # Helper functions
 # -----------------------
@@ -35,39 +55,107 @@ def load_json(file_path):
         return json.load(f)
 
 
-def get_node_text(node):
-    if not node:
-        return ""
-    text = node.get("text", "") or ""
-    for child in node.get("children", []):
-        text += " " + get_node_text(child)
-    return text.replace('\n', ' ').replace('\r', ' ').strip()
+def get_node_text(node, text_cache=None):
+    if text_cache is not None:
+        return text_cache.subtree_text(node)
+    return subtree_text(node)
 
 
 def find_nodes_by_name(root, name_prefix):
-    found = []
-
-    def walk(node):
-        if isinstance(node, dict):
-            if node.get("name", "").startswith(name_prefix):
-                found.append(node)
-            for child in node.get("children", []):
-                walk(child)
-        elif isinstance(node, list):
-            for item in node:
-                walk(item)
-
-    walk(root)
-    return found
+    return find_by_name_prefix(root, name_prefix)
 
 
-def flatten_row(row):
+def flatten_row(row, text_cache=None):
     texts = []
     for cell in row.get("children", []):
-        texts.append(get_node_text(cell))
+        texts.append(get_node_text(cell, text_cache))
     return texts
 
 
+def table_rows(table, table_store=None, text_cache=None):
+    """Cell texts of every TR row of a (possibly merged) table.
+
+    With a TableStore, rows are taken from the xlsx rendition of the Table they came
+    from, as long as the rendition has exactly one row per TR node; otherwise, and
+    without a store, they are rebuilt from the TD nodes.
+    """
+    rows = find_nodes_by_name(table, "TR")
+    if table_store is None:
+        return [flatten_row(row, text_cache) for row in rows]
+
+    # merge_broken_tables moves whole tables' rows, so group them by the Table they belong to
+    groups = []
+    for row in rows:
+        table_path = row.get("path", "").rsplit("/TR", 1)[0]
+        if not groups or groups[-1][0] != table_path:
+            groups.append((table_path, []))
+        groups[-1][1].append(row)
+
+    result = []
+    for table_path, group in groups:
+        grid = table_store.table_grid(table_path, compact=True)
+        if grid is not None and len(grid) == len(group):
+            result.extend(grid)
+        else:
+            result.extend(flatten_row(row, text_cache) for row in group)
+    return result
+
+
+def node_extent(node):
+    """(page, [x0, y0, x1, y1]) covering a node and its descendants that have bounds, or None.
+
+    Placeholder cells (created for paths without an element of their own) have no bounds,
+    so their box is taken from the text inside them. A node spread over two pages gets
+    the box of its first page.
+    """
+    page, box = None, None
+    stack = [node]
+    while stack:
+        current = stack.pop()
+        bounds = current.get("bounds")
+        if bounds and current.get("page") is not None and (page is None or current["page"] == page):
+            page = current["page"]
+            box = list(bounds) if box is None else [min(box[0], bounds[0]), min(box[1], bounds[1]),
+                                                    max(box[2], bounds[2]), max(box[3], bounds[3])]
+        stack.extend(current.get("children", []))
+    return None if box is None else (page, box)
+
+
+def visit_cells_by_position(header_row, row_nodes, column_to_visit, spatial_index, tolerance=2.0):
+    """Map the path of every cell that lies under a visit header cell to that visit.
+
+    The column of each visit is the horizontal extent of its header cell; on every page
+    the schedule rows are on, the spatial index returns the nodes in that column, and
+    each is attributed to the TD/TH cell it belongs to. Returns None when the header
+    cells have no geometry (a hierarchy built without layout).
+    """
+    header_cells = header_row.get("children", [])
+    columns = []
+    for col, visit in column_to_visit.items():
+        extent = node_extent(header_cells[col]) if col < len(header_cells) else None
+        if extent is not None:
+            columns.append((extent[1][0] - tolerance, extent[1][2] + tolerance, visit))
+    if not columns:
+        return None
+
+    pages = {extent[0] for extent in map(node_extent, row_nodes) if extent is not None}
+    left, right = min(x0 for x0, _, _ in columns), max(x1 for _, x1, _ in columns)
+    cell_visits = {}
+    for page in sorted(pages):
+        top = spatial_index.page_sizes[page][1] if page < len(spatial_index.page_sizes) else float("inf")
+        for node in spatial_index.query(page, (left, 0, right, top)):
+            cell = CELL_PATH_PATTERN.match(node.get("path", ""))
+            if not cell or cell.group(1) in cell_visits:
+                continue
+            x0, _, x1, _ = node["bounds"]
+            centre = (x0 + x1) / 2
+            for column_left, column_right, visit in columns:
+                if column_left <= centre <= column_right:
+                    cell_visits[cell.group(1)] = visit
+                    break
+    return cell_visits
+
+
 def cell_has_marker(text):
     if not isinstance(text, str):
         return False
@@ -82,21 +170,32 @@ def extract_complete_visit_identifier(text):
     if not isinstance(text, str):
         return None
 
-    text = text.strip()
+    return match_visit_identifier(text.strip())
 
-    # Try patterns with word boundaries
-    for pattern in CONFIG["VISIT_PATTERNS"]:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            longest_match = max(matches, key=len)
 
-            # CRITICAL FIX: Check if the match is a significant portion of the text
-            # This prevents "V2" from matching inside "TFEQ-R18V2"
-            text_no_spaces = text.replace(' ', '').replace('(', '').replace(')', '').replace('-', '')
-            match_proportion = len(longest_match) / len(text_no_spaces)
+@lru_cache(maxsize=8192)
+def match_visit_identifier(text):
+    """Visit identifier of a stripped cell text, worked out once per distinct text."""
+    # Longest match of each pattern, from one scan of the text
+    longest_matches = {}
+    for match in VISIT_PATTERN.finditer(text):
+        found = match.group()
+        if len(found) > len(longest_matches.get(match.lastgroup, "")):
+            longest_matches[match.lastgroup] = found
+    if not longest_matches:
+        return None
+
+    # Try patterns with word boundaries, in order of precedence
+    text_no_spaces = text.replace(' ', '').replace('(', '').replace(')', '').replace('-', '')
+    for group in sorted(longest_matches, key=VISIT_PRECEDENCE.get):
+        longest_match = longest_matches[group]
+
+        # CRITICAL FIX: Check if the match is a significant portion of the text
+        # This prevents "V2" from matching inside "TFEQ-R18V2"
+        match_proportion = len(longest_match) / len(text_no_spaces)
 
-            if match_proportion > 0.3:  # Match must be >30% of the text
-                return longest_match
+        if match_proportion > 0.3:  # Match must be >30% of the text
+            return longest_match
 
     return None
 
@@ -180,7 +279,7 @@ def find_schedule_end(all_rows, column_to_visit, start_from=0):
     return len(all_rows)
 
 
-def merge_broken_tables(tables):
+def merge_broken_tables(tables, text_cache=None):
     if not tables:
         return []
 
@@ -189,7 +288,7 @@ def merge_broken_tables(tables):
 
     for table in tables:
         rows = find_nodes_by_name(table, "TR")
-        table_content = [flatten_row(row) for row in rows]
+        table_content = [flatten_row(row, text_cache) for row in rows]
 
         has_visits = False
         for row in table_content:
@@ -205,6 +304,8 @@ def merge_broken_tables(tables):
 
         if not has_visits:
             buffer["children"].extend(rows)
+            if text_cache is not None:
+                text_cache.invalidate(buffer)
         else:
             if buffer_has_visits:
                 merged.append(buffer)
@@ -213,6 +314,8 @@ def merge_broken_tables(tables):
             else:
                 buf_rows = find_nodes_by_name(buffer, "TR")
                 table["children"] = buf_rows + table.get("children", [])
+                if text_cache is not None:
+                    text_cache.invalidate(table)
                 buffer = table
                 buffer_has_visits = True
 
@@ -222,14 +325,14 @@ def merge_broken_tables(tables):
     return merged
 
 
-def find_all_schedule_tables(root):
+def find_all_schedule_tables(root, text_cache=None):
     tables = find_nodes_by_name(root, "Table")
-    merged_tables = merge_broken_tables(tables)
+    merged_tables = merge_broken_tables(tables, text_cache)
 
     schedule_tables = []
     for table in merged_tables:
         rows = find_nodes_by_name(table, "TR")
-        table_content = [flatten_row(row) for row in rows]
+        table_content = [flatten_row(row, text_cache) for row in rows]
 
         has_visit_patterns = False
         for row in table_content:
@@ -244,17 +347,50 @@ def find_all_schedule_tables(root):
     return schedule_tables
 
 
-def parse_protocol_schedule(protocol_data):
+def schedule_cache_key(protocol_data, table_store=None, spatial_index=None):
+    """Result cache key of a protocol's schedule: the subtree hashes of all its tables, in order.
+
+    Broken tables are merged with their neighbours before the schedule is read, so the
+    schedule depends on the whole sequence of tables, not on any single one.
+    """
+    tables = find_nodes_by_name(protocol_data, "Table")
+    hashes = None if all(isinstance(table.get("hash"), str) for table in tables) else subtree_hashes(protocol_data)
+    mode = "xlsx" if table_store is not None else "position" if spatial_index is not None else "text"
+    return "soa:" + mode + ":" + ",".join(hash_of(table, hashes) for table in tables)
+
+
+def parse_protocol_schedule(protocol_data, table_store=None, spatial_index=None, cache=None):
+    """Visits, procedures and the visit -> procedures schedule of a protocol hierarchy.
+
+    With a SpatialIndex over a hierarchy built with layout, a marker is attributed to the
+    visit whose header cell it sits under, instead of the visit at the same cell position
+    in its row. With a ResultCache, a schedule already extracted from the same tables
+    (e.g. by the run on the previous protocol version) is reused.
+    """
+    if cache is not None:
+        cache_key = schedule_cache_key(protocol_data, table_store, spatial_index)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("♻️ Tables unchanged since the cached run, reusing the schedule")
+            return tuple(cached)
+        result = parse_protocol_schedule(protocol_data, table_store, spatial_index)
+        if result[0]:
+            cache.put(cache_key, list(result))
+        return result
+
+    # Cell texts of this protocol, each built once from its children's
+    text_cache = SubtreeTextCache()
     schedule = {}
-    tables = find_all_schedule_tables(protocol_data)
+    tables = find_all_schedule_tables(protocol_data, text_cache)
     if not tables:
         print("❌ No schedule tables found")
         return None, None, None
 
     all_rows = []
+    row_nodes = []
     for table in tables:
-        rows = find_nodes_by_name(table, "TR")
-        all_rows.extend([flatten_row(row) for row in rows])
+        all_rows.extend(table_rows(table, table_store, text_cache))
+        row_nodes.extend(find_nodes_by_name(table, "TR"))
 
     visit_row = detect_visit_header_row(all_rows)
 
@@ -294,6 +430,10 @@ def parse_protocol_schedule(protocol_data):
             header_row_index = i
             break
 
+    cell_visits = None
+    if spatial_index is not None:
+        cell_visits = visit_cells_by_position(row_nodes[header_row_index], row_nodes, column_to_visit, spatial_index)
+
     end_index = find_schedule_end(all_rows, column_to_visit, header_row_index + 1)
     print(f"🎯 Processing rows {header_row_index + 1} to {end_index}")
 
@@ -312,17 +452,22 @@ def parse_protocol_schedule(protocol_data):
 
         procedure = first_cell
 
-        has_markers = any(cell_has_marker(str(row[col])) if col < len(row) else False
-                          for col in column_to_visit.keys())
+        if cell_visits is not None:
+            marked_visits = []
+            for cell in row_nodes[i].get("children", []):
+                visit_name = cell_visits.get(cell.get("path"))
+                if visit_name and visit_name not in marked_visits and cell_has_marker(get_node_text(cell, text_cache)):
+                    marked_visits.append(visit_name)
+        else:
+            marked_visits = [visit_name for col, visit_name in column_to_visit.items()
+                             if col < len(row) and cell_has_marker(row[col])]
 
-        if has_markers:
+        if marked_visits:
             if procedure not in procedure_order:
                 procedure_order.append(procedure)
 
-            for col, visit_name in column_to_visit.items():
-                cell_text = row[col] if col < len(row) else ""
-                if cell_has_marker(cell_text):
-                    schedule.setdefault(visit_name, []).append(procedure)
+            for visit_name in marked_visits:
+                schedule.setdefault(visit_name, []).append(procedure)
 
     return schedule, visit_order, procedure_order
 
@@ -351,16 +496,31 @@ def save_schedule_to_csv(schedule, visit_order, procedure_order, output_path="sc
 # Main script
 # -----------------------
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        file_path = "../structuring_protocol_json/hierarchical_output_final3.json"
-    else:
-        file_path = sys.argv[1]
+    parser = argparse.ArgumentParser(description="Extract the schedule of activities from a protocol hierarchy.")
+    parser.add_argument("file_path", nargs="?", default="../structuring_protocol_json/hierarchical_output_final3.json",
+                        help="Hierarchy JSON of the protocol")
+    # Optional: structuredData.json (or extraction ZIP) and table renditions folder,
+    # to read the schedule grid from the xlsx renditions
+    parser.add_argument("structured_data", nargs="?", help="structuredData.json or extraction ZIP of the protocol")
+    parser.add_argument("tables_dir", nargs="?", help="Folder of the table renditions, for a plain .json source")
+    parser.add_argument("--cache", help="Keep schedules by table hashes in this file, "
+                                        "to skip unchanged protocol versions")
+    args = parser.parse_args()
+
+    file_path = args.file_path
+    cache = ResultCache(args.cache) if args.cache else None
+    table_store = None
+    if args.structured_data:
+        from table_store import TableStore
+        table_store = TableStore(args.structured_data, tables_dir=args.tables_dir)
 
     print(f"🔍 Processing file: {file_path}")
 
     try:
         protocol_json = load_json(file_path)
-        schedule, visit_order, procedure_order = parse_protocol_schedule(protocol_json)
+        schedule, visit_order, procedure_order = parse_protocol_schedule(protocol_json, table_store, cache=cache)
+        if cache is not None:
+            cache.save()
 
         if schedule:
             print(f"\n✅ Successfully extracted schedule")
@@ -1,6 +1,10 @@
 import json
 import re
 import sys
+import os
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import find_by_name_prefix, subtree_text
+from text_cache import SubtreeTextCache
 
 # -----------------------
 # Helper functions
@@ -9,57 +13,43 @@ def load_json(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def get_node_text(node):
+def get_node_text(node, text_cache=None):
     """Extract all text from a node and its children as a single string."""
-    if not node:
-        return ""
-    text = node.get("text", "") or ""
-    for child in node.get("children", []):
-        text += " " + get_node_text(child)
-    return text.replace('\n', ' ').replace('\r', ' ').strip()
+    if text_cache is not None:
+        return text_cache.subtree_text(node)
+    return subtree_text(node)
 
 def find_nodes_by_name(root, name_prefix):
     """Find all nodes whose 'name' starts with name_prefix."""
-    found = []
+    return find_by_name_prefix(root, name_prefix)
 
-    def walk(node):
-        if isinstance(node, dict):
-            if node.get("name", "").startswith(name_prefix):
-                found.append(node)
-            for child in node.get("children", []):
-                walk(child)
-        elif isinstance(node, list):
-            for item in node:
-                walk(item)
-
-    walk(root)
-    return found
-
-def flatten_row(row):
+def flatten_row(row, text_cache=None):
     """Flatten a table row into a list of cell texts."""
     texts = []
     for cell in row.get("children", []):
-        texts.append(get_node_text(cell))
+        texts.append(get_node_text(cell, text_cache))
     return texts
 
 # -----------------------
 # Main parsing functions
 # -----------------------
-def find_all_schedule_tables(root):
+def find_all_schedule_tables(root, text_cache=None):
     """Return all tables that contain visit headers (V1, V2, ...)."""
     tables = find_nodes_by_name(root, "Table")
     schedule_tables = []
     for table in tables:
         rows = find_nodes_by_name(table, "TR")
-        table_content = [flatten_row(row) for row in rows]
+        table_content = [flatten_row(row, text_cache) for row in rows]
         if any(any(re.search(r'\bV\d+\b', str(cell)) for cell in row) for row in table_content):
             schedule_tables.append(table)
     return schedule_tables
 
 def parse_protocol_schedule(protocol_data):
     """Parse all multi-page schedule tables."""
+    # Cell texts of this protocol, each built once from its children's
+    text_cache = SubtreeTextCache()
     schedule = {}
-    tables = find_all_schedule_tables(protocol_data)
+    tables = find_all_schedule_tables(protocol_data, text_cache)
     if not tables:
         print("❌ No schedule tables found")
         return None
@@ -68,7 +58,7 @@ def parse_protocol_schedule(protocol_data):
     all_rows = []
     for table in tables:
         rows = find_nodes_by_name(table, "TR")
-        all_rows.extend([flatten_row(row) for row in rows])
+        all_rows.extend([flatten_row(row, text_cache) for row in rows])
 
     # DEBUG: print all rows
     for i, row in enumerate(all_rows):
@@ -2,6 +2,10 @@
 import json
 import csv
 import re
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import Visitor, walk_visitors
 
 
 def get_text(node):
@@ -350,56 +354,216 @@ def is_valid_form_label(text):
     return True
 
 
-def deep_search_visits(node):
-    """Recursively search all descendants for visit strings."""
-    visits = set()
-    if not isinstance(node, dict):
-        return visits
-    text = get_text(node)
-    visits.update(extract_visit_strings(text))
-    for child in node.get("children", []):
-        visits.update(deep_search_visits(child))
-    return visits
-
-
-def deep_search_triggers(node, max_depth=5, current_depth=0):
-    """Recursively search for triggers with increased depth for better coverage."""
-    triggers = []
-    if not isinstance(node, dict) or current_depth > max_depth:
-        return triggers
-    text = get_text(node)
-    trigger_info = extract_trigger_info(text)
-    if trigger_info:
-        triggers.append({
-            'text': trigger_info,
-            'depth': current_depth
-        })
-    for child in node.get("children", []):
-        triggers.extend(deep_search_triggers(child, max_depth, current_depth + 1))
-    return triggers
-
-
-def find_sibling_visits(node, siblings):
-    """Find visits from sibling nodes."""
-    visits = set()
-    try:
-        current_index = siblings.index(node)
-        for i in range(max(0, current_index - 2), min(len(siblings), current_index + 3)):
-            if i != current_index:
-                sibling_visits = deep_search_visits(siblings[i])
-                visits.update(sibling_visits)
-    except ValueError:
-        pass
-    return visits
-
-
-def find_next_h1_trigger(h1_sections, current_index):
+# Everything extract_forms_with_final_corrections needs from the tree (required-key markers,
+# H1 sections, visits, triggers, context text and form headers) is gathered by the visitors
+# below in a single walk_visitors pass, and joined per H1 section and form afterwards.
+
+MAX_TRIGGER_DEPTH = 7  # the deepest trigger search: a form's own subtree
+MAX_CONTEXT_PARTS = 20  # extract_document_context stops once it holds more parts than this
+REQUIRED_PATTERN = re.compile(r'.*Key\s*:\s*\[\*\]\s*=\s*Item\s+is\s+required\.?\s*.*', re.IGNORECASE)
+
+
+class NodeFacts(Visitor):
+    """Text of the node being entered and whether it is a form name, for the other visitors."""
+
+    def __init__(self):
+        self.text = ""
+        self.is_form_name = False
+
+    def enter(self, node, walk):
+        self.text = get_text(node)
+        self.is_form_name = is_valid_form_name(self.text)
+
+
+class RequiredPatternVisitor(Visitor):
+    """Form-name nodes and "Key: [*] = Item is required" nodes, in document order."""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.form_nodes = []
+        self.required_nodes = []
+
+    def _info(self, node, walk):
+        return {
+            'node': node,
+            'text': self.facts.text,
+            'path': node.get('path', ''),
+            'name': node.get('name', ''),
+            'ancestry': walk.ancestors + [node],
+            'depth': walk.depth
+        }
+
+    def enter(self, node, walk):
+        if self.facts.is_form_name:
+            self.form_nodes.append(self._info(node, walk))
+        if REQUIRED_PATTERN.search(self.facts.text):
+            self.required_nodes.append(self._info(node, walk))
+
+
+class H1SectionVisitor(Visitor):
+    """H1 nodes, nested ones included, in document order with their pre-order positions."""
+
+    def __init__(self):
+        self.sections = []  # (position, node)
+
+    def enter(self, node, walk):
+        if node.get('name', '').startswith('H1'):
+            self.sections.append((walk.position, node))
+
+
+class VisitStringVisitor(Visitor):
+    """Visit strings found anywhere in the subtree of every node."""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.subtree_visits = {}  # id(node) -> set
+        self._open = []  # visits so far of each node on the path from the root
+
+    def enter(self, node, walk):
+        self._open.append(set(extract_visit_strings(self.facts.text)))
+
+    def leave(self, node, walk):
+        visits = self._open.pop()
+        self.subtree_visits[id(node)] = visits
+        if self._open:
+            self._open[-1].update(visits)
+
+    def visits(self, node):
+        """The visits of the node and all its descendants (a new set)."""
+        return set(self.subtree_visits.get(id(node), ()))
+
+
+class TriggerVisitor(Visitor):
+    """Triggers in the subtree of every node, down to MAX_TRIGGER_DEPTH levels below it."""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.subtree_triggers = {}  # id(node) -> [(trigger text, depth below the node)], document order
+        self._open = []
+
+    def enter(self, node, walk):
+        trigger_info = extract_trigger_info(self.facts.text)
+        self._open.append([(trigger_info, 0)] if trigger_info else [])
+
+    def leave(self, node, walk):
+        triggers = self._open.pop()
+        self.subtree_triggers[id(node)] = triggers
+        if self._open and triggers:
+            self._open[-1].extend((text, depth + 1) for text, depth in triggers if depth < MAX_TRIGGER_DEPTH)
+
+    def triggers(self, node, max_depth=5):
+        """Triggers of the node and its descendants at most ``max_depth`` levels down."""
+        return [{'text': text, 'depth': depth}
+                for text, depth in self.subtree_triggers.get(id(node), ()) if depth <= max_depth]
+
+
+class _ContextParts:
+    """The document context of one node, fed the nodes of its subtree in document order."""
+
+    __slots__ = ("parts", "last", "done")
+
+    def __init__(self):
+        self.parts = []
+        self.last = None
+        self.done = False
+
+    def add(self, node, text):
+        # Past the limit, the recursive extract_document_context only carried on into the
+        # first child of the node it had just visited, then stopped on the way back up
+        if len(self.parts) > MAX_CONTEXT_PARTS:
+            children = self.last.get("children")
+            if not children or children[0] is not node:
+                self.done = True
+                return
+        if text and len(text) > 10:  # Only meaningful text
+            self.parts.append(text[:200])  # Limit to prevent excessive length
+        self.last = node
+
+
+class ContextTextVisitor(Visitor):
+    """Document context (the first meaningful texts of the subtree) of the root, of every
+    H1 node and of every form-name node."""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.contexts = {}  # id(node) -> text
+        self._open = []  # (node, _ContextParts) still taking nodes, outermost first
+
+    def _finish(self, node, parts):
+        self.contexts[id(node)] = " ".join(parts.parts)
+
+    def enter(self, node, walk):
+        if walk.depth == 0 or self.facts.is_form_name or node.get('name', '').startswith('H1'):
+            self._open.append((node, _ContextParts()))
+        text = self.facts.text
+        still_open = []
+        for start, parts in self._open:
+            parts.add(node, text)
+            if parts.done:
+                self._finish(start, parts)
+            else:
+                still_open.append((start, parts))
+        self._open = still_open
+
+    def leave(self, node, walk):
+        for i, (start, parts) in enumerate(self._open):
+            if start is node:
+                del self._open[i]
+                self._finish(start, parts)
+                break
+
+    def context(self, node):
+        return self.contexts.get(id(node), "")
+
+
+class FormHeaderVisitor(Visitor):
+    """Form-name nodes of every H1 section (nested H1s count in the outer section too) with
+    their label: the last valid H2 label on the way down from the H1, or None."""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.forms = {}  # H1 position -> [(node, label, parent's children or None, index)]
+        self._labels = [{}]  # for each node on the path: H1 position -> label
+
+    def enter(self, node, walk):
+        labels = self._labels[-1]
+        node_name = node.get("name", "")
+        if node_name.startswith("H1"):
+            labels = dict(labels)
+            labels[walk.position] = None
+            self.forms[walk.position] = []
+        if labels:
+            node_text = self.facts.text
+            # Update label logic for H2 sections
+            if node_name.startswith("H2") and not self.facts.is_form_name and is_valid_form_label(node_text):
+                labels = dict.fromkeys(labels, node_text)
+            if self.facts.is_form_name:
+                for section, label in labels.items():
+                    # The H1 itself is searched without siblings
+                    siblings = None if section == walk.position else walk.siblings
+                    self.forms[section].append((node, label, siblings, walk.index))
+        self._labels.append(labels)
+
+    def leave(self, node, walk):
+        self._labels.pop()
+
+
+def find_sibling_visits(siblings, current_index, visits):
+    """Find visits from the sibling nodes up to two places away."""
+    sibling_visits = set()
+    for i in range(max(0, current_index - 2), min(len(siblings), current_index + 3)):
+        if i != current_index:
+            sibling_visits.update(visits.visits(siblings[i]))
+    return sibling_visits
+
+
+def find_next_h1_trigger(h1_sections, current_index, triggers):
     """Look for triggers in the next H1 section if none found."""
     if current_index + 1 >= len(h1_sections):
         return None
     next_h1 = h1_sections[current_index + 1]
-    triggers = deep_search_triggers(next_h1)
-    return triggers[0]['text'] if triggers else None
+    next_triggers = triggers.triggers(next_h1)
+    return next_triggers[0]['text'] if next_triggers else None
 
 
 def is_enr_form(form_name):
@@ -452,49 +616,9 @@ def extract_section_number(path):
     return 0
 
 
-def find_all_required_patterns_globally_fixed(data):
-    """Fixed mapping with proper section number extraction."""
+def map_required_patterns(all_form_nodes, all_required_nodes):
+    """Map each required pattern node to the closest form node by section number."""
     required_mappings = {}
-    all_form_nodes = []
-    all_required_nodes = []
-
-    def collect_nodes(node, path_ancestry=[], depth=0):
-        if not isinstance(node, dict):
-            return
-
-        current_path = path_ancestry + [node]
-        text = get_text(node)
-        node_path = node.get('path', '')
-        node_name = node.get('name', '')
-
-        # Collect form nodes
-        if is_valid_form_name(text):
-            all_form_nodes.append({
-                'node': node,
-                'text': text,
-                'path': node_path,
-                'name': node_name,
-                'ancestry': current_path,
-                'depth': depth
-            })
-
-        # Collect required pattern nodes
-        required_pattern = re.compile(r'.*Key\s*:\s*\[\*\]\s*=\s*Item\s+is\s+required\.?\s*.*', re.IGNORECASE)
-        if re.search(required_pattern, text):
-            all_required_nodes.append({
-                'node': node,
-                'text': text,
-                'path': node_path,
-                'name': node_name,
-                'ancestry': current_path,
-                'depth': depth
-            })
-
-        # Recurse through children
-        for child in node.get("children", []):
-            collect_nodes(child, current_path, depth + 1)
-
-    collect_nodes(data)
 
     print(f"Found {len(all_form_nodes)} total form nodes")
     print(f"Found {len(all_required_nodes)} required pattern nodes")
@@ -538,6 +662,14 @@ def find_all_required_patterns_globally_fixed(data):
     return required_mappings
 
 
+def find_all_required_patterns_globally_fixed(data):
+    """Fixed mapping with proper section number extraction."""
+    facts = NodeFacts()
+    required = RequiredPatternVisitor(facts)
+    walk_visitors(data, [facts, required])
+    return map_required_patterns(required.form_nodes, required.required_nodes)
+
+
 def is_required_global(form_name, required_mappings):
     """Check if a form is required using global mapping."""
     return form_name in required_mappings
@@ -548,144 +680,106 @@ def extract_forms_with_final_corrections(data):
     results = []
     seen_forms = set()
     all_triggers = []
-    h1_sections = []
+
+    # One pass over the tree collects what every step below needs
+    facts = NodeFacts()
+    required = RequiredPatternVisitor(facts)
+    sections = H1SectionVisitor()
+    visits = VisitStringVisitor(facts)
+    triggers = TriggerVisitor(facts)
+    contexts = ContextTextVisitor(facts)
+    headers = FormHeaderVisitor(facts)
+    walk_visitors(data, [facts, required, sections, visits, triggers, contexts, headers])
 
     # *** FIXED REQUIRED PATTERN MAPPING ***
-    required_mappings = find_all_required_patterns_globally_fixed(data)
+    required_mappings = map_required_patterns(required.form_nodes, required.required_nodes)
     print(f"Required mappings found: {len(required_mappings)} forms")
 
-    def gather_h1_sections(node):
-        if not isinstance(node, dict):
-            return
-        if node.get('name', '').startswith('H1'):
-            h1_sections.append(node)
-        for child in node.get('children', []):
-            gather_h1_sections(child)
-
-    gather_h1_sections(data)
-
-    # Extract overall document context for source determination
-    def extract_document_context(node, context_parts=None):
-        if context_parts is None:
-            context_parts = []
-        if not isinstance(node, dict):
-            return " ".join(context_parts)
-        text = get_text(node)
-        if text and len(text) > 10:  # Only meaningful text
-            context_parts.append(text[:200])  # Limit to prevent excessive length
-        for child in node.get("children", []):
-            extract_document_context(child, context_parts)
-            if len(context_parts) > 20:  # Limit context size
-                break
-        return " ".join(context_parts)
+    h1_sections = [h1_node for _, h1_node in sections.sections]
 
-    document_context = extract_document_context(data)
+    # Overall document context for source determination
+    document_context = contexts.context(data)
 
-    for idx, h1_node in enumerate(h1_sections):
+    for idx, (position, h1_node) in enumerate(sections.sections):
         h1_text = get_text(h1_node)
         if not is_valid_form_label(h1_text):
             h1_text = "Unknown Section"
 
-        section_visits = deep_search_visits(h1_node)
-        section_triggers = deep_search_triggers(h1_node, max_depth=6)
-        next_trigger = find_next_h1_trigger(h1_sections, idx)
-
-        # Extract section context for source determination
-        section_context = extract_document_context(h1_node)
+        section_visits = visits.visits(h1_node)
+        section_triggers = triggers.triggers(h1_node, max_depth=6)
+        next_trigger = find_next_h1_trigger(h1_sections, idx, triggers)
 
-        def find_forms_in_node(node, current_label=None, parent_siblings=None, ancestors=None):
-            if ancestors is None:
-                ancestors = []
-
-            if not isinstance(node, dict):
-                return
+        # Section context for source determination
+        section_context = contexts.context(h1_node)
 
-            node_name = node.get("name", "")
+        for node, current_label, parent_siblings, node_index in headers.forms[position]:
             node_text = get_text(node)
-            children = node.get("children", [])
-
-            # Update label logic for H2 sections
-            if node_name.startswith("H2") and is_valid_form_label(node_text) and not is_valid_form_name(node_text):
-                current_label = node_text
-
-            if is_valid_form_name(node_text):
-                form_name = node_text
-                form_label = current_label if current_label else h1_text
-
-                form_visits = deep_search_visits(node)
+            form_name = node_text
+            form_label = current_label if current_label else h1_text
+
+            form_visits = visits.visits(node)
+            if parent_siblings:
+                form_visits.update(find_sibling_visits(parent_siblings, node_index, visits))
+            if not form_visits:
+                form_visits = section_visits
+            visits_str = ", ".join(sorted(form_visits, key=lambda x: (
+                int(re.search(r'\d+', x).group()) if re.search(r'\d+', x) else 9999,
+                x
+            )))
+
+            form_key = (form_label, form_name, visits_str)
+
+            if form_key not in seen_forms:
+                # Enhanced trigger search with wider scope
+                form_triggers = triggers.triggers(node, max_depth=7)
                 if parent_siblings:
-                    sibling_visits = find_sibling_visits(node, parent_siblings)
-                    form_visits.update(sibling_visits)
-                if not form_visits:
-                    form_visits = section_visits
-                visits_str = ", ".join(sorted(form_visits, key=lambda x: (
-                    int(re.search(r'\d+', x).group()) if re.search(r'\d+', x) else 9999,
-                    x
-                )))
-
-                form_key = (form_label, form_name, visits_str)
-
-                if form_key not in seen_forms:
-                    # Enhanced trigger search with wider scope
-                    form_triggers = deep_search_triggers(node, max_depth=7)
-                    if parent_siblings:
-                        try:
-                            current_index = parent_siblings.index(node)
-                            for i in range(max(0, current_index - 8), min(len(parent_siblings), current_index + 9)):
-                                if i != current_index:
-                                    sibling_triggers = deep_search_triggers(parent_siblings[i], max_depth=5)
-                                    form_triggers.extend(sibling_triggers)
-                        except ValueError:
-                            pass
-                    if not form_triggers:
-                        form_triggers = section_triggers
-                    if not form_triggers and next_trigger:
-                        form_triggers.append({'text': next_trigger, 'depth': 0})
-
-                    # Special handling for ENR form - should be No
-                    if is_enr_form(form_name):
-                        form_triggers = []  # Force to No for ENR
-
-                    # Deduplicate and validate triggers
-                    unique_triggers = list(set(t['text'] for t in form_triggers if extract_trigger_info(t['text'])))
-                    all_triggers.extend(unique_triggers)
-
-                    has_trigger = len(unique_triggers) > 0
-                    trigger_details = unique_triggers[0] if has_trigger else ""
-
-                    # *** DETERMINE SOURCE HERE ***
-                    # Extract node-specific context
-                    node_context = extract_document_context(node)
-                    # Determine source using comprehensive analysis
-                    source = determine_form_source(
-                        form_name=form_name,
-                        form_text=node_text,
-                        context_text=f"{section_context} {node_context}",
-                        document_context=document_context
-                    )
-
-                    # *** FIXED REQUIRED DETECTION ***
-                    required_flag = "Yes" if is_required_global(form_name, required_mappings) else "No"
-
-                    # DEBUG: Print which forms are being marked as required
-                    if required_flag == "Yes":
-                        print(f"REQUIRED FORM DETECTED: {form_name}")
-
-                    results.append({
-                        "Form Label": form_label,
-                        "Form Name": form_name,
-                        "Source": source,
-                        "Visits": visits_str,
-                        "Dynamic Trigger": "Yes" if has_trigger else "No",
-                        "Trigger Details": trigger_details,
-                        "Required": required_flag
-                    })
-                    seen_forms.add(form_key)
-
-            for child in children:
-                find_forms_in_node(child, current_label, children, ancestors + [node])
-
-        find_forms_in_node(h1_node, None, None, [])
+                    for i in range(max(0, node_index - 8), min(len(parent_siblings), node_index + 9)):
+                        if i != node_index:
+                            form_triggers.extend(triggers.triggers(parent_siblings[i], max_depth=5))
+                if not form_triggers:
+                    form_triggers = section_triggers
+                if not form_triggers and next_trigger:
+                    form_triggers.append({'text': next_trigger, 'depth': 0})
+
+                # Special handling for ENR form - should be No
+                if is_enr_form(form_name):
+                    form_triggers = []  # Force to No for ENR
+
+                # Deduplicate and validate triggers
+                unique_triggers = list(set(t['text'] for t in form_triggers if extract_trigger_info(t['text'])))
+                all_triggers.extend(unique_triggers)
+
+                has_trigger = len(unique_triggers) > 0
+                trigger_details = unique_triggers[0] if has_trigger else ""
+
+                # *** DETERMINE SOURCE HERE ***
+                # Node-specific context
+                node_context = contexts.context(node)
+                # Determine source using comprehensive analysis
+                source = determine_form_source(
+                    form_name=form_name,
+                    form_text=node_text,
+                    context_text=f"{section_context} {node_context}",
+                    document_context=document_context
+                )
+
+                # *** FIXED REQUIRED DETECTION ***
+                required_flag = "Yes" if is_required_global(form_name, required_mappings) else "No"
+
+                # DEBUG: Print which forms are being marked as required
+                if required_flag == "Yes":
+                    print(f"REQUIRED FORM DETECTED: {form_name}")
+
+                results.append({
+                    "Form Label": form_label,
+                    "Form Name": form_name,
+                    "Source": source,
+                    "Visits": visits_str,
+                    "Dynamic Trigger": "Yes" if has_trigger else "No",
+                    "Trigger Details": trigger_details,
+                    "Required": required_flag
+                })
+                seen_forms.add(form_key)
 
     # Consolidate duplicates
     results = consolidate_duplicates(results)
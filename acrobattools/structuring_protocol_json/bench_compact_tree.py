@@ -0,0 +1,84 @@
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import tempfile
+import tracemalloc
+
+from bench_util import CHECK, display_name, format_header, format_row, input_files, timed
+from compact_tree import CompactTree
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUTS = [
+    "hierarchical_output_final.json",
+    "hierarchical_output_final2.json",
+    "hierarchical_output_final3.json",
+    os.path.join("..", "structuring_ecrf_json", "hierarchical_output_final.json"),
+]
+
+
+def held_bytes(build):
+    """Memory still allocated by what ``build`` returns."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held
+
+
+def load_tree(input_file):
+    with open(input_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def soa_schedule(tree):
+    sys.path.insert(0, os.path.join(HERE, "..", "Schedule_of_activities"))
+    from soa_works_for_all import parse_protocol_schedule
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse_protocol_schedule(tree)
+
+
+def ecrf_forms(tree):
+    sys.path.insert(0, os.path.join(HERE, "..", "study_specific_forms"))
+    # The module writes its template.xlsx into the working directory on import
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(work_dir)
+        try:
+            import Final_study_specific_form as forms
+        finally:
+            os.chdir(cwd)
+        return [(form["Form Label"], form["Form Name"],
+                 [item["Item Name"] for item in forms.extract_items_from_form(form["Form_Node"])])
+                for form in forms.extract_forms_cleaned(tree)]
+
+
+COLUMNS = [("file", "<58"), ("nodes", ">7"), ("dict MB", ">9.2f"), ("compact MB", ">12.2f"), ("ratio", ">7.1f"),
+           ("SoA dict s", ">12.3f"), ("SoA view s", ">12.3f"),
+           ("lossless", CHECK), ("same SoA", CHECK), ("same forms", CHECK)]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+
+    mb = 1024 * 1024
+    print(format_header(COLUMNS))
+    for input_file in inputs:
+        tree, dict_bytes = held_bytes(lambda: load_tree(input_file))
+        compact, compact_bytes = held_bytes(lambda: CompactTree.from_dict(tree))
+        lossless = compact.to_dict() == tree
+
+        # The extractors may rewrite the tree they are given (merge_broken_tables does), so
+        # each run gets a freshly loaded tree or a fresh view
+        soa_schedule(load_tree(input_file))
+        schedule, dict_seconds = timed(soa_schedule, load_tree(input_file))
+        view_schedule, view_seconds = timed(soa_schedule, compact.view())
+
+        same_forms = ecrf_forms(load_tree(input_file)) == ecrf_forms(compact.view())
+        print(format_row(COLUMNS, [display_name(input_file), len(compact), dict_bytes / mb, compact_bytes / mb,
+                                   dict_bytes / compact_bytes, dict_seconds, view_seconds,
+                                   lossless, schedule == view_schedule, same_forms]))
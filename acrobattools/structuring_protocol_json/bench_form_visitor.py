@@ -0,0 +1,206 @@
+import contextlib
+import io
+import os
+import re
+import sys
+import tempfile
+
+from bench_util import best_of
+from compact_tree import load_hierarchy
+from tree_walk import iter_preorder
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# The 3.6 MB eCRF
+DEFAULT_INPUT = os.path.join(HERE, "..", "structuring_ecrf_json", "hierarchical_output_final3.json")
+sys.path.insert(0, os.path.join(HERE, "..", "structuring_ecrf_json"))
+
+
+class MultiPassExtractor:
+    """extract_forms_with_final_corrections as it was before the visitors: a separate walk
+    for the required markers, the H1 sections and the document context, then per H1 and
+    per form further walks for visits, triggers and context. Counts the walks it starts
+    and the nodes they visit."""
+
+    def __init__(self, flfn):
+        self.flfn = flfn
+        self.walks = 0
+        self.nodes = 0
+
+    def get_text(self, node):
+        self.nodes += isinstance(node, dict)
+        return self.flfn.get_text(node)
+
+    def deep_search_visits(self, node):
+        self.walks += 1
+        visits = set()
+        if not isinstance(node, dict):
+            return visits
+        for current in iter_preorder(node):
+            visits.update(self.flfn.extract_visit_strings(self.get_text(current)))
+        return visits
+
+    def deep_search_triggers(self, node, max_depth=5):
+        self.walks += 1
+        return self._triggers(node, max_depth, 0)
+
+    def _triggers(self, node, max_depth, current_depth):
+        triggers = []
+        if not isinstance(node, dict) or current_depth > max_depth:
+            return triggers
+        trigger_info = self.flfn.extract_trigger_info(self.get_text(node))
+        if trigger_info:
+            triggers.append({'text': trigger_info, 'depth': current_depth})
+        for child in node.get("children", []):
+            triggers.extend(self._triggers(child, max_depth, current_depth + 1))
+        return triggers
+
+    def document_context(self, node):
+        self.walks += 1
+        parts = []
+        self._context(node, parts)
+        return " ".join(parts)
+
+    def _context(self, node, parts):
+        if not isinstance(node, dict):
+            return
+        text = self.get_text(node)
+        if text and len(text) > 10:
+            parts.append(text[:200])
+        for child in node.get("children", []):
+            self._context(child, parts)
+            if len(parts) > 20:
+                break
+
+    def required_mappings(self, data):
+        self.walks += 1
+        flfn = self.flfn
+        form_nodes, required_nodes = [], []
+        required_pattern = re.compile(r'.*Key\s*:\s*\[\*\]\s*=\s*Item\s+is\s+required\.?\s*.*', re.IGNORECASE)
+        for node in iter_preorder(data):
+            text = self.get_text(node)
+            info = {'text': text, 'path': node.get('path', '')}
+            if flfn.is_valid_form_name(text):
+                form_nodes.append(info)
+            if required_pattern.search(text):
+                required_nodes.append(info)
+        return flfn.map_required_patterns(form_nodes, required_nodes)
+
+    def extract(self, data):
+        flfn = self.flfn
+        results, seen_forms = [], set()
+        required_mappings = self.required_mappings(data)
+        self.walks += 1
+        h1_sections = []
+        for node in iter_preorder(data):
+            self.nodes += 1
+            if node.get('name', '').startswith('H1'):
+                h1_sections.append(node)
+        document_context = self.document_context(data)
+
+        for idx, h1_node in enumerate(h1_sections):
+            h1_text = flfn.get_text(h1_node)
+            if not flfn.is_valid_form_label(h1_text):
+                h1_text = "Unknown Section"
+            section_visits = self.deep_search_visits(h1_node)
+            section_triggers = self.deep_search_triggers(h1_node, max_depth=6)
+            next_triggers = self.deep_search_triggers(h1_sections[idx + 1]) if idx + 1 < len(h1_sections) else []
+            next_trigger = next_triggers[0]['text'] if next_triggers else None
+            section_context = self.document_context(h1_node)
+
+            self.walks += 1
+            stack = [(h1_node, None, None)]
+            while stack:
+                node, current_label, parent_siblings = stack.pop()
+                node_text = self.get_text(node)
+                children = node.get("children", [])
+                if (node.get("name", "").startswith("H2") and flfn.is_valid_form_label(node_text)
+                        and not flfn.is_valid_form_name(node_text)):
+                    current_label = node_text
+                if flfn.is_valid_form_name(node_text):
+                    form_name = node_text
+                    form_label = current_label if current_label else h1_text
+                    form_visits = self.deep_search_visits(node)
+                    index = parent_siblings.index(node) if parent_siblings else 0
+                    if parent_siblings:
+                        for i in range(max(0, index - 2), min(len(parent_siblings), index + 3)):
+                            if i != index:
+                                form_visits.update(self.deep_search_visits(parent_siblings[i]))
+                    if not form_visits:
+                        form_visits = section_visits
+                    visits_str = ", ".join(sorted(form_visits, key=lambda x: (
+                        int(re.search(r'\d+', x).group()) if re.search(r'\d+', x) else 9999, x)))
+                    form_key = (form_label, form_name, visits_str)
+                    if form_key not in seen_forms:
+                        form_triggers = self.deep_search_triggers(node, max_depth=7)
+                        if parent_siblings:
+                            for i in range(max(0, index - 8), min(len(parent_siblings), index + 9)):
+                                if i != index:
+                                    form_triggers.extend(self.deep_search_triggers(parent_siblings[i], max_depth=5))
+                        if not form_triggers:
+                            form_triggers = section_triggers
+                        if not form_triggers and next_trigger:
+                            form_triggers.append({'text': next_trigger, 'depth': 0})
+                        if flfn.is_enr_form(form_name):
+                            form_triggers = []
+                        unique_triggers = list(set(t['text'] for t in form_triggers
+                                                   if flfn.extract_trigger_info(t['text'])))
+                        node_context = self.document_context(node)
+                        source = flfn.determine_form_source(
+                            form_name=form_name, form_text=node_text,
+                            context_text=f"{section_context} {node_context}", document_context=document_context)
+                        results.append({
+                            "Form Label": form_label,
+                            "Form Name": form_name,
+                            "Source": source,
+                            "Visits": visits_str,
+                            "Dynamic Trigger": "Yes" if unique_triggers else "No",
+                            "Trigger Details": unique_triggers[0] if unique_triggers else "",
+                            "Required": "Yes" if flfn.is_required_global(form_name, required_mappings) else "No"
+                        })
+                        seen_forms.add(form_key)
+                stack.extend((child, current_label, children) for child in reversed(children)
+                             if isinstance(child, dict))
+        return flfn.consolidate_duplicates(results)
+
+
+if __name__ == "__main__":
+    input_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_INPUT
+    tree = load_hierarchy(input_file)
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir:
+        os.chdir(work_dir)
+        try:
+            # The script runs on hierarchical_output_final.json in the working directory when
+            # imported; there is none here, so importing only defines the functions
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                import form_label_form_name_extractor as flfn
+        finally:
+            os.chdir(cwd)
+
+    multi_pass = MultiPassExtractor(flfn)
+    with contextlib.redirect_stdout(io.StringIO()):
+        expected = multi_pass.extract(tree)
+    # A visitor walk counts each node once
+    counted = {"nodes": 0}
+    walk_visitors = flfn.walk_visitors
+
+    def counting_walk(root, visitors):
+        nodes = walk_visitors(root, visitors)
+        counted["nodes"] += nodes
+        counted["walks"] = counted.get("walks", 0) + 1
+        return nodes
+
+    flfn.walk_visitors = counting_walk
+    with contextlib.redirect_stdout(io.StringIO()):
+        output = flfn.extract_forms_with_final_corrections(tree)
+    flfn.walk_visitors = walk_visitors
+
+    _, multi_pass_seconds = best_of(lambda: MultiPassExtractor(flfn).extract(tree), quiet=True)
+    _, visitor_seconds = best_of(flfn.extract_forms_with_final_corrections, tree, quiet=True)
+
+    total = sum(1 for _ in iter_preorder(tree))
+    print(f"{os.path.relpath(input_file, os.path.join(HERE, '..'))}: {total} nodes, {len(output)} forms")
+    print(f"separate walks: {multi_pass.walks} walks, {multi_pass.nodes} node visits, {multi_pass_seconds:.3f}s")
+    print(f"visitors:       {counted['walks']} walk, {counted['nodes']} node visits, {visitor_seconds:.3f}s "
+          f"({multi_pass_seconds / visitor_seconds:.1f}x)  same output {'✅' if output == expected else '❌'}")
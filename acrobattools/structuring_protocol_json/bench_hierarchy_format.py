@@ -0,0 +1,57 @@
+import json
+import os
+import tempfile
+
+from bench_util import CHECK, best_of, display_name, format_header, format_row, input_files
+from compact_tree import BINARY_SUFFIX, load_hierarchy, save_hierarchy
+
+DEFAULT_INPUTS = [
+    "hierarchical_output_final.json",
+    "hierarchical_output_final2.json",
+    "hierarchical_output_final3.json",
+    os.path.join("..", "structuring_ecrf_json", "hierarchical_output_final.json"),
+    os.path.join("..", "structuring_ecrf_json", "hierarchical_output_final3.json"),
+]
+
+
+def walk_text(root):
+    """Touch every node the way the extractors do (name, text and children of each)."""
+    total = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        total += len(node.get("name", "")) + len(node.get("text", "") or "")
+        stack.extend(node.get("children", []))
+    return total
+
+
+def load_plain_json(file_path):
+    with open(file_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Load times are the best of 7 runs
+COLUMNS = [("file", "<58"), ("JSON KiB", ">9.0f"), ("hbin KiB", ">9.0f"), ("JSON s", ">8.3f"), ("hbin s", ">8.3f"),
+           ("speedup", ">9.1f"), ("JSON+walk s", ">13.3f"), ("view+walk s", ">13.3f"), ("same tree", CHECK)]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+
+    kib = 1024
+    print(format_header(COLUMNS))
+    with tempfile.TemporaryDirectory() as work_dir:
+        for input_file in inputs:
+            binary_file = os.path.join(work_dir, os.path.splitext(os.path.basename(input_file))[0] + BINARY_SUFFIX)
+            tree = load_plain_json(input_file)
+            save_hierarchy(tree, binary_file)
+
+            same = load_hierarchy(binary_file) == tree and load_hierarchy(binary_file, compact=True) == tree
+            _, json_seconds = best_of(load_plain_json, input_file, repeat=7)
+            _, binary_seconds = best_of(load_hierarchy, binary_file, repeat=7)
+            # Views are built lazily, so they are charged with one full walk of the tree
+            _, json_walk_seconds = best_of(lambda: walk_text(load_plain_json(input_file)), repeat=7)
+            _, view_walk_seconds = best_of(lambda: walk_text(load_hierarchy(binary_file, compact=True)), repeat=7)
+
+            print(format_row(COLUMNS, [display_name(input_file), os.path.getsize(input_file) / kib,
+                                       os.path.getsize(binary_file) / kib, json_seconds, binary_seconds,
+                                       json_seconds / binary_seconds, json_walk_seconds, view_walk_seconds, same]))
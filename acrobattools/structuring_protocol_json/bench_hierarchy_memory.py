@@ -0,0 +1,48 @@
+import gc
+import os
+import tracemalloc
+
+from bench_util import CHECK, format_header, format_row, input_files, timed
+from json_struct import iter_elements, load_structured_data, parse_hierarchy
+
+DEFAULT_INPUTS = [
+    "texttablestructured_protocol.json",
+    "texttablestructured_protocol2.json",
+    "texttablestructured_protocol3.json",
+]
+
+
+def build_loaded(input_file):
+    """The original path: the whole document is decoded, then the tree is built from it."""
+    data = load_structured_data(input_file)
+    return parse_hierarchy(data.get("elements", []))
+
+
+def build_streaming(input_file):
+    return parse_hierarchy(iter_elements(input_file))
+
+
+def measure(build, input_file):
+    """Peak traced memory while building, and memory still held by the finished tree (bytes)."""
+    gc.collect()
+    tracemalloc.start()
+    tree, seconds = timed(build, input_file)
+    tree_bytes, peak_bytes = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return tree, peak_bytes, tree_bytes, seconds
+
+
+COLUMNS = [("file", "<40"), ("input MB", ">9.1f"), ("tree MB", ">9.1f"), ("peak load MB", ">14.1f"),
+           ("peak stream MB", ">16.1f"), ("load s", ">8.2f"), ("stream s", ">10.2f"), ("same tree", CHECK)]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+
+    mb = 1024 * 1024
+    print(format_header(COLUMNS))
+    for input_file in inputs:
+        loaded, load_peak, tree_bytes, load_seconds = measure(build_loaded, input_file)
+        streamed, stream_peak, _, stream_seconds = measure(build_streaming, input_file)
+        print(format_row(COLUMNS, [os.path.basename(input_file), os.path.getsize(input_file) / mb, tree_bytes / mb,
+                                   load_peak / mb, stream_peak / mb, load_seconds, stream_seconds,
+                                   loaded == streamed]))
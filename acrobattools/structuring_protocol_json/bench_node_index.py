@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import tempfile
+
+from bench_util import CHECK, best_of, display_name, format_header, format_row, input_files, timed
+from compact_tree import load_hierarchy
+from node_index import NodeIndex, sidecar_path, write_node_index
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Schedule_of_activities"))
+from soa_works_for_all import find_nodes_by_name
+
+DEFAULT_INPUTS = [
+    "hierarchical_output_final.json",
+    "hierarchical_output_final2.json",
+    "hierarchical_output_final3.json",
+    os.path.join("..", "structuring_ecrf_json", "hierarchical_output_final.json"),
+]
+
+
+def find_element_by_text(data, text_to_find):
+    """The recursive lookup of event_grouping_and_event_window_configuration.py, on a loaded tree."""
+    if text_to_find.lower() in data.get("text", "").lower():
+        return data
+    for child in data.get("children", []):
+        found = find_element_by_text(child, text_to_find)
+        if found:
+            return found
+    return None
+
+
+def find_all_soa_tables(node, soa_tables):
+    """The recursive SoA table search of the same script (a table is listed once per matching row)."""
+    if node.get("name", "").startswith("Table") and "children" in node:
+        for row in node["children"]:
+            if row.get("children") and row["children"][0].get("children"):
+                if any(p.get("text") and "Procedure" in p["text"] for p in row["children"][0]["children"]):
+                    soa_tables.append(node)
+    for child in node.get("children", []):
+        find_all_soa_tables(child, soa_tables)
+    return soa_tables
+
+
+def load_json(hierarchy_file):
+    with open(hierarchy_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# Each query as the loaders run it: load the whole JSON and walk it, or open the index and ask it
+QUERIES = {
+    "rationale": (lambda doc: find_element_by_text(doc, "Study rationale"),
+                  lambda index: index.find_element_by_text("Study rationale")),
+    "SoA tables": (lambda doc: find_all_soa_tables(doc, []), lambda index: index.find_all_soa_tables()),
+    "Table nodes": (lambda doc: find_nodes_by_name(doc, "Table"), lambda index: index.find_nodes_by_name("Table")),
+}
+
+
+def loaded_query(hierarchy_file, query):
+    return query(load_json(hierarchy_file))
+
+
+def indexed_query(index_file, query):
+    with NodeIndex(index_file) as index:
+        return query(index)
+
+
+COLUMNS = ([("file", "<58"), ("JSON KiB", ">9.0f"), ("index KiB", ">10.0f"), ("build s", ">8.3f")]
+           + [(f"{label} walk/index ms", ">30") for label in QUERIES] + [("same", CHECK)])
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+
+    kib = 1024
+    print(format_header(COLUMNS))
+    with tempfile.TemporaryDirectory() as work_dir:
+        for input_file in inputs:
+            index_file = os.path.join(work_dir, os.path.basename(sidecar_path(input_file)))
+            _, build_seconds = timed(lambda: write_node_index(load_hierarchy(input_file), index_file))
+            columns, same = [], True
+            for by_walk_query, by_index_query in QUERIES.values():
+                by_walk, walk_seconds = best_of(loaded_query, input_file, by_walk_query)
+                by_index, index_seconds = best_of(indexed_query, index_file, by_index_query)
+                columns.append(f"{walk_seconds * 1000:.1f} / {index_seconds * 1000:>5.1f}")
+                same = same and by_walk == by_index
+
+            print(format_row(COLUMNS, [display_name(input_file), os.path.getsize(input_file) / kib,
+                                       os.path.getsize(index_file) / kib, build_seconds, *columns, same]))
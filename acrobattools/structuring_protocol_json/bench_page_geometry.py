@@ -0,0 +1,70 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+
+from bench_util import CHECK, format_header, format_row, input_files, timed
+from json_struct import load_structured_data, parse_hierarchy
+from page_geometry import PageGeometry
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUTS = [
+    "texttablestructured_protocol.json",
+    "texttablestructured_protocol2.json",
+    "texttablestructured_protocol3.json",
+    os.path.join("..", "structuring_ecrf_json", "texttablestructured_ecrf.json"),
+]
+
+
+def import_forms():
+    sys.path.insert(0, os.path.join(HERE, "..", "study_specific_forms"))
+    # The module writes its template.xlsx into the working directory on import
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as work_dir, contextlib.redirect_stdout(io.StringIO()):
+        os.chdir(work_dir)
+        try:
+            import Final_study_specific_form as forms
+        finally:
+            os.chdir(cwd)
+    return forms
+
+
+def table_nodes(root):
+    tables, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        if node.get("name", "").startswith("Table"):
+            tables.append(node)
+        stack.extend(node.get("children", []))
+    return tables
+
+
+COLUMNS = [("file", "<48"), ("fonts", ">6"), ("of", ">6"), ("tables", ">8"), ("regex ms", ">10.2f"),
+           ("geometry ms", ">13.2f"), ("agree", ">7"), ("same items", CHECK)]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+    forms = import_forms()
+
+    print(format_header(COLUMNS))
+    for input_file in inputs:
+        data = load_structured_data(input_file)
+        elements = data.get("elements", [])
+        tree = parse_hierarchy(elements, keep_layout=True, pages=data.get("pages"))
+        geometry = PageGeometry.from_tree(tree)
+        tables = table_nodes(tree)
+
+        by_text, text_seconds = timed(lambda: [forms.is_metadata_table(table) for table in tables])
+        by_position, position_seconds = timed(lambda: [forms.is_metadata_table(table, geometry) for table in tables])
+        agree = sum(a == b for a, b in zip(by_text, by_position))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            found = forms.extract_forms_cleaned(tree)
+            same_items = all(forms.extract_items_from_form(form["Form_Node"]) ==
+                             forms.extract_items_from_form(form["Form_Node"], geometry) for form in found)
+
+        font_refs = sum(1 for elem in elements if "Font" in elem)
+        print(format_row(COLUMNS, [os.path.basename(input_file), len(tree['fonts']), font_refs, len(tables),
+                                   text_seconds * 1000, position_seconds * 1000, f"{agree}/{len(tables)}",
+                                   same_items]))
@@ -0,0 +1,151 @@
+import os
+import re
+
+import json_struct
+from bench_util import CHECK, best_of, format_header, format_row, input_files
+from json_struct import load_structured_data, normalize_path, parse_hierarchy
+
+DEFAULT_INPUTS = [
+    "texttablestructured_protocol.json",
+    "texttablestructured_protocol2.json",
+    "texttablestructured_protocol3.json",
+]
+
+
+# The regex path classification parse_hierarchy used before the path model
+def get_header_level(path):
+    """Detect header level from path (Title, H1, H2, etc.)."""
+    normalized = normalize_path(path)
+    if normalized.endswith("/Title"):
+        return 0
+    match = re.search(r'/H(\d+)(\[\d+\])?$', normalized)
+    if match:
+        return int(match.group(1))
+    return None
+
+
+def is_table_or_complex_structure(path):
+    """Return True only for complex nested structures like tables, lists, etc."""
+    return re.search(r'/(TR|TD|TH|LBody|LI|Lbl|Caption|Footnote|Aside)', path) is not None
+
+
+def is_inline_content(path):
+    """Return True for inline content like Span, Sub that should nest under paragraphs."""
+    return re.search(r'/(Span|Sub|StyleSpan|ExtraCharSpan)$', path) is not None
+
+
+def is_top_level_table(path):
+    """Return True if this is a top-level table directly under Document."""
+    normalized = normalize_path(path)
+    return re.match(r'^//Document/Table(\[\d+\])?$', normalized) is not None
+
+
+def get_parent_path(path):
+    """Get parent path by removing last component."""
+    normalized = normalize_path(path)
+    if not normalized or normalized == "//":
+        return ""
+    parts = normalized[2:].split("/")  # Remove // prefix and split
+    if len(parts) <= 1:
+        return ""
+    return "//" + "/".join(parts[:-1])
+
+
+def parse_hierarchy_reference(elements):
+    """parse_hierarchy as it was before the path model: string paths and regex classification per element."""
+    root = {"name": "Document Root", "children": []}
+    header_context = {0: root}
+    path_to_node = {"": root, "//Document": root}
+
+    def ensure_path_exists(target_path):
+        normalized = normalize_path(target_path)
+
+        if normalized == "//Document" or normalized == "":
+            return root
+
+        if normalized in path_to_node:
+            return path_to_node[normalized]
+
+        parent_path = get_parent_path(normalized)
+
+        if parent_path == "//Document" or parent_path == "":
+            parent_node = header_context[max(header_context.keys())]
+        else:
+            parent_node = ensure_path_exists(parent_path)
+
+        node_name = normalized.split("/")[-1] if normalized else "Unknown"
+        new_node = {"name": node_name, "text": "", "path": normalized, "children": []}
+        path_to_node[normalized] = new_node
+        parent_node.setdefault("children", []).append(new_node)
+        return new_node
+
+    for elem in elements:
+        original_path = elem.get("path") or elem.get("Path") or ""
+        path = normalize_path(original_path)
+        text = elem.get("text") or elem.get("Text") or ""
+        name = path.split("/")[-1] if path else ""
+
+        if name == "Document" and path == "//Document":
+            continue
+
+        node = {"name": name, "text": text, "path": path, "children": []}
+        path_to_node[path] = node
+
+        header_level = get_header_level(path)
+
+        if header_level is not None:
+            parent_level = max([lvl for lvl in header_context if lvl < header_level], default=0)
+            parent = header_context[parent_level]
+            parent.setdefault("children", []).append(node)
+            header_context[header_level] = node
+            for lvl in list(header_context.keys()):
+                if lvl > header_level:
+                    del header_context[lvl]
+
+        elif is_top_level_table(path):
+            parent = header_context[max(header_context.keys())]
+            parent.setdefault("children", []).append(node)
+
+        elif is_inline_content(path):
+            parent_path = get_parent_path(path)
+            parent_node = ensure_path_exists(parent_path)
+            parent_node.setdefault("children", []).append(node)
+
+        elif is_table_or_complex_structure(path):
+            parent_path = get_parent_path(path)
+            parent_node = ensure_path_exists(parent_path)
+            parent_node.setdefault("children", []).append(node)
+
+        else:
+            parent = header_context[max(header_context.keys())]
+            parent.setdefault("children", []).append(node)
+
+    return root
+
+
+def elements_per_second(build, elements, repeat, cold_cache):
+    """Best-of-``repeat`` throughput; ``cold_cache`` empties the path and segment caches before every run."""
+    def clear_caches():
+        json_struct._PATH_CACHE.clear()
+        json_struct._SEGMENT_CACHE.clear()
+
+    _, best = best_of(build, elements, repeat=repeat, setup=clear_caches if cold_cache else None)
+    return len(elements) / best
+
+
+COLUMNS = [("file", "<40"), ("elements", ">9"), ("regex el/s", ">12.0f"), ("model el/s", ">12.0f"),
+           ("cached el/s", ">13.0f"), ("speedup", ">9.1f"), ("same tree", CHECK)]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+    repeat = 5
+
+    print(format_header(COLUMNS))
+    for input_file in inputs:
+        elements = load_structured_data(input_file).get("elements", [])
+        same = parse_hierarchy_reference(elements) == parse_hierarchy(elements)
+        before = elements_per_second(parse_hierarchy_reference, elements, repeat, cold_cache=False)
+        after = elements_per_second(parse_hierarchy, elements, repeat, cold_cache=True)
+        warm = elements_per_second(parse_hierarchy, elements, repeat, cold_cache=False)
+        print(format_row(COLUMNS, [os.path.basename(input_file), len(elements), before, after, warm,
+                                   after / before, same]))
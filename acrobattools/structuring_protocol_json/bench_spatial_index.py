@@ -0,0 +1,79 @@
+import contextlib
+import io
+import os
+import sys
+
+from bench_util import CHECK, format_header, format_row, input_files, timed
+from json_struct import load_structured_data, parse_hierarchy
+from page_geometry import PageGeometry
+from spatial_index import SpatialIndex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUTS = [
+    "texttablestructured_protocol.json",
+    "texttablestructured_protocol2.json",
+    "texttablestructured_protocol3.json",
+    os.path.join("..", "structuring_ecrf_json", "texttablestructured_ecrf.json"),
+]
+
+
+def walk(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.get("children", [])))
+
+
+def walk_inside(root, target, tolerance=0.5):
+    """What SpatialIndex.inside answers, by testing every node of the tree."""
+    x0, y0, x1, y1 = target["bounds"]
+    return [node for node in walk(root) if node is not target and node.get("page") == target["page"]
+            and node.get("bounds") and x0 - tolerance <= node["bounds"][0] and node["bounds"][2] <= x1 + tolerance
+            and y0 - tolerance <= node["bounds"][1] and node["bounds"][3] <= y1 + tolerance]
+
+
+def walk_running(root, geometry):
+    return [node for node in walk(root) if geometry.is_header_or_footer(node)]
+
+
+def same_nodes(a, b):
+    # The grid returns nodes in insertion order, which differs from pre-order for out-of-order paths
+    return sorted(map(id, a)) == sorted(map(id, b))
+
+
+def import_soa():
+    sys.path.insert(0, os.path.join(HERE, "..", "Schedule_of_activities"))
+    import soa_works_for_all
+    return soa_works_for_all
+
+
+COLUMNS = [("file", "<40"), ("nodes", ">7"), ("indexed", ">8"), ("build ms", ">9.1f"), ("inside walk ms", ">15.1f"),
+           ("grid ms", ">9.1f"), ("running walk ms", ">16.1f"), ("grid ms", ">9.1f"), ("same", CHECK), ("same SoA", CHECK)]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+    soa = import_soa()
+
+    print(format_header(COLUMNS))
+    for input_file in inputs:
+        data = load_structured_data(input_file)
+        plain = parse_hierarchy(data.get("elements", []), keep_layout=True, pages=data.get("pages"))
+        index = SpatialIndex()
+        tree, build_seconds = timed(parse_hierarchy, data.get("elements", []), True, data.get("pages"), index)
+        build_seconds -= timed(parse_hierarchy, data.get("elements", []), True, data.get("pages"))[1]
+        geometry = PageGeometry.from_tree(tree, index)
+        tables = [node for node in walk(tree) if node.get("name", "").startswith("Table") and node.get("bounds")]
+
+        by_walk, walk_seconds = timed(lambda: [walk_inside(tree, table) for table in tables])
+        by_grid, grid_seconds = timed(lambda: [index.inside(table) for table in tables])
+        running_walk, running_walk_seconds = timed(walk_running, tree, geometry)
+        running_grid, running_grid_seconds = timed(geometry.running_nodes)
+        same = all(map(same_nodes, by_walk, by_grid)) and same_nodes(running_walk, running_grid)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            same_soa = soa.parse_protocol_schedule(plain) == soa.parse_protocol_schedule(tree, spatial_index=index)
+
+        print(format_row(COLUMNS, [os.path.basename(input_file), sum(1 for _ in walk(tree)), len(index),
+                                   max(build_seconds, 0) * 1000, walk_seconds * 1000, grid_seconds * 1000,
+                                   running_walk_seconds * 1000, running_grid_seconds * 1000, same, same_soa]))
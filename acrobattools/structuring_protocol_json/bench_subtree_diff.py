@@ -0,0 +1,52 @@
+import copy
+import os
+
+from bench_util import display_name, format_header, format_row, input_files, timed
+from compact_tree import load_hierarchy
+from subtree_hash import changed_units, diff_hierarchies, subtree_hashes
+
+DEFAULT_INPUTS = [
+    "hierarchical_output_final.json",
+    "hierarchical_output_final2.json",
+    "hierarchical_output_final3.json",
+    os.path.join("..", "structuring_ecrf_json", "hierarchical_output_final.json"),
+]
+UNIT_PREFIXES = ("H1", "Table")
+
+
+def walk(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.get("children", [])))
+
+
+def amend(tree):
+    """A copy of the tree with one cell's text edited and a paragraph inserted at the top level,
+    the kind of change a protocol amendment makes."""
+    amended = copy.deepcopy(tree)
+    cells = [node for node in walk(amended) if "/TD" in node.get("path", "") and node.get("text")]
+    if cells:
+        cells[len(cells) // 2]["text"] += " (amended)"
+    amended["children"].insert(1, {"name": "P", "text": "Amendment 1", "path": "//Document/P[0]", "children": []})
+    return amended
+
+
+COLUMNS = [("file", "<58"), ("nodes", ">7"), ("hash ms", ">9.1f"), ("diff ms", ">9.1f"), ("changes", ">9"),
+           ("units", ">7"), ("to redo", ">9")]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+
+    print(format_header(COLUMNS))
+    for input_file in inputs:
+        tree = load_hierarchy(input_file)
+        amended = amend(tree)
+        hashes, hash_seconds = timed(subtree_hashes, tree)
+        changes, diff_seconds = timed(diff_hierarchies, tree, amended)
+        units = sum(1 for node in walk(amended) if node.get("name", "").startswith(UNIT_PREFIXES))
+
+        assert not diff_hierarchies(tree, copy.deepcopy(tree)), "identical trees must not differ"
+        print(format_row(COLUMNS, [display_name(input_file), len(hashes), hash_seconds * 1000, diff_seconds * 1000,
+                                   len(changes), units, len(changed_units(tree, amended, UNIT_PREFIXES))]))
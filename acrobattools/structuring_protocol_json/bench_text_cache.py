@@ -0,0 +1,74 @@
+import contextlib
+import io
+import os
+import sys
+
+from bench_util import CHECK, best_of, display_name, format_header, format_row, input_files
+from compact_tree import load_hierarchy
+from text_cache import SubtreeTextCache
+from tree_walk import iter_preorder, subtree_text
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUTS = [
+    "hierarchical_output_final.json",
+    "hierarchical_output_final2.json",
+    "hierarchical_output_final3.json",
+    os.path.join("..", "structuring_ecrf_json", "hierarchical_output_final.json"),
+]
+sys.path.insert(0, os.path.join(HERE, "..", "Schedule_of_activities"))
+
+
+class SubtreeWalks:
+    """Stands in for the cache as it was before: every call walks the subtree again.
+    With ``count``, ``visits`` adds up the nodes those walks touch."""
+
+    def __init__(self, count=False):
+        self.count = count
+        self.visits = 0
+
+    def subtree_text(self, node):
+        if self.count:
+            self.visits += sum(1 for _ in iter_preorder(node))
+        return subtree_text(node)
+
+    def invalidate(self, node):
+        pass
+
+
+def soa_schedule(module, input_file):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return module.parse_protocol_schedule(load_hierarchy(input_file))
+
+
+def timed_schedule(module, input_file, make_cache, repeat=3):
+    """Best time of parse_protocol_schedule with ``make_cache`` as the per-call text cache;
+    also returns the cache of the last run."""
+    made = []
+
+    def text_cache():
+        made.append(make_cache())
+        return made[-1]
+
+    module.SubtreeTextCache = text_cache
+    try:
+        result, best = best_of(soa_schedule, module, input_file, repeat=repeat)
+    finally:
+        module.SubtreeTextCache = SubtreeTextCache
+    return result, best, made[-1]
+
+
+COLUMNS = [("file", "<58"), ("walk s", ">8.3f"), ("cached s", ">10.3f"), ("nodes walked", ">14"),
+           ("cached texts", ">14"), ("same", CHECK)]
+
+if __name__ == "__main__":
+    inputs = input_files(DEFAULT_INPUTS)
+
+    import soa_works_for_all
+
+    print(format_header(COLUMNS))
+    for input_file in inputs:
+        expected, walk_seconds, _ = timed_schedule(soa_works_for_all, input_file, SubtreeWalks)
+        _, _, walks = timed_schedule(soa_works_for_all, input_file, lambda: SubtreeWalks(count=True), repeat=1)
+        result, cached_seconds, cache = timed_schedule(soa_works_for_all, input_file, SubtreeTextCache)
+        print(format_row(COLUMNS, [display_name(input_file), walk_seconds, cached_seconds, walks.visits,
+                                   len(cache), result == expected]))
@@ -0,0 +1,117 @@
+import os
+import sys
+
+from bench_util import CHECK, best_of, format_header, format_row
+from compact_tree import load_hierarchy
+from tree_walk import find_by_name_pattern, find_by_name_prefix, first_text, iter_postorder, iter_preorder, subtree_text
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INPUT = os.path.join(HERE, "hierarchical_output_final3.json")
+# Deep enough to exceed the default recursion limit several times over
+DEEPEN_LEVELS = 20000
+
+
+# The recursive walkers the scripts used before tree_walk
+def recursive_find_nodes_by_name(root, name_prefix):
+    found = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            if node.get("name", "").startswith(name_prefix):
+                found.append(node)
+            for child in node.get("children", []):
+                walk(child)
+
+    walk(root)
+    return found
+
+
+def recursive_find_nodes_by_name_pattern(node, pattern):
+    import re
+    if not isinstance(node, dict):
+        return []
+    matches = [node] if re.search(pattern, node.get("name", "")) else []
+    for child in node.get("children", []):
+        matches.extend(recursive_find_nodes_by_name_pattern(child, pattern))
+    return matches
+
+
+def recursive_get_node_text(node):
+    if not node:
+        return ""
+    text = node.get("text", "") or ""
+    for child in node.get("children", []):
+        text += " " + recursive_get_node_text(child)
+    return text.replace('\n', ' ').replace('\r', ' ').strip()
+
+
+def recursive_get_text(node):
+    if not isinstance(node, dict):
+        return ""
+    text = (node.get("text") or "").strip()
+    if text:
+        return text
+    for child in node.get("children", []):
+        text = recursive_get_text(child)
+        if text:
+            return text
+    return ""
+
+
+def deepened(root, levels):
+    """The tree hung under a chain of ``levels`` nested list nodes (L > LI > L > ...), like a
+    pathological run of nested lists; the innermost node carries no text."""
+    node = {"name": "L", "text": "", "path": "//Document/L", "children": [root]}
+    for level in range(levels):
+        node = {"name": "LI" if level % 2 else "L", "text": "", "path": "//Document/L", "children": [node]}
+    return {"name": "Document Root", "children": [node]}
+
+
+def rate(function, *args, nodes, repeat=5):
+    result, best = best_of(function, *args, repeat=repeat)
+    return result, nodes / best
+
+
+def attempt(function, *args):
+    try:
+        return function(*args), None
+    except RecursionError as e:
+        return None, f"RecursionError ({e})"
+
+
+WALKERS = [
+    ("find_nodes_by_name TR", lambda root: recursive_find_nodes_by_name(root, "TR"),
+     lambda root: find_by_name_prefix(root, "TR")),
+    ("find_nodes_by_name_pattern ^T[DH]", lambda root: recursive_find_nodes_by_name_pattern(root, r"^T[DH]"),
+     lambda root: find_by_name_pattern(root, r"^T[DH]")),
+    ("get_node_text (whole tree)", recursive_get_node_text, subtree_text),
+    ("get_text (first text)", recursive_get_text, first_text),
+]
+COLUMNS = [("walker", "<36"), ("recursive nodes/s", ">19,.0f"), ("tree_walk nodes/s", ">19,.0f"), ("same", CHECK)]
+
+if __name__ == "__main__":
+    input_file = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_INPUT
+    tree = load_hierarchy(input_file)
+    nodes = sum(1 for _ in iter_preorder(tree))
+    print(f"{os.path.basename(input_file)}: {nodes} nodes, recursion limit {sys.getrecursionlimit()}")
+
+    print("\n" + format_header(COLUMNS))
+    for label, recursive, iterative in WALKERS:
+        expected, recursive_rate = rate(recursive, tree, nodes=nodes)
+        result, iterative_rate = rate(iterative, tree, nodes=nodes)
+        print(format_row(COLUMNS, [label, recursive_rate, iterative_rate, result == expected]))
+    _, preorder_rate = rate(lambda root: sum(1 for _ in iter_preorder(root)), tree, nodes=nodes)
+    _, postorder_rate = rate(lambda root: sum(1 for _ in iter_postorder(root)), tree, nodes=nodes)
+    print(f"{'iter_preorder / iter_postorder':<36}{'':>19}{preorder_rate:>10,.0f} /{postorder_rate:>8,.0f}")
+
+    deep = deepened(tree, DEEPEN_LEVELS)
+    print(f"\nDeepened by {DEEPEN_LEVELS} nested list levels:")
+    print(f"{'walker':<36}{'recursive':<48}tree_walk")
+    for label, recursive, iterative in WALKERS:
+        expected, error = attempt(recursive, deep)
+        result, iterative_error = attempt(iterative, deep)
+        outcome = "ok" if error is None else error[:46]
+        iterative_outcome = "ok" if iterative_error is None else iterative_error
+        if error is None and iterative_error is None and result != expected:
+            iterative_outcome = "❌ differs"
+        print(f"{label:<36}{outcome:<48}{iterative_outcome}")
@@ -0,0 +1,54 @@
+import contextlib
+import io
+import os
+import re
+import sys
+import time
+
+# Timing and table output shared by the bench_*.py scripts. A table is a list of
+# (title, spec) columns: spec is a format spec like "<58" or ">9.1f" for the value,
+# whose alignment and width also lay out the title, or CHECK for a ✅/❌ column.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CHECK = "check"
+WIDTH_PATTERN = re.compile(r"^[<>^]?\d*")
+
+
+def best_of(function, *args, repeat=5, setup=None, quiet=False):
+    """``(result, seconds)``: the last result of ``function(*args)`` and its fastest of ``repeat``
+    runs. ``setup`` runs untimed before each run; ``quiet`` discards what the run prints."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+            started = time.perf_counter()
+            result = function(*args)
+            best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def timed(function, *args):
+    """``(result, seconds)`` of one run of ``function(*args)``."""
+    return best_of(function, *args, repeat=1)
+
+
+def input_files(default_inputs):
+    """The files named on the command line, else the defaults (relative to this folder)."""
+    return sys.argv[1:] or [os.path.join(HERE, name) for name in default_inputs]
+
+
+def display_name(input_file):
+    """``folder/file.json``: enough to tell the protocol and eCRF hierarchies apart."""
+    return os.path.join(os.path.basename(os.path.dirname(os.path.abspath(input_file))), os.path.basename(input_file))
+
+
+def format_header(columns):
+    return "".join(f"  {title}" if spec == CHECK else f"{title:{WIDTH_PATTERN.match(spec).group()}}"
+                   for title, spec in columns)
+
+
+def format_row(columns, values):
+    return "".join(f"  {'✅' if value else '❌':<{len(title)}}" if spec == CHECK else f"{value:{spec}}"
+                   for (title, spec), value in zip(columns, values)).rstrip()
@@ -0,0 +1,51 @@
+import glob
+import os
+import re
+import sys
+
+from bench_util import best_of
+from compact_tree import load_hierarchy
+from tree_walk import find_by_name_prefix
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "Schedule_of_activities"))
+import soa_works_for_all as soa
+
+
+def per_pattern_identifier(text):
+    """extract_complete_visit_identifier as it was: re.findall with each pattern in turn."""
+    if not isinstance(text, str):
+        return None
+    text = text.strip()
+    for pattern in soa.CONFIG["VISIT_PATTERNS"]:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            longest_match = max(matches, key=len)
+            text_no_spaces = text.replace(' ', '').replace('(', '').replace(')', '').replace('-', '')
+            if len(longest_match) / len(text_no_spaces) > 0.3:
+                return longest_match
+    return None
+
+
+if __name__ == "__main__":
+    paths = sys.argv[1:] or sorted(glob.glob(os.path.join(HERE, "hierarchical_output_final*.json")))
+    # Every cell of every table row of the protocols, as the SoA parser reads them
+    cells = []
+    for path in paths:
+        tree = load_hierarchy(path)
+        for row in find_by_name_prefix(tree, "TR"):
+            cells.extend(str(cell) for cell in soa.flatten_row(row))
+
+    clear = soa.match_visit_identifier.cache_clear
+    expected, per_pattern_seconds = best_of(lambda: [per_pattern_identifier(cell) for cell in cells])
+    cold, cold_seconds = best_of(lambda: [soa.extract_complete_visit_identifier(cell) for cell in cells], setup=clear)
+    warm, warm_seconds = best_of(lambda: [soa.extract_complete_visit_identifier(cell) for cell in cells])
+    candidates = sum(1 for cell in set(cells) if soa.VISIT_PATTERN.search(cell.strip()))
+
+    print(f"{len(paths)} protocols: {len(cells)} cells, {len(set(cells))} distinct, "
+          f"{candidates} distinct with a visit-like token, {sum(1 for v in expected if v)} visit identifiers")
+    print(f"per pattern:        {per_pattern_seconds * 1000:.1f} ms")
+    print(f"one scan, memoized: {cold_seconds * 1000:.1f} ms ({per_pattern_seconds / cold_seconds:.1f}x)  "
+          f"same {'✅' if cold == expected else '❌'}")
+    print(f"  memo already warm: {warm_seconds * 1000:.1f} ms ({per_pattern_seconds / warm_seconds:.1f}x)  "
+          f"same {'✅' if warm == expected else '❌'}")
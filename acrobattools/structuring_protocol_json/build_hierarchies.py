@@ -0,0 +1,193 @@
+import argparse
+import contextlib
+import fnmatch
+import io
+import logging
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+from json_struct import run_hierarchy
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# What an extraction leaves behind: the JSON itself or the ZIP it came in
+DEFAULT_PATTERNS = ("structuredData.json", "*.zip")
+OUTPUT_SUFFIX = "_output"
+
+
+def collect_inputs(sources, output_dir=None, patterns=DEFAULT_PATTERNS, binary=False):
+    """
+    Builds the list of (input_file, output_file) pairs for a batch run.
+
+    Args:
+        sources (list[str]): structuredData files (JSON or extraction ZIP) and directories;
+            directories are searched recursively for files matching ``patterns``.
+        output_dir (str, optional): Directory for all outputs. Without it every output is
+            written next to its input, as ``json_struct.py`` does. Inputs with the same
+            name (every study has a ``structuredData.json``) get their relative folder
+            in the output name.
+        patterns (tuple[str]): fnmatch patterns for files found in directories.
+        binary (bool): Whether outputs are ``.hbin`` instead of ``.json``.
+
+    Returns:
+        list[tuple[str, str | None]]: The jobs in a stable order; the output is None when it
+        goes next to the input.
+    """
+    inputs = []
+    for source in sources:
+        if os.path.isdir(source):
+            for folder, _, names in sorted(os.walk(source)):
+                inputs.extend(os.path.join(folder, name) for name in sorted(names)
+                              if any(fnmatch.fnmatch(name, pattern) for pattern in patterns))
+        else:
+            inputs.append(source)
+    inputs = list(dict.fromkeys(os.path.abspath(path) for path in inputs))
+
+    if output_dir is None:
+        return [(input_file, None) for input_file in inputs]
+
+    extension = ".hbin" if binary else ".json"
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in inputs]
+    if len(set(stems)) < len(stems):
+        common = os.path.commonpath([os.path.dirname(path) for path in inputs])
+        stems = [os.path.splitext(os.path.relpath(path, common))[0].replace(os.sep, "__") for path in inputs]
+    return [(input_file, os.path.join(output_dir, stem + OUTPUT_SUFFIX + extension))
+            for input_file, stem in zip(inputs, stems)]
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process so far, or None where it cannot be read."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def build_one(job):
+    """Worker: build and save one hierarchy, returning its outcome, wall time and peak RSS."""
+    input_file, output_file, options = job
+    baseline = peak_rss_bytes()
+    started = time.perf_counter()
+    error = None
+    try:
+        # run_hierarchy reports on stdout; the batch reports through the progress log instead
+        with contextlib.redirect_stdout(io.StringIO()):
+            output_file = run_hierarchy(input_file, output_file, **options)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {
+        'input': input_file,
+        'output': output_file,
+        'ok': error is None,
+        'error': error,
+        'seconds': time.perf_counter() - started,
+        'peak_rss': peak_rss_bytes(),
+        'baseline_rss': baseline,
+        'input_bytes': os.path.getsize(input_file) if os.path.exists(input_file) else 0,
+    }
+
+
+def build_batch(jobs, max_workers=None, **options):
+    """
+    Builds many hierarchies in a process pool, logging each as soon as it is saved.
+
+    Every file runs in a fresh worker process (``maxtasksperchild=1``), so the peak RSS
+    reported for it is that file's alone. The largest inputs are started first so a big
+    protocol does not end up running alone at the end of the batch.
+
+    Args:
+        jobs (list[tuple[str, str | None]]): (input_file, output_file) pairs, see ``collect_inputs``.
+        max_workers (int, optional): Worker processes; defaults to the number of CPUs.
+        **options: Passed on to ``run_hierarchy`` (streaming, binary, keep_layout, node_index, hashes).
+
+    Returns:
+        dict: Summary with per-file results, total wall time, throughput in files/sec and
+        the largest per-file peak RSS.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    for _, output_file in jobs:
+        if output_file and os.path.dirname(output_file):
+            os.makedirs(os.path.dirname(output_file), exist_ok=True)
+
+    ordered = sorted(jobs, key=lambda job: os.path.getsize(job[0]) if os.path.exists(job[0]) else 0, reverse=True)
+    results = []
+    batch_started = time.perf_counter()
+    with Pool(processes=min(max_workers, len(jobs)) or 1, maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(build_one, [(input_file, output_file, options)
+                                                      for input_file, output_file in ordered]):
+            results.append(result)
+            peak = f", peak RSS {result['peak_rss'] / 2 ** 20:.0f} MiB" if result['peak_rss'] else ""
+            if result['ok']:
+                logging.info(f"[{len(results)}/{len(jobs)}] done {result['input']} in {result['seconds']:.2f}s{peak}")
+            else:
+                logging.error(f"[{len(results)}/{len(jobs)}] FAILED {result['input']}: {result['error']}")
+
+    wall_seconds = time.perf_counter() - batch_started
+    succeeded = sum(1 for result in results if result['ok'])
+    peaks = [result['peak_rss'] for result in results if result['peak_rss']]
+    return {
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'workers': max_workers,
+        'wall_seconds': wall_seconds,
+        'files_per_sec': len(results) / wall_seconds if wall_seconds > 0 else 0.0,
+        'max_peak_rss': max(peaks) if peaks else None,
+    }
+
+
+def write_report(results, report_path):
+    """Per-file CSV (input, output, ok, seconds, input MiB, peak and baseline RSS MiB) for sizing batch hosts."""
+    import csv
+
+    mib = 2 ** 20
+    with open(report_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['input', 'output', 'ok', 'seconds', 'input_mib', 'peak_rss_mib', 'baseline_rss_mib', 'error'])
+        for result in sorted(results, key=lambda result: result['input']):
+            writer.writerow([result['input'], result['output'] or '', result['ok'], f"{result['seconds']:.3f}",
+                             f"{result['input_bytes'] / mib:.1f}",
+                             f"{result['peak_rss'] / mib:.1f}" if result['peak_rss'] else '',
+                             f"{result['baseline_rss'] / mib:.1f}" if result['baseline_rss'] else '',
+                             result['error'] or ''])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the hierarchies of many structuredData files in parallel.")
+    parser.add_argument("sources", nargs="+", help="structuredData JSON/ZIP files or directories to search")
+    parser.add_argument("-o", "--output-dir", help="Directory for the hierarchies (default: next to each input)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="Worker processes (default: CPUs)")
+    parser.add_argument("--pattern", action="append", help="File pattern searched for in directories "
+                                                           f"(repeatable; default: {', '.join(DEFAULT_PATTERNS)})")
+    parser.add_argument("--stream", action="store_true", help="Stream elements instead of loading each document")
+    parser.add_argument("--binary", action="store_true", help="Write .hbin instead of JSON (downstream scripts read JSON)")
+    parser.add_argument("--layout", action="store_true", help="Keep page, bounds, font and text size on the nodes")
+    parser.add_argument("--sqlite", action="store_true", help="Also write the SQLite node index sidecar")
+    parser.add_argument("--hash", action="store_true", help="Store subtree hashes on the nodes")
+    parser.add_argument("--report", help="Write per-file wall time and peak RSS to this CSV")
+    args = parser.parse_args()
+
+    batch_jobs = collect_inputs(args.sources, args.output_dir, tuple(args.pattern or DEFAULT_PATTERNS), args.binary)
+    if not batch_jobs:
+        logging.error(f"No structuredData files found in {', '.join(args.sources)}")
+        sys.exit(1)
+
+    summary = build_batch(batch_jobs, max_workers=args.jobs, streaming=args.stream, binary=args.binary,
+                          keep_layout=args.layout, node_index=args.sqlite, hashes=args.hash)
+
+    peak = f", largest peak RSS {summary['max_peak_rss'] / 2 ** 20:.0f} MiB per worker" if summary['max_peak_rss'] else ""
+    logging.info(f"Batch finished: {summary['succeeded']} succeeded, {summary['failed']} failed, "
+                 f"{summary['workers']} workers, {summary['wall_seconds']:.1f}s wall, "
+                 f"{summary['files_per_sec']:.2f} files/sec{peak}")
+    if args.report:
+        write_report(summary['results'], args.report)
+        logging.info(f"Per-file report written to {args.report}")
+    sys.exit(0 if summary['failed'] == 0 else 1)
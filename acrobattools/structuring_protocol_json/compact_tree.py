@@ -0,0 +1,616 @@
+import copy
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+
+from json_struct import parse_hierarchy
+
+NO_NODE = -1
+BINARY_MAGIC = b"HIERBIN1"
+BINARY_SUFFIX = ".hbin"
+BINARY_VERSION = 2
+# Array sections of the binary format, in file order (version 1 ends before the layout columns)
+BINARY_ARRAYS = ("parent", "first_child", "next_sibling", "layout", "name_ids", "path_ids", "text_offsets",
+                 "path_prefix", "path_step", "page_numbers", "bounds", "font_ids", "text_sizes")
+BINARY_ARRAYS_V1 = BINARY_ARRAYS[:9]
+# Keys stored in the flat arrays when their value has the usual type; anything else goes to ``extras``
+COMPACT_KEYS = ("name", "text", "path", "page", "bounds", "font", "text_size", "children")
+LAYOUT_NODE_KEYS = ("page", "bounds", "font", "text_size")
+# The key layout of every node parse_hierarchy creates, except the root
+STANDARD_KEYS = ("name", "text", "path", "children")
+
+
+class CompactTree:
+    """The hierarchical document tree in flat arrays instead of one dict per node.
+
+    Nodes are numbered in pre-order (the root is 0, a subtree is a contiguous index
+    range). Per node the tree keeps the parent, first-child and next-sibling indexes,
+    an index into the table of interned strings for ``name``, the node's ``text`` as an
+    offset range into one shared text buffer, and ``path`` as an entry of a path trie
+    (prefix path + last step), so ``//Document/Table[3]/TR[2]/TD`` shares its prefix
+    with every other cell of the table instead of repeating it.
+
+    Layout kept by ``parse_hierarchy(keep_layout=True)`` goes to four more columns:
+    ``page`` and ``font`` (an index into the root's font table) as ints, ``bounds`` as
+    four packed doubles per node and ``text_size`` as a double. They stay empty for a
+    tree without layout.
+
+    The key layout of every node (which keys, in which order) is kept, and values that
+    do not fit the arrays (other keys, non-string text, ...) are stored as they are in
+    ``extras``, so ``to_dict`` gives back exactly the tree the CompactTree was built from.
+
+    ``view`` returns the tree as ``NodeView`` dicts, which the existing extractors
+    walk unchanged.
+    """
+
+    def __init__(self):
+        self.parent = array("i")
+        self.first_child = array("i")
+        self.next_sibling = array("i")
+        self.layout = array("H")
+        self.name_ids = array("i")
+        self.path_ids = array("i")
+        self.text_offsets = array("Q", [0])
+        self.text_buffer = ""
+        self.layouts = []
+        self.strings = []
+        self.path_prefix = array("i")
+        self.path_step = array("i")
+        self.page_numbers = array("i")
+        self.bounds = array("d")
+        self.font_ids = array("i")
+        self.text_sizes = array("d")
+        self.extras = {}
+
+    def __len__(self):
+        return len(self.parent)
+
+    # -----------------------
+    # Building
+    # -----------------------
+    @classmethod
+    def from_dict(cls, root):
+        """Pack a nested ``{"name", "text", "path", "children"}`` tree (e.g. from parse_hierarchy)."""
+        tree = cls()
+        string_ids = {}
+        path_ids = {}
+        layout_ids = {}
+        last_child = array("i")
+        texts = []
+        text_end = 0
+        has_layout = False
+
+        def intern_string(value):
+            string_id = string_ids.get(value)
+            if string_id is None:
+                string_id = string_ids[value] = len(tree.strings)
+                tree.strings.append(sys.intern(value))
+            return string_id
+
+        def intern_path(path):
+            path_id = path_ids.get(path)
+            if path_id is None:
+                cut = path.rfind("/")
+                if cut > 1:
+                    prefix, step = intern_path(path[:cut]), path[cut + 1:]
+                else:
+                    prefix, step = NO_NODE, path
+                path_id = path_ids[path] = len(tree.path_prefix)
+                tree.path_prefix.append(prefix)
+                tree.path_step.append(intern_string(step))
+            return path_id
+
+        stack = [(root, NO_NODE)]
+        while stack:
+            node, parent = stack.pop()
+            index = len(tree.parent)
+            tree.parent.append(parent)
+            tree.first_child.append(NO_NODE)
+            tree.next_sibling.append(NO_NODE)
+            last_child.append(NO_NODE)
+            if parent != NO_NODE:
+                if last_child[parent] == NO_NODE:
+                    tree.first_child[parent] = index
+                else:
+                    tree.next_sibling[last_child[parent]] = index
+                last_child[parent] = index
+
+            keys = tuple(node)
+            layout_id = layout_ids.get(keys)
+            if layout_id is None:
+                layout_id = layout_ids[keys] = len(tree.layouts)
+                tree.layouts.append(keys)
+            tree.layout.append(layout_id)
+
+            extras = {key: copy.deepcopy(value) for key, value in node.items() if not _is_compact(key, value)}
+            if extras:
+                tree.extras[index] = extras
+
+            name = node.get("name")
+            tree.name_ids.append(intern_string(name) if "name" not in extras and isinstance(name, str) else NO_NODE)
+            path = node.get("path")
+            tree.path_ids.append(intern_path(path) if "path" not in extras and isinstance(path, str) else NO_NODE)
+            text = node.get("text")
+            if "text" not in extras and isinstance(text, str):
+                texts.append(text)
+                text_end += len(text)
+            tree.text_offsets.append(text_end)
+
+            layout_values = [node.get(key) if key in node and key not in extras else None for key in LAYOUT_NODE_KEYS]
+            page, bounds, font, text_size = layout_values
+            has_layout = has_layout or any(value is not None for value in layout_values)
+            tree.page_numbers.append(NO_NODE if page is None else page)
+            tree.bounds.extend((0.0, 0.0, 0.0, 0.0) if bounds is None else bounds)
+            tree.font_ids.append(NO_NODE if font is None else font)
+            tree.text_sizes.append(0.0 if text_size is None else text_size)
+
+            if "children" not in extras and "children" in node:
+                for child in reversed(node["children"]):
+                    stack.append((child, index))
+
+        tree.text_buffer = "".join(texts)
+        if not has_layout:
+            tree.page_numbers, tree.bounds, tree.font_ids, tree.text_sizes = array("i"), array("d"), array("i"), array("d")
+        return tree
+
+    @classmethod
+    def from_elements(cls, elements, keep_layout=False, pages=None):
+        """Build the hierarchy of structuredData elements and pack it."""
+        return cls.from_dict(parse_hierarchy(elements, keep_layout=keep_layout, pages=pages))
+
+    # -----------------------
+    # Reading
+    # -----------------------
+    def keys_of(self, index):
+        return self.layouts[self.layout[index]]
+
+    def name(self, index):
+        name_id = self.name_ids[index]
+        return self.strings[name_id] if name_id != NO_NODE else self.extras.get(index, {}).get("name")
+
+    def text(self, index):
+        return self.text_buffer[self.text_offsets[index]:self.text_offsets[index + 1]]
+
+    def path_string(self, path_id):
+        steps = []
+        while path_id != NO_NODE:
+            steps.append(self.strings[self.path_step[path_id]])
+            path_id = self.path_prefix[path_id]
+        return "/".join(reversed(steps))
+
+    def path(self, index):
+        path_id = self.path_ids[index]
+        return self.path_string(path_id) if path_id != NO_NODE else self.extras.get(index, {}).get("path")
+
+    def page(self, index):
+        return self.page_numbers[index]
+
+    def bounds_of(self, index):
+        return self.bounds[4 * index:4 * index + 4].tolist()
+
+    def children(self, index):
+        """Indexes of the children of a node, in order."""
+        child = self.first_child[index]
+        while child != NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def node_items(self, index, with_children=True):
+        """(key, value) pairs of one node in their original order; children as index lists."""
+        extras = self.extras.get(index)
+        items = []
+        for key in self.keys_of(index):
+            if extras is not None and key in extras:
+                items.append((key, copy.deepcopy(extras[key])))
+            elif key == "name":
+                items.append((key, self.strings[self.name_ids[index]]))
+            elif key == "text":
+                items.append((key, self.text(index)))
+            elif key == "path":
+                items.append((key, self.path_string(self.path_ids[index])))
+            elif key == "page":
+                items.append((key, self.page_numbers[index]))
+            elif key == "bounds":
+                items.append((key, self.bounds_of(index)))
+            elif key == "font":
+                items.append((key, self.font_ids[index]))
+            elif key == "text_size":
+                items.append((key, self.text_sizes[index]))
+            elif with_children:
+                items.append((key, list(self.children(index))))
+        return items
+
+    def view(self, index=0):
+        """A dict view of a node (the root by default); see NodeView."""
+        return NodeView(self, index)
+
+    def subtree_end(self, index):
+        """One past the last node of a node's subtree (subtrees are contiguous in pre-order)."""
+        while index != NO_NODE:
+            if self.next_sibling[index] != NO_NODE:
+                return self.next_sibling[index]
+            index = self.parent[index]
+        return len(self.parent)
+
+    def path_strings(self):
+        """Every entry of the path trie as a string, indexed by path id (prefixes come first)."""
+        paths = []
+        for prefix, step in zip(self.path_prefix, self.path_step):
+            paths.append(self.strings[step] if prefix == NO_NODE else paths[prefix] + "/" + self.strings[step])
+        return paths
+
+    def to_dict(self, index=0):
+        """The subtree of a node as plain nested dicts, equal to the tree it was built from.
+
+        Decoded column by column over the subtree's index range (names, texts, paths and
+        layout in one pass each), then every node is appended to its parent's children, which
+        in pre-order keeps their original order.
+        """
+        end = self.subtree_end(index)
+        strings, buffer, paths = self.strings, self.text_buffer, self.path_strings()
+        offsets = self.text_offsets[index:end + 1]
+        names = [strings[name_id] if name_id != NO_NODE else None for name_id in self.name_ids[index:end]]
+        texts = [buffer[start:stop] for start, stop in zip(offsets, offsets[1:])]
+        node_paths = [paths[path_id] if path_id != NO_NODE else None for path_id in self.path_ids[index:end]]
+        columns = {"name": names, "text": texts, "path": node_paths}
+        if self.page_numbers:
+            bounds = self.bounds
+            columns["page"] = self.page_numbers[index:end].tolist()
+            columns["bounds"] = [bounds[at:at + 4].tolist() for at in range(4 * index, 4 * end, 4)]
+            columns["font"] = self.font_ids[index:end].tolist()
+            columns["text_size"] = self.text_sizes[index:end].tolist()
+
+        nodes = []
+        append = nodes.append
+        parents = self.parent[index:end]
+        standard = [keys == STANDARD_KEYS for keys in self.layouts]
+        extras = self.extras
+        for offset, (layout_id, name, text, path, parent) in enumerate(
+                zip(self.layout[index:end], names, texts, node_paths, parents)):
+            if standard[layout_id] and (not extras or index + offset not in extras):
+                node = {"name": name, "text": text, "path": path, "children": []}
+            else:
+                node_extras = extras.get(index + offset, {})
+                node = {}
+                for key in self.layouts[layout_id]:
+                    if key in node_extras:
+                        node[key] = copy.deepcopy(node_extras[key])
+                    elif key == "children":
+                        node[key] = []
+                    else:
+                        node[key] = columns[key][offset]
+            append(node)
+            if offset:
+                nodes[parent - index]["children"].append(node)
+        return nodes[0]
+
+    def nbytes(self):
+        """Approximate size of the packed tree in bytes."""
+        arrays = (self.parent, self.first_child, self.next_sibling, self.layout, self.name_ids, self.path_ids,
+                  self.text_offsets, self.path_prefix, self.path_step, self.page_numbers, self.bounds,
+                  self.font_ids, self.text_sizes)
+        size = sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+        size += sys.getsizeof(self.text_buffer) + sum(sys.getsizeof(s) for s in self.strings)
+        return size
+
+    # -----------------------
+    # Binary format
+    # -----------------------
+    def to_bytes(self):
+        """Serialize to the binary hierarchy format.
+
+        After an 8-byte magic come length-prefixed sections (u64 little-endian length,
+        then the data): a JSON header with the key layouts, ``extras`` and array type
+        codes; the code-point lengths of the string table and the table itself as one
+        UTF-8 blob; every array of BINARY_ARRAYS as raw little-endian items; and the text
+        buffer as UTF-8. Loading is a few ``frombytes`` calls instead of a JSON parse.
+        """
+        header = {
+            "version": BINARY_VERSION,
+            "layouts": self.layouts,
+            "extras": {str(index): values for index, values in self.extras.items()},
+            "typecodes": {name: getattr(self, name).typecode for name in BINARY_ARRAYS},
+        }
+        sections = [
+            json.dumps(header, ensure_ascii=False).encode("utf-8"),
+            _array_bytes(array("I", [len(s) for s in self.strings])),
+            "".join(self.strings).encode("utf-8"),
+        ]
+        sections.extend(_array_bytes(getattr(self, name)) for name in BINARY_ARRAYS)
+        sections.append(self.text_buffer.encode("utf-8"))
+        return BINARY_MAGIC + b"".join(struct.pack("<Q", len(section)) + section for section in sections)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Inverse of ``to_bytes``."""
+        if not data.startswith(BINARY_MAGIC):
+            raise ValueError("Not a binary hierarchy (bad magic)")
+        view = memoryview(data)
+        pos = len(BINARY_MAGIC)
+        sections = []
+        while pos < len(data):
+            (length,) = struct.unpack_from("<Q", data, pos)
+            pos += 8
+            sections.append(view[pos:pos + length])
+            pos += length
+        header = json.loads(bytes(sections[0]).decode("utf-8")) if sections else {}
+        array_names = {1: BINARY_ARRAYS_V1, BINARY_VERSION: BINARY_ARRAYS}.get(header.get("version"))
+        if array_names is None:
+            raise ValueError(f"Unsupported binary hierarchy version {header.get('version')}")
+        if len(sections) != len(array_names) + 4:
+            raise ValueError("Truncated binary hierarchy")
+        tree = cls()
+        tree.layouts = [tuple(keys) for keys in header["layouts"]]
+        tree.extras = {int(index): values for index, values in header["extras"].items()}
+
+        blob = bytes(sections[2]).decode("utf-8")
+        pos = 0
+        for length in _array_from(sections[1], "I"):
+            tree.strings.append(sys.intern(blob[pos:pos + length]))
+            pos += length
+        for name, section in zip(array_names, sections[3:]):
+            setattr(tree, name, _array_from(section, header["typecodes"][name]))
+        tree.text_buffer = bytes(sections[-1]).decode("utf-8")
+        return tree
+
+
+def _is_compact(key, value):
+    if key == "children":
+        return isinstance(value, list) and all(isinstance(child, dict) for child in value)
+    if key in ("page", "font"):
+        return type(value) is int and -2 ** 31 < value < 2 ** 31
+    if key == "bounds":
+        return type(value) is list and len(value) == 4 and all(type(x) is float for x in value)
+    if key == "text_size":
+        return type(value) is float
+    return key in COMPACT_KEYS and isinstance(value, str)
+
+
+class NodeView(dict):
+    """One CompactTree node as a dict, for code written against the nested-dict tree.
+
+    ``name``/``text``/``path`` are filled in when the view is created; the ``children``
+    list (of NodeViews) is only built the first time the node is read as a whole or its
+    children are asked for, and is then kept, so changes an extractor makes to it (e.g.
+    merging table rows) persist on the view like they would on a dict. Such writes stay
+    on the views and never change the CompactTree itself; ``to_dict`` and
+    ``save_hierarchy`` include them.
+    """
+
+    __slots__ = ("tree", "index", "_loaded")
+
+    def __init__(self, tree, index):
+        if tree.layouts[tree.layout[index]] == STANDARD_KEYS and index not in tree.extras:
+            dict.__init__(self, name=tree.strings[tree.name_ids[index]], text=tree.text(index),
+                          path=tree.path_string(tree.path_ids[index]))
+        else:
+            dict.__init__(self, tree.node_items(index, with_children=False))
+        self.tree = tree
+        self.index = index
+        self._loaded = "children" not in tree.keys_of(index)
+
+    def _load(self):
+        """Put the children list in place, in the node's original key position."""
+        if self._loaded:
+            return
+        self._loaded = True
+        keys = self.tree.keys_of(self.index)
+        if "children" not in keys or "children" in self.tree.extras.get(self.index, ()):
+            return
+        children = [NodeView(self.tree, child) for child in self.tree.children(self.index)]
+        if keys[-1] == "children":
+            dict.__setitem__(self, "children", children)
+            return
+        items = dict(dict.items(self))
+        items["children"] = children
+        dict.clear(self)
+        dict.update(self, [(key, items[key]) for key in keys if key in items] +
+                    [(key, value) for key, value in items.items() if key not in keys])
+
+    def __getitem__(self, key):
+        if key == "children":
+            self._load()
+        return dict.__getitem__(self, key)
+
+    def get(self, key, default=None):
+        if key == "children":
+            self._load()
+        return dict.get(self, key, default)
+
+    def __contains__(self, key):
+        if key == "children" and not self._loaded:
+            self._load()
+        return dict.__contains__(self, key)
+
+    def __iter__(self):
+        self._load()
+        return dict.__iter__(self)
+
+    def __reversed__(self):
+        self._load()
+        return dict.__reversed__(self)
+
+    def __len__(self):
+        self._load()
+        return dict.__len__(self)
+
+    def keys(self):
+        self._load()
+        return dict.keys(self)
+
+    def values(self):
+        self._load()
+        return dict.values(self)
+
+    def items(self):
+        self._load()
+        return dict.items(self)
+
+    def __eq__(self, other):
+        self._load()
+        if isinstance(other, NodeView):
+            other._load()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+    def __repr__(self):
+        self._load()
+        return dict.__repr__(self)
+
+    def __setitem__(self, key, value):
+        self._load()
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        self._load()
+        dict.__delitem__(self, key)
+
+    def setdefault(self, key, default=None):
+        self._load()
+        return dict.setdefault(self, key, default)
+
+    def pop(self, key, *default):
+        self._load()
+        return dict.pop(self, key, *default)
+
+    def popitem(self):
+        self._load()
+        return dict.popitem(self)
+
+    def update(self, *args, **kwargs):
+        self._load()
+        dict.update(self, *args, **kwargs)
+
+    def clear(self):
+        self._load()
+        dict.clear(self)
+
+    def __or__(self, other):
+        self._load()
+        return dict.__or__(dict(self), other)
+
+    def __ior__(self, other):
+        self._load()
+        return dict.__ior__(self, other)
+
+    def copy(self):
+        """A plain dict with the same entries (children stay NodeViews), like dict.copy."""
+        self._load()
+        return dict(dict.items(self))
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self.copy(), memo)
+
+    def __reduce__(self):
+        return dict, (self.copy(),)
+
+    def to_dict(self):
+        """The node's subtree as plain dicts as it reads now, view-side writes included.
+
+        Views whose children were never loaded cannot have been changed and are decoded
+        from the CompactTree; everything else is copied from the views, a container at a time.
+        """
+        if not self._loaded:
+            return self.tree.to_dict(self.index)
+        result = {}
+        stack = [(self, result)]
+        while stack:
+            source, target = stack.pop()
+            for key, value in (dict.items(source) if isinstance(source, dict) else enumerate(source)):
+                if isinstance(value, NodeView) and not value._loaded:
+                    value = value.tree.to_dict(value.index)
+                elif isinstance(value, (dict, list)):
+                    copied = {} if isinstance(value, dict) else [None] * len(value)
+                    stack.append((value, copied))
+                    value = copied
+                target[key] = value
+        return result
+
+
+def _array_bytes(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _array_from(data, typecode):
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def is_binary_hierarchy(file_path):
+    with open(file_path, "rb") as f:
+        return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def save_hierarchy(tree, file_path, binary=None):
+    """Write a hierarchy (nested dicts, a NodeView or a CompactTree) as JSON or in the binary format.
+
+    ``binary`` defaults to the file extension (``.hbin``). Written atomically, so a
+    reader never sees a half-written file.
+    """
+    if binary is None:
+        binary = file_path.endswith(BINARY_SUFFIX)
+    if isinstance(tree, NodeView):
+        # An untouched root view is the whole CompactTree; otherwise write what the views read now
+        tree = tree.tree if tree.index == 0 and not tree._loaded else tree.to_dict()
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)), suffix=".part")
+    try:
+        if binary:
+            packed = tree if isinstance(tree, CompactTree) else CompactTree.from_dict(tree)
+            with os.fdopen(fd, "wb") as f:
+                f.write(packed.to_bytes())
+        else:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(tree.to_dict() if isinstance(tree, CompactTree) else tree, f, indent=2)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def load_hierarchy(file_path, compact=False):
+    """Load a hierarchy written by json_struct, as JSON or in the binary format (detected by content).
+
+    Returns nested dicts, or with ``compact`` a NodeView of the root of a CompactTree. The binary
+    format is opt-in: decoding it into dicts is no faster than json.load, so the SoA and forms
+    scripts keep reading JSON and only code that walks a NodeView gains from an .hbin file.
+    """
+    if is_binary_hierarchy(file_path):
+        with open(file_path, "rb") as f:
+            tree = CompactTree.from_bytes(f.read())
+        return tree.view() if compact else tree.to_dict()
+
+    with open(file_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    return CompactTree.from_dict(data).view() if compact else data
+
+
+if __name__ == "__main__":
+    # Convert between the JSON and binary hierarchy formats: compact_tree.py <input> [output]
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "hierarchical_output_final.json"
+    if len(sys.argv) > 2:
+        output_file = sys.argv[2]
+    elif is_binary_hierarchy(input_file):
+        output_file = os.path.splitext(input_file)[0] + ".json"
+    else:
+        output_file = os.path.splitext(input_file)[0] + BINARY_SUFFIX
+    save_hierarchy(load_hierarchy(input_file, compact=True), output_file)
+    print(f"✅ {input_file} ({os.path.getsize(input_file) / 1024:.0f} KiB) -> "
+          f"{output_file} ({os.path.getsize(output_file) / 1024:.0f} KiB)")
@@ -1,5 +1,17 @@
+import io
 import json
+import os
 import re
+import sys
+import zipfile
+
+STRUCTURED_DATA_MEMBER = "structuredData.json"
+STREAM_CHUNK_SIZE = 1 << 16
+# The only element fields parse_hierarchy reads
+HIERARCHY_FIELDS = ("Path", "path", "Text", "text")
+# Element fields kept on the nodes with keep_layout, and the node keys they are stored under
+LAYOUT_FIELDS = ("Page", "Bounds", "Font", "TextSize")
+LAYOUT_KEYS = {"Page": "page", "Bounds": "bounds", "Font": "font", "TextSize": "text_size"}
 
 
 def normalize_path(path):
@@ -10,86 +22,197 @@ def normalize_path(path):
     return "//" + path if path else ""
 
 
-def get_header_level(path):
-    """Detect header level from path (Title, H1, H2, etc.)."""
-    normalized = normalize_path(path)
-    if normalized.endswith("/Title"):
-        return 0
-    match = re.search(r'/H(\d+)(\[\d+\])?$', normalized)
-    if match:
-        return int(match.group(1))
-    return None
-
-
-def is_table_or_complex_structure(path):
-    """Return True only for complex nested structures like tables, lists, etc."""
-    return re.search(r'/(TR|TD|TH|LBody|LI|Lbl|Caption|Footnote|Aside)', path) is not None
-
-
-def is_inline_content(path):
-    """Return True for inline content like Span, Sub that should nest under paragraphs."""
-    return re.search(r'/(Span|Sub|StyleSpan|ExtraCharSpan)$', path) is not None
-
-
-def is_top_level_table(path):
-    """Return True if this is a top-level table directly under Document."""
-    normalized = normalize_path(path)
-    return re.match(r'^//Document/Table(\[\d+\])?$', normalized) is not None
+SEGMENT_PATTERN = re.compile(r'^(.*?)\[(\d+)\]$')
+HEADER_TAG_PATTERN = re.compile(r'^H(\d+)$')
+INLINE_TAGS = frozenset(["Span", "Sub", "StyleSpan", "ExtraCharSpan"])
+COMPLEX_TAG_PREFIXES = ("TR", "TD", "TH", "LBody", "LI", "Lbl", "Caption", "Footnote", "Aside")
 
 
-def get_parent_path(path):
-    """Get parent path by removing last component."""
-    normalized = normalize_path(path)
-    if not normalized or normalized == "//":
-        return ""
-    parts = normalized[2:].split("/")  # Remove // prefix and split
-    if len(parts) <= 1:
-        return ""
-    return "//" + "/".join(parts[:-1])
-
-
-def parse_hierarchy(elements):
+def parse_segment(part):
+    """Split one path step into (tag, index): "TR[2]" -> ("TR", 2), "TR" -> ("TR", None)."""
+    match = SEGMENT_PATTERN.match(part)
+    if match:
+        return sys.intern(match.group(1)), int(match.group(2))
+    return sys.intern(part), None
+
+
+class PathInfo:
+    """A Path parsed once: its (tag, index) segments and the classification parse_hierarchy needs.
+
+    Infos are cached per path string and built from their parent's info, so a new path
+    such as ``//Document/Table[3]/TR[2]/TD/P`` costs one cached segment lookup on top of
+    ``//Document/Table[3]/TR[2]/TD``, and the parent is the key tuple without its last
+    segment.
+    """
+
+    __slots__ = ("path", "name", "key", "parent", "header_level", "is_inline", "is_complex",
+                 "is_top_level_table")
+
+    def __init__(self, parent=None, part=None):
+        if parent is None:
+            # The empty path
+            self.path, self.name, self.key, self.parent = "", "", (), None
+            self.header_level, self.is_inline, self.is_complex, self.is_top_level_table = None, False, False, False
+            return
+
+        tag, index, header_level, is_inline, is_complex = _segment_info(part)
+        self.path = sys.intern(parent.path + "/" + part) if parent.key else sys.intern("//" + part)
+        self.name = sys.intern(part)
+        self.key = parent.key + ((tag, index),)
+        self.parent = parent
+        self.header_level = header_level
+        self.is_inline = is_inline
+        self.is_complex = is_complex or parent.is_complex
+        self.is_top_level_table = tag == "Table" and parent.key == DOCUMENT_KEY
+
+    @property
+    def parent_key(self):
+        return self.parent.key if self.parent is not None else ()
+
+
+DOCUMENT_KEY = (("Document", None),)
+EMPTY_PATH = PathInfo()
+_SEGMENT_CACHE = {}
+_PATH_CACHE = {}
+_PATH_CACHE_LIMIT = 1 << 17
+
+
+def _segment_info(part):
+    """(tag, index, header level, inline?, complex?) of one path step, cached per distinct step."""
+    info = _SEGMENT_CACHE.get(part)
+    if info is None:
+        tag, index = parse_segment(part)
+        header = HEADER_TAG_PATTERN.match(tag)
+        header_level = 0 if part == "Title" else (int(header.group(1)) if header else None)
+        info = (tag, index, header_level, index is None and tag in INLINE_TAGS,
+                tag.startswith(COMPLEX_TAG_PREFIXES))
+        _SEGMENT_CACHE[part] = info
+    return info
+
+
+def _normalized_path_info(normalized):
+    info = _PATH_CACHE.get(normalized)
+    if info is None:
+        if not normalized:
+            return EMPTY_PATH
+        cut = normalized.rfind("/")
+        if cut < 2:
+            info = PathInfo(EMPTY_PATH, normalized[2:])
+        else:
+            info = PathInfo(_normalized_path_info(normalized[:cut]), normalized[cut + 1:])
+        if len(_PATH_CACHE) >= _PATH_CACHE_LIMIT:
+            _PATH_CACHE.clear()
+        _PATH_CACHE[normalized] = info
+    return info
+
+
+def path_info(path):
+    """PathInfo of a raw element Path (the same object for the same string)."""
+    info = _PATH_CACHE.get(path)
+    if info is None:
+        info = _normalized_path_info(normalize_path(path))
+    return info
+
+
+class FontTable:
+    """Distinct Font dicts of a document; nodes refer to a font by its index in ``fonts``."""
+
+    def __init__(self):
+        self.fonts = []
+        self._ids = {}
+
+    def intern(self, font):
+        try:
+            key = tuple(sorted(font.items()))
+            hash(key)
+        except (AttributeError, TypeError):
+            key = json.dumps(font, sort_keys=True)
+        font_id = self._ids.get(key)
+        if font_id is None:
+            font_id = self._ids[key] = len(self.fonts)
+            self.fonts.append(font)
+        return font_id
+
+
+def add_layout(node, elem, font_table):
+    """Copy Page, Bounds, Font (as a font table index) and TextSize of an element onto its node."""
+    page = elem.get("Page")
+    if page is not None:
+        node["page"] = page
+    bounds = elem.get("Bounds")
+    if bounds is not None:
+        node["bounds"] = bounds
+    font = elem.get("Font")
+    if font is not None:
+        node["font"] = font_table.intern(font)
+    text_size = elem.get("TextSize")
+    if text_size is not None:
+        node["text_size"] = text_size
+
+
+def page_sizes(pages):
+    """[width, height] of every page, from the "pages" entries of structuredData.json."""
+    sizes = []
+    for page in pages or []:
+        sizes.append([page.get("width"), page.get("height")])
+    return sizes
+
+
+def parse_hierarchy(elements, keep_layout=False, pages=None, spatial_index=None):
+    """Build the header-nested document tree from structuredData elements.
+
+    With ``keep_layout``, nodes made from elements also get ``page``, ``bounds``,
+    ``font`` and ``text_size``; ``font`` indexes the root's ``fonts`` table of distinct
+    Font dicts, and the root gets ``pages`` ([width, height] per page, from ``pages``).
+    Such nodes are also added to ``spatial_index`` (a spatial_index.SpatialIndex) as
+    they are created.
+    """
+    font_table = FontTable() if keep_layout else None
     root = {"name": "Document Root", "children": []}
     header_context = {0: root}
+    # Nodes by path string: interned by path_info, so lookups hash a cached string hash
     path_to_node = {"": root, "//Document": root}
+    # header_context[max(header_context)] is always the header added last (deeper levels are dropped)
+    current = root
 
-    def ensure_path_exists(target_path):
-        """Ensure node exists for target_path, create placeholders if missing."""
-        normalized = normalize_path(target_path)
-
-        if normalized == "//Document" or normalized == "":
+    def ensure_path_exists(info):
+        """Ensure node exists for the path, create placeholders if missing."""
+        if not info.key or info.key == DOCUMENT_KEY:
             return root
 
-        if normalized in path_to_node:
-            return path_to_node[normalized]
+        node = path_to_node.get(info.path)
+        if node is not None:
+            return node
 
-        parent_path = get_parent_path(normalized)
-
-        if parent_path == "//Document" or parent_path == "":
-            parent_node = header_context[max(header_context.keys())]
+        if info.parent_key == DOCUMENT_KEY or not info.parent_key:
+            parent_node = current
         else:
-            parent_node = ensure_path_exists(parent_path)
+            parent_node = ensure_path_exists(info.parent)
 
-        node_name = normalized.split("/")[-1] if normalized else "Unknown"
-        new_node = {"name": node_name, "text": "", "path": normalized, "children": []}
-        path_to_node[normalized] = new_node
+        new_node = {"name": info.name or "Unknown", "text": "", "path": info.path, "children": []}
+        path_to_node[info.path] = new_node
         parent_node.setdefault("children", []).append(new_node)
         return new_node
 
     for elem in elements:
-        original_path = elem.get("path") or elem.get("Path") or ""
-        path = normalize_path(original_path)
+        info = path_info(elem.get("path") or elem.get("Path") or "")
         text = elem.get("text") or elem.get("Text") or ""
-        name = path.split("/")[-1] if path else ""
 
         # Skip creating separate Document nodes
-        if name == "Document" and path == "//Document":
+        if info.key == DOCUMENT_KEY:
             continue
 
-        node = {"name": name, "text": text, "path": path, "children": []}
-        path_to_node[path] = node
+        if keep_layout:
+            node = {"name": info.name, "text": text, "path": info.path}
+            add_layout(node, elem, font_table)
+            node["children"] = []
+            if spatial_index is not None:
+                spatial_index.add(node)
+        else:
+            node = {"name": info.name, "text": text, "path": info.path, "children": []}
+        path_to_node[info.path] = node
 
-        header_level = get_header_level(path)
+        header_level = info.header_level
 
         if header_level is not None:
             # Headers: nest under appropriate parent header
@@ -101,52 +224,203 @@ def parse_hierarchy(elements):
             for lvl in list(header_context.keys()):
                 if lvl > header_level:
                     del header_context[lvl]
+            current = node
 
-        elif is_top_level_table(path):
+        elif info.is_top_level_table:
             # Top-level tables: place under current header context, not root
-            parent = header_context[max(header_context.keys())]
-            parent.setdefault("children", []).append(node)
+            current.setdefault("children", []).append(node)
 
-        elif is_inline_content(path):
-            # Inline content: nest under parent paragraph/element
-            parent_path = get_parent_path(path)
-            parent_node = ensure_path_exists(parent_path)
-            parent_node.setdefault("children", []).append(node)
-
-        elif is_table_or_complex_structure(path):
-            # Complex structures: use strict path hierarchy
-            parent_path = get_parent_path(path)
-            parent_node = ensure_path_exists(parent_path)
+        elif info.is_inline or info.is_complex:
+            # Inline content nests under its parent paragraph/element; complex structures
+            # (tables, lists) follow the strict path hierarchy
+            parent_node = ensure_path_exists(info.parent)
             parent_node.setdefault("children", []).append(node)
 
         else:
             # Default: Paragraphs and other content under current header context
-            parent = header_context[max(header_context.keys())]
-            parent.setdefault("children", []).append(node)
+            current.setdefault("children", []).append(node)
 
+    if keep_layout:
+        root["fonts"] = font_table.fonts
+        root["pages"] = page_sizes(pages)
+        if spatial_index is not None:
+            spatial_index.page_sizes = root["pages"]
     return root
 
 
-def run_hierarchy(input_file, output_file=None):
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-    elements = data.get('elements', []) if isinstance(data, dict) else []
-    hierarchy = parse_hierarchy(elements)
+def open_structured_data(input_file):
+    """Open structuredData.json for reading, either as a plain file or straight out of the Adobe result ZIP.
+
+    The ZIP member is decompressed through a file handle, so the archive is never
+    extracted to disk and table/figure renditions next to it are never read.
+    """
+    if zipfile.is_zipfile(input_file):
+        archive = zipfile.ZipFile(input_file)
+        try:
+            member = archive.open(STRUCTURED_DATA_MEMBER)
+        except KeyError:
+            archive.close()
+            raise FileNotFoundError(f"{STRUCTURED_DATA_MEMBER} not found in {input_file}")
+        # The ZipFile stays open until the member handle is closed
+        archive.close()
+        return io.TextIOWrapper(member, encoding='utf-8')
+    return open(input_file, 'r', encoding='utf-8')
+
+
+def load_structured_data(input_file):
+    """Load the Adobe structuredData.json document from a .json file or result ZIP."""
+    with open_structured_data(input_file) as f:
+        return json.load(f)
+
+
+class _JsonStream:
+    """Buffered reader that decodes one JSON value at a time from a text file handle."""
+
+    _WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, handle, chunk_size=STREAM_CHUNK_SIZE):
+        self.handle = handle
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_chars):
+        """Read until at least ``min_chars`` unread characters are buffered (or EOF)."""
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        while len(self.buffer) < min_chars and not self.eof:
+            chunk = self.handle.read(max(self.chunk_size, min_chars - len(self.buffer)))
+            if not chunk:
+                self.eof = True
+            self.buffer += chunk
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it ('' at EOF)."""
+        while True:
+            self.pos = self._WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ""
+            self._fill(1)
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected '{char}' in JSON stream, found '{self.peek()}'")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input until it fits in the buffer."""
+        self.peek()
+        while True:
+            try:
+                result, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill(2 * (len(self.buffer) - self.pos) + self.chunk_size)
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and isinstance(result, (int, float)):
+                self._fill(len(self.buffer) - self.pos + self.chunk_size)
+                continue
+            self.pos = end
+            return result
+
+
+def iter_elements(input_file, fields=HIERARCHY_FIELDS, top_level=None):
+    """Yield the entries of the top-level "elements" array one at a time, without loading the document.
+
+    Only ``fields`` are kept from each element (all of them when ``fields`` is None), so
+    bounds, fonts and attributes are dropped as soon as an element is decoded. Other
+    top-level values whose key is in the ``top_level`` dict are stored in it as they
+    are passed (e.g. "pages", which follows "elements").
+    """
+    with open_structured_data(input_file) as f:
+        stream = _JsonStream(f)
+        stream.expect("{")
+        while stream.peek() not in ("}", ""):
+            key = stream.value()
+            stream.expect(":")
+            if key != "elements":
+                value = stream.value()
+                if top_level is not None and key in top_level:
+                    top_level[key] = value
+            else:
+                stream.expect("[")
+                while stream.peek() != "]":
+                    elem = stream.value()
+                    if fields is not None and isinstance(elem, dict):
+                        elem = {name: elem[name] for name in fields if name in elem}
+                    yield elem
+                    if stream.peek() == ",":
+                        stream.pos += 1
+                stream.expect("]")
+            if stream.peek() == ",":
+                stream.pos += 1
+
+
+def run_hierarchy(input_file, output_file=None, streaming=False, binary=False, keep_layout=False, node_index=False,
+                  hashes=False):
+    """Build the hierarchy of one structuredData file and save it (atomically); returns the output path."""
+    if streaming:
+        # Elements are attached to the tree as they are decoded; the document is never held in memory
+        fields = HIERARCHY_FIELDS + LAYOUT_FIELDS if keep_layout else HIERARCHY_FIELDS
+        top_level = {"pages": None}
+        hierarchy = parse_hierarchy(iter_elements(input_file, fields, top_level), keep_layout=keep_layout)
+        if keep_layout:
+            hierarchy["pages"] = page_sizes(top_level["pages"])
+    else:
+        data = load_structured_data(input_file)
+
+        elements = data.get('elements', []) if isinstance(data, dict) else []
+        pages = data.get('pages') if isinstance(data, dict) else None
+        hierarchy = parse_hierarchy(elements, keep_layout=keep_layout, pages=pages)
+
+    if hashes:
+        # Merkle hash of every subtree, stored on the nodes, for diffs against the previous version
+        from subtree_hash import subtree_hashes
+        subtree_hashes(hierarchy, store=True)
 
       # If output_file is None, create from input_file by inserting '_output' before extension
     if output_file is None:
         base, ext = os.path.splitext(input_file)
+        if zipfile.is_zipfile(input_file):
+            ext = ".json"
+        if binary:
+            ext = ".hbin"
         output_file = f"{base}_output{ext}"
 
-
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(hierarchy, f, indent=2)
+    # Written to a temporary file and renamed, so a reader never sees a half-written hierarchy
+    from compact_tree import save_hierarchy
+    save_hierarchy(hierarchy, output_file, binary=binary)
 
     print(f"✅ Fixed table placement hierarchy saved to {output_file}")
 
-if __name__ == "__main__":
-    import sys
-    input_file = sys.argv[1] if len(sys.argv) > 1 else "texttablestructured_protocol2.json"
-    run_hierarchy(input_file)
+    # Sidecar SQLite index (x.json -> x.nodes.sqlite) for queries that need only a few nodes
+    from node_index import sidecar_path, write_node_index
+    if node_index:
+        if write_node_index(hierarchy, sidecar_path(output_file), output_file):
+            print(f"✅ Node index saved to {sidecar_path(output_file)}")
+    elif os.path.exists(sidecar_path(output_file)):
+        # Left by an earlier run with --sqlite; it describes the previous hierarchy
+        os.remove(sidecar_path(output_file))
+
+    return output_file
+
 
+def main(argv=None):
+    """Single-file command line; build_hierarchies.py builds many files in parallel."""
+    argv = sys.argv[1:] if argv is None else argv
+    flags = ("--stream", "--binary", "--layout", "--sqlite", "--hash")
+    args = [arg for arg in argv if arg not in flags]
+    input_file = args[0] if args else "texttablestructured_protocol2.json"
+    run_hierarchy(input_file, streaming="--stream" in argv, binary="--binary" in argv,
+                  keep_layout="--layout" in argv, node_index="--sqlite" in argv, hashes="--hash" in argv)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import sys
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_SUFFIX = ".nodes.sqlite"
+# Keys with a column of their own when the value has this type; anything else is kept in ``extra``
+COLUMN_TYPES = {"name": str, "text": str, "path": str, "page": int}
+# The key layout of every node parse_hierarchy creates, except the root (stored as NULL)
+STANDARD_KEYS = ["name", "text", "path", "children"]
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE nodes (
+    id INTEGER PRIMARY KEY,
+    parent INTEGER,
+    depth INTEGER NOT NULL,
+    subtree_end INTEGER NOT NULL,
+    name TEXT,
+    path TEXT,
+    page INTEGER,
+    text TEXT,
+    keys TEXT,
+    extra TEXT
+);
+"""
+INDEXES = """
+CREATE INDEX nodes_name ON nodes (name);
+CREATE INDEX nodes_parent ON nodes (parent);
+CREATE INDEX nodes_page ON nodes (page);
+"""
+
+
+def sidecar_path(hierarchy_file):
+    """The index file that goes with a hierarchy file: ``x.json`` -> ``x.nodes.sqlite``."""
+    return os.path.splitext(hierarchy_file)[0] + SIDECAR_SUFFIX
+
+
+def source_stamp(hierarchy_file):
+    """Size, modification time and SHA-256 of a hierarchy file, as stored in its index's ``meta``."""
+    digest = hashlib.sha256()
+    with open(hierarchy_file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    stat = os.stat(hierarchy_file)
+    return {"source_size": str(stat.st_size), "source_mtime": str(stat.st_mtime_ns),
+            "source_sha256": digest.hexdigest()}
+
+
+def index_is_current(index_file, hierarchy_file):
+    """Whether the sidecar index was written for the hierarchy file as it is now.
+
+    Size and mtime are compared first; when only the mtime differs (a copy, a touch) the
+    content hash decides. An index without a stamp, or one SQLite cannot read, is stale.
+    """
+    try:
+        connection = sqlite3.connect(f"file:{index_file}?mode=ro", uri=True)
+        try:
+            stored = dict(connection.execute("SELECT key, value FROM meta WHERE key LIKE 'source_%'"))
+        finally:
+            connection.close()
+        stat = os.stat(hierarchy_file)
+    except (sqlite3.Error, OSError):
+        return False
+    if stored.get("source_size") != str(stat.st_size):
+        return False
+    if stored.get("source_mtime") == str(stat.st_mtime_ns):
+        return True
+    return stored.get("source_sha256") == source_stamp(hierarchy_file)["source_sha256"]
+
+
+def _node_rows(root):
+    """One row per node in pre-order: ids are pre-order positions, so a subtree is the id range
+    ``id..subtree_end`` and the first child of a node is ``id + 1``."""
+    rows = []
+    stack = [(root, None, 0)]
+    open_rows = []  # (row index, depth) of the nodes whose subtree is still being numbered
+    while stack:
+        node, parent, depth = stack.pop()
+        node_id = len(rows)
+        while open_rows and open_rows[-1][1] >= depth:
+            rows[open_rows.pop()[0]][3] = node_id - 1
+        columns = {key: None for key in COLUMN_TYPES}
+        extra = {}
+        for key, value in node.items():
+            if key == "children":
+                continue
+            if key in COLUMN_TYPES and type(value) is COLUMN_TYPES[key]:
+                columns[key] = value
+            else:
+                extra[key] = value
+        keys = list(node)
+        rows.append([node_id, parent, depth, node_id, columns["name"], columns["path"], columns["page"],
+                     columns["text"], None if keys == STANDARD_KEYS else json.dumps(keys),
+                     json.dumps(extra) if extra else None])
+        open_rows.append((node_id, depth))
+        children = node.get("children")
+        if isinstance(children, list):
+            stack.extend((child, node_id, depth + 1) for child in reversed(children) if isinstance(child, dict))
+    for row_index, _ in open_rows:
+        rows[row_index][3] = len(rows) - 1
+    return rows
+
+
+def write_node_index(tree, file_path, source_file=None):
+    """Write the sidecar index of a hierarchy tree; the file is replaced atomically.
+
+    ``source_file`` is the hierarchy file the tree was saved to; its stamp is stored so
+    ``open_hierarchy`` can tell when the index no longer matches it.
+
+    Returns True on success, False (after logging) on a SQLite or file error.
+    """
+    temp_path = file_path + ".tmp"
+    try:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        connection = sqlite3.connect(temp_path)
+        try:
+            connection.executescript(SCHEMA)
+            connection.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", _node_rows(tree))
+            connection.executescript(INDEXES)
+            try:
+                # Trigram tokens make MATCH a case-insensitive substring search, like the `in` tests it replaces
+                connection.execute("CREATE VIRTUAL TABLE node_text USING fts5"
+                                   "(text, content='nodes', content_rowid='id', tokenize='trigram')")
+                tokenizer = "trigram"
+            except sqlite3.OperationalError:
+                connection.execute("CREATE VIRTUAL TABLE node_text USING fts5(text, content='nodes', content_rowid='id')")
+                tokenizer = "unicode61"
+            connection.execute("INSERT INTO node_text (node_text) VALUES ('rebuild')")
+            connection.execute("INSERT INTO meta VALUES ('tokenizer', ?)", (tokenizer,))
+            if source_file is not None:
+                connection.executemany("INSERT INTO meta VALUES (?, ?)", source_stamp(source_file).items())
+            connection.commit()
+        finally:
+            connection.close()
+        os.replace(temp_path, file_path)
+        return True
+    except (sqlite3.Error, OSError) as e:
+        logger.error(f"Could not write node index {file_path}: {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+
+class NodeIndex:
+    """Queries against a sidecar index without loading the hierarchy.
+
+    Lookups return node ids (pre-order positions) or whole subtrees, materialized as the
+    same nested dicts the JSON file holds, so only the matching parts of the document are
+    ever read. Use as a context manager or call ``close``.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.connection = sqlite3.connect(f"file:{file_path}?mode=ro", uri=True)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'tokenizer'").fetchone()
+        self.tokenizer = row[0] if row else "unicode61"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM nodes").fetchone()[0]
+
+    # -----------------------
+    # Lookups (node ids, document order)
+    # -----------------------
+    def ids_by_name(self, name_prefix):
+        """Ids of the nodes whose name starts with ``name_prefix``, answered from the name index."""
+        if not name_prefix:
+            return [row[0] for row in self.connection.execute("SELECT id FROM nodes ORDER BY id")]
+        upper = name_prefix[:-1] + chr(ord(name_prefix[-1]) + 1)
+        rows = self.connection.execute("SELECT id FROM nodes WHERE name >= ? AND name < ? ORDER BY id",
+                                       (name_prefix, upper))
+        return [row[0] for row in rows]
+
+    def ids_by_text(self, text_to_find, case_sensitive=False):
+        """Ids of the nodes whose text contains ``text_to_find``.
+
+        Candidates come from the FTS5 index and are checked with Python's ``in`` (on
+        ``.lower()`` unless ``case_sensitive``), so the answer is the one a tree walk gives.
+        """
+        if self.tokenizer == "trigram" and len(text_to_find) >= 3:
+            phrase = '"' + text_to_find.replace('"', '""') + '"'
+            rows = self.connection.execute("SELECT nodes.id, nodes.text FROM node_text JOIN nodes "
+                                           "ON nodes.id = node_text.rowid WHERE node_text MATCH ? ORDER BY nodes.id",
+                                           (phrase,))
+        else:
+            rows = self.connection.execute("SELECT id, text FROM nodes WHERE text IS NOT NULL ORDER BY id")
+        if case_sensitive:
+            return [node_id for node_id, text in rows if text_to_find in text]
+        needle = text_to_find.lower()
+        return [node_id for node_id, text in rows if needle in text.lower()]
+
+    def parent_of(self, node_id):
+        row = self.connection.execute("SELECT parent FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        return row[0] if row else None
+
+    # -----------------------
+    # Materializing
+    # -----------------------
+    def subtree(self, node_id, built=None):
+        """The subtree rooted at ``node_id`` as nested dicts, or None for an unknown id.
+
+        ``built`` maps ids to the nodes materialized so far; a node already in it is
+        returned as is, and the nodes built here are added to it.
+        """
+        if built is None:
+            built = {}
+        elif node_id in built:
+            return built[node_id]
+        row = self.connection.execute("SELECT subtree_end FROM nodes WHERE id = ?", (node_id,)).fetchone()
+        if row is None:
+            return None
+        rows = self.connection.execute("SELECT id, parent, name, path, page, text, keys, extra FROM nodes "
+                                       "WHERE id BETWEEN ? AND ? ORDER BY id", (node_id, row[0]))
+        root = None
+        for current_id, parent, name, path, page, text, keys, extra in rows:
+            if keys is None and extra is None:
+                node = {"name": name, "text": text, "path": path, "children": []}
+            else:
+                values = {"name": name, "path": path, "page": page, "text": text}
+                if extra:
+                    values.update(json.loads(extra))
+                node = {key: [] if key == "children" else values[key]
+                        for key in (json.loads(keys) if keys else STANDARD_KEYS)}
+            built[current_id] = node
+            if current_id == node_id:
+                root = node
+            else:
+                built[parent]["children"].append(node)
+        return root
+
+    def subtrees(self, node_ids):
+        """Subtrees for ids in document order; one nested in another is the same dict object,
+        as in the loaded tree, and is read only once."""
+        built = {}
+        return [self.subtree(node_id, built) for node_id in node_ids]
+
+    # -----------------------
+    # The loader queries
+    # -----------------------
+    def find_nodes_by_name(self, name_prefix):
+        """Subtrees of the nodes whose name starts with ``name_prefix``, like a recursive walk
+        (a match nested in another match is returned on its own as well)."""
+        return self.subtrees(self.ids_by_name(name_prefix))
+
+    def find_element_by_text(self, text_to_find):
+        """The first node (in document order) whose text contains ``text_to_find``, case-insensitive."""
+        ids = self.ids_by_text(text_to_find)
+        return self.subtree(ids[0]) if ids else None
+
+    def find_all_soa_tables(self):
+        """Tables with a row whose first cell holds a child with "Procedure" in its text.
+
+        As with the recursive walk, a table is listed once per such row.
+        """
+        procedure_ids = self.ids_by_text("Procedure", case_sensitive=True)
+        table_rows = set()
+        for start in range(0, len(procedure_ids), 500):
+            chunk = procedure_ids[start:start + 500]
+            rows = self.connection.execute(
+                "SELECT tbl.id, row.id FROM nodes AS p "
+                "JOIN nodes AS cell ON cell.id = p.parent "
+                "JOIN nodes AS row ON row.id = cell.parent AND cell.id = row.id + 1 "
+                "JOIN nodes AS tbl ON tbl.id = row.parent "
+                f"WHERE p.id IN ({','.join('?' * len(chunk))}) AND tbl.name >= 'Table' AND tbl.name < 'Tablf'",
+                chunk)
+            table_rows.update(rows)
+        return self.subtrees([table_id for table_id, _ in sorted(table_rows)])
+
+
+def open_hierarchy(hierarchy_file):
+    """A NodeIndex when the hierarchy file has a sidecar index written for its current
+    content, otherwise the loaded tree."""
+    index_file = sidecar_path(hierarchy_file)
+    if os.path.exists(index_file):
+        if index_is_current(index_file, hierarchy_file):
+            return NodeIndex(index_file)
+        logger.warning(f"Ignoring {index_file}: it was not written for the current {hierarchy_file}")
+    from compact_tree import load_hierarchy
+    return load_hierarchy(hierarchy_file)
+
+
+if __name__ == "__main__":
+    # Build the sidecar for existing hierarchy files (JSON or .hbin)
+    from compact_tree import load_hierarchy
+
+    logging.basicConfig(level=logging.INFO)
+    for hierarchy_file in sys.argv[1:]:
+        if write_node_index(load_hierarchy(hierarchy_file), sidecar_path(hierarchy_file), hierarchy_file):
+            print(f"✅ Node index saved to {sidecar_path(hierarchy_file)}")
@@ -0,0 +1,59 @@
+# Fractions of the page height that count as the running header (top) and footer (bottom) area
+HEADER_BAND = 0.12
+FOOTER_BAND = 0.10
+
+
+class PageGeometry:
+    """Position tests on the nodes of a hierarchy built with ``parse_hierarchy(keep_layout=True)``.
+
+    Bounds are PDF points with the origin at the bottom left of the page, as in
+    structuredData.json: ``[x0, y0, x1, y1]`` with ``y1`` the top edge.
+    With a SpatialIndex over the same tree, ``running_nodes`` answers from the grid.
+    """
+
+    def __init__(self, root, index=None):
+        self.page_sizes = root.get("pages") or []
+        self.fonts = root.get("fonts") or []
+        self.index = index
+
+    @classmethod
+    def from_tree(cls, root, index=None):
+        """A PageGeometry for a tree that carries layout, otherwise None."""
+        if not isinstance(root, dict) or not root.get("pages"):
+            return None
+        return cls(root, index)
+
+    def page_height(self, page):
+        if page is None or not 0 <= page < len(self.page_sizes):
+            return None
+        return self.page_sizes[page][1]
+
+    def font(self, node):
+        """The Font dict of a node, or None."""
+        font_id = node.get("font")
+        return self.fonts[font_id] if font_id is not None and 0 <= font_id < len(self.fonts) else None
+
+    def band(self, node):
+        """"header" or "footer" if the node lies entirely in that area of its page, "body"
+        otherwise, or None when the node or its page has no geometry."""
+        bounds = node.get("bounds")
+        height = self.page_height(node.get("page"))
+        if not bounds or not height:
+            return None
+        if bounds[1] >= height * (1 - HEADER_BAND):
+            return "header"
+        if bounds[3] <= height * FOOTER_BAND:
+            return "footer"
+        return "body"
+
+    def is_header_or_footer(self, node):
+        """True/False from the node's position, or None when it has no geometry."""
+        band = self.band(node)
+        return None if band is None else band != "body"
+
+    def running_nodes(self, names=None):
+        """Nodes lying entirely in the running header or footer area of their page, in
+        document order. Needs the spatial index; returns None without one."""
+        if self.index is None:
+            return None
+        return self.index.in_band(top=HEADER_BAND, bottom=FOOTER_BAND, names=names)
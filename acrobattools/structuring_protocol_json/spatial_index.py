@@ -0,0 +1,137 @@
+import math
+
+# Side of a grid cell in PDF points (half an inch): a table cell or a line of text spans one or a few
+GRID_CELL_SIZE = 36.0
+
+
+class SpatialIndex:
+    """Per-page uniform grid over the bounds of hierarchy nodes.
+
+    Every node with ``page`` and ``bounds`` (a tree built with ``keep_layout``) is
+    registered in the grid cells its box overlaps, so a box query only looks at the
+    nodes in the cells the box covers instead of walking the tree. Results come back in
+    document order (the order nodes were added) unless stated otherwise.
+
+    Bounds are PDF points with the origin at the bottom left: ``[x0, y0, x1, y1]``.
+    Build it while parsing (``parse_hierarchy(..., keep_layout=True, spatial_index=index)``)
+    or afterwards from a tree with ``from_tree``.
+    """
+
+    def __init__(self, page_sizes=None, cell_size=GRID_CELL_SIZE):
+        self.page_sizes = page_sizes or []
+        self.cell_size = cell_size
+        self.nodes = []
+        self.boxes = []
+        self._grids = {}
+        self._ids = {}
+
+    @classmethod
+    def from_tree(cls, root, cell_size=GRID_CELL_SIZE):
+        index = cls(root.get("pages"), cell_size)
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            index.add(node)
+            stack.extend(reversed(node.get("children", [])))
+        return index
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def _cells(self, x0, y0, x1, y1):
+        size = self.cell_size
+        for col in range(math.floor(x0 / size), math.floor(x1 / size) + 1):
+            for row in range(math.floor(y0 / size), math.floor(y1 / size) + 1):
+                yield col, row
+
+    def add(self, node):
+        """Register a node; nodes without page or bounds are ignored. Returns whether it was added."""
+        page, bounds = node.get("page"), node.get("bounds")
+        if page is None or not bounds:
+            return False
+        entry = len(self.nodes)
+        x0, y0, x1, y1 = bounds
+        self.nodes.append(node)
+        self.boxes.append((page, x0, y0, x1, y1))
+        self._ids[id(node)] = entry
+        grid = self._grids.setdefault(page, {})
+        for cell in self._cells(x0, y0, x1, y1):
+            grid.setdefault(cell, []).append(entry)
+        return True
+
+    def pages(self):
+        return sorted(self._grids)
+
+    def _candidates(self, page, x0, y0, x1, y1):
+        grid = self._grids.get(page)
+        if not grid:
+            return []
+        found = set()
+        for cell in self._cells(x0, y0, x1, y1):
+            found.update(grid.get(cell, ()))
+        return sorted(found)
+
+    def query(self, page, box, contained=False, names=None):
+        """Nodes on a 0-based page whose bounds intersect ``box`` (lie inside it with ``contained``).
+
+        ``names`` keeps only nodes whose name starts with one of these prefixes (e.g. ("TD", "TH")).
+        """
+        qx0, qy0, qx1, qy1 = box
+        result = []
+        for entry in self._candidates(page, qx0, qy0, qx1, qy1):
+            _, x0, y0, x1, y1 = self.boxes[entry]
+            if contained:
+                hit = qx0 <= x0 and x1 <= qx1 and qy0 <= y0 and y1 <= qy1
+            else:
+                hit = x0 <= qx1 and qx0 <= x1 and y0 <= qy1 and qy0 <= y1
+            if hit and (names is None or self.nodes[entry].get("name", "").startswith(names)):
+                result.append(self.nodes[entry])
+        return result
+
+    def inside(self, node, names=None, tolerance=0.5):
+        """Other nodes lying inside a node's box on its page, e.g. all text inside a table."""
+        if not node.get("bounds") or node.get("page") is None:
+            return []
+        x0, y0, x1, y1 = node["bounds"]
+        box = (x0 - tolerance, y0 - tolerance, x1 + tolerance, y1 + tolerance)
+        return [other for other in self.query(node["page"], box, contained=True, names=names) if other is not node]
+
+    def in_band(self, top=None, bottom=None, names=None):
+        """Nodes lying entirely in the top ``top`` and/or bottom ``bottom`` fraction of their page.
+
+        Needs the page sizes (the root's ``pages``); pages without a size are skipped.
+        """
+        result = []
+        for page in self.pages():
+            if page >= len(self.page_sizes) or not self.page_sizes[page]:
+                continue
+            width, height = self.page_sizes[page]
+            if top:
+                result.extend(self.query(page, (0, height * (1 - top), width, height), contained=True, names=names))
+            if bottom:
+                result.extend(self.query(page, (0, 0, width, height * bottom), contained=True, names=names))
+        return sorted(result, key=lambda node: self._ids[id(node)])
+
+    def aligned(self, node, below=True, names=None, tolerance=1.0):
+        """Nodes on the same page whose horizontal centre falls within this node's column.
+
+        With ``below`` only nodes under it are returned (e.g. the cells under a visit
+        header cell). Sorted top to bottom, then left to right.
+        """
+        if not node.get("bounds") or node.get("page") is None:
+            return []
+        x0, y0, x1, y1 = node["bounds"]
+        page = node["page"]
+        if page < len(self.page_sizes) and self.page_sizes[page]:
+            height = self.page_sizes[page][1]
+        else:
+            height = max((box[4] for box in self.boxes if box[0] == page), default=y1)
+        box = (x0 - tolerance, 0, x1 + tolerance, y0 + tolerance if below else height)
+        result = []
+        for other in self.query(page, box, names=names):
+            ox0, oy0, ox1, oy1 = other["bounds"]
+            centre = (ox0 + ox1) / 2
+            if other is not node and x0 - tolerance <= centre <= x1 + tolerance:
+                if not below or oy1 <= y0 + tolerance:
+                    result.append(other)
+        return sorted(result, key=lambda other: (-other["bounds"][3], other["bounds"][0]))
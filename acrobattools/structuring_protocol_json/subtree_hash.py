@@ -0,0 +1,199 @@
+import difflib
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+HASH_KEY = "hash"
+DIGEST_SIZE = 16
+# "Table[4]" -> "Table": the sibling index shifts whenever something is inserted before a node
+SIBLING_INDEX_PATTERN = re.compile(r"\[\d+\]$")
+
+SubtreeChange = namedtuple("SubtreeChange", ["kind", "old", "new"])
+SubtreeChange.__doc__ = """One difference between two hierarchies: ``kind`` is "added", "removed" or
+"changed"; ``old``/``new`` are the node in each version (None on the side where it is missing)."""
+
+
+def element_type(node):
+    name = node.get("name", "")
+    return SIBLING_INDEX_PATTERN.sub("", name) if isinstance(name, str) else ""
+
+
+def _digest(node, child_hashes):
+    text = node.get("text", "")
+    if not isinstance(text, str):
+        text = json.dumps(text, sort_keys=True)
+    h = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for part in (element_type(node), text):
+        data = part.encode("utf-8")
+        h.update(len(data).to_bytes(8, "little"))
+        h.update(data)
+    for child_hash in child_hashes:
+        h.update(bytes.fromhex(child_hash))
+    return h.hexdigest()
+
+
+def subtree_hashes(root, store=False):
+    """Merkle hash of every subtree, as {id(node): hex digest}.
+
+    A node's hash covers its element type (the name without the sibling index), its text
+    and the hashes of its children in order; paths, layout and other keys are left out,
+    so a table that only moved keeps its hash. With ``store`` the hash is also written
+    to each node under ``"hash"`` (what ``run_hierarchy(..., hashes=True)`` saves).
+    """
+    hashes = {}
+    stack = [(root, False)]
+    while stack:
+        node, children_done = stack.pop()
+        children = [child for child in node.get("children", []) if isinstance(child, dict)]
+        if not children_done:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+        digest = _digest(node, [hashes[id(child)] for child in children])
+        hashes[id(node)] = digest
+        if store:
+            node[HASH_KEY] = digest
+    return hashes
+
+
+def hash_of(node, hashes=None):
+    """A node's subtree hash: from ``hashes`` (subtree_hashes output), else the stored one, else computed."""
+    if hashes is not None and id(node) in hashes:
+        return hashes[id(node)]
+    if isinstance(node.get(HASH_KEY), str):
+        return node[HASH_KEY]
+    return subtree_hashes(node)[id(node)]
+
+
+def _hashes_for(root):
+    # Hashes saved at build time are trusted; a tree without them is hashed now
+    return None if isinstance(root.get(HASH_KEY), str) else subtree_hashes(root)
+
+
+def _same_unit(old, new, old_hashes, new_hashes):
+    """Whether two unequal subtrees are versions of the same unit (see diff_hierarchies)."""
+    if element_type(old) != element_type(new):
+        return False
+    old_children = [hash_of(child, old_hashes) for child in old.get("children", []) if isinstance(child, dict)]
+    new_children = [hash_of(child, new_hashes) for child in new.get("children", []) if isinstance(child, dict)]
+    if not old_children and not new_children:
+        return True
+    return not set(old_children).isdisjoint(new_children)
+
+
+def diff_hierarchies(old_root, new_root):
+    """List the added, removed and changed subtrees between two versions of a hierarchy.
+
+    Walks down from the roots only where hashes differ. The children of a changed node
+    are aligned on their hashes (difflib on the child hash sequences); in the unmatched
+    stretches, an old and a new child are paired as "changed" (and compared further) when
+    they have the same element type and either share an unchanged child or are both
+    leaves; the rest are "removed"/"added". A changed node is listed before the changes
+    inside it, in document order.
+    """
+    old_hashes, new_hashes = _hashes_for(old_root), _hashes_for(new_root)
+    changes = []
+    stack = [(old_root, new_root)]
+    while stack:
+        old, new = stack.pop()
+        # Added and removed subtrees are reported whole, without descending into them
+        if old is None or new is None:
+            changes.append(SubtreeChange("added" if old is None else "removed", old, new))
+            continue
+        if hash_of(old, old_hashes) == hash_of(new, new_hashes):
+            continue
+        changes.append(SubtreeChange("changed", old, new))
+        old_children = [child for child in old.get("children", []) if isinstance(child, dict)]
+        new_children = [child for child in new.get("children", []) if isinstance(child, dict)]
+        matcher = difflib.SequenceMatcher(None, [hash_of(child, old_hashes) for child in old_children],
+                                          [hash_of(child, new_hashes) for child in new_children], autojunk=False)
+        nested = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == "equal":
+                continue
+            unmatched_new = list(new_children[j1:j2])
+            for old_child in old_children[i1:i2]:
+                partner = next((child for child in unmatched_new
+                                if _same_unit(old_child, child, old_hashes, new_hashes)), None)
+                if partner is None:
+                    nested.append((old_child, None))
+                else:
+                    unmatched_new.remove(partner)
+                    nested.append((old_child, partner))
+            nested.extend((None, new_child) for new_child in unmatched_new)
+        stack.extend(reversed(nested))
+    return changes
+
+
+def changed_units(old_root, new_root, prefixes=("H1", "Table")):
+    """The nodes of the new version that need reprocessing: added or changed subtrees
+    whose name starts with one of ``prefixes`` (H1 sections and tables by default)."""
+    return [change.new for change in diff_hierarchies(old_root, new_root)
+            if change.new is not None and change.new.get("name", "").startswith(prefixes)]
+
+
+class ResultCache:
+    """Stage results keyed by subtree hash, kept in a JSON file between runs.
+
+    ``get``/``put`` take a key built from the hash of the input subtree (plus whatever
+    else the result depends on); ``save`` writes the file atomically. Results must be
+    JSON-serializable. ``hits``/``misses`` count lookups since the cache was opened.
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+        if file_path and os.path.exists(file_path):
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    self.results = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"Ignoring unreadable result cache {file_path}: {e}")
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def get(self, key, default=None):
+        if key in self.results:
+            self.hits += 1
+            return self.results[key]
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        self.results[key] = value
+
+    def save(self):
+        """Write the cache file; returns True on success, False (after logging) otherwise."""
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.results, f)
+            os.replace(temp_path, self.file_path)
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"Could not save result cache {self.file_path}: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return False
+
+
+if __name__ == "__main__":
+    # python subtree_hash.py old_hierarchy.json new_hierarchy.json
+    from compact_tree import load_hierarchy
+
+    old_tree, new_tree = load_hierarchy(sys.argv[1]), load_hierarchy(sys.argv[2])
+    for change in diff_hierarchies(old_tree, new_tree):
+        node = change.new if change.new is not None else change.old
+        if node.get("name", "").startswith(("H1", "Table")):
+            print(f"{change.kind:<8} {node.get('path', node.get('name', ''))}")
@@ -0,0 +1,187 @@
+import io
+import json
+import os
+import re
+import zipfile
+
+from json_struct import load_structured_data
+
+GRID_CACHE_SUFFIX = ".grid.json"
+CARRIAGE_RETURN_ESCAPE = "_x000D_"
+
+
+def clean_cell(value):
+    """Cell value as text: openpyxl's escaped carriage returns and runs of whitespace become one space."""
+    if value is None:
+        return ""
+    text = str(value).replace(CARRIAGE_RETURN_ESCAPE, " ")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def drop_empty_columns(rows):
+    """Remove columns that are empty in every row (Adobe adds them for ruling lines between cells)."""
+    width = max((len(row) for row in rows), default=0)
+    keep = [col for col in range(width) if any(col < len(row) and row[col] for row in rows)]
+    return [[row[col] if col < len(row) else "" for col in keep] for row in rows]
+
+
+def build_table_index(elements):
+    """Map every table rendition (``tables/fileoutpartN.xlsx``) to the Table element that owns it."""
+    index = []
+    for elem in elements:
+        for file_path in elem.get("filePaths") or []:
+            if not file_path.lower().endswith(".xlsx"):
+                continue
+            attributes = elem.get("attributes") or {}
+            index.append({
+                "file_path": file_path,
+                "table_path": elem.get("Path"),
+                "page": elem.get("Page"),
+                "bounds": elem.get("Bounds") or attributes.get("BBox"),
+                "num_rows": attributes.get("NumRow"),
+                "num_cols": attributes.get("NumCol"),
+            })
+    return index
+
+
+class TableStore:
+    """Page-indexed access to the xlsx table renditions of one extraction.
+
+    The index (rendition -> page, bounds, owning ``Table`` path) is built from the
+    structuredData elements up front, but a workbook is only opened the first time its
+    grid is requested, in openpyxl's read-only streaming mode. Parsed grids are written
+    as columnar JSON (``fileoutpartN.grid.json``, one list per column) next to the
+    renditions and reused while the source is unchanged, so later runs skip openpyxl.
+
+    Renditions are read from the Adobe result ZIP when ``structured_data`` is one, and
+    otherwise from ``tables_dir`` (e.g. ``tables_protocol/``), which holds the files of
+    the ZIP's ``tables/`` folder.
+    """
+
+    def __init__(self, structured_data, tables_dir=None, cache_dir=None):
+        """
+        Args:
+            structured_data (str): structuredData.json or the extraction ZIP.
+            tables_dir (str, optional): Folder of the renditions for a plain .json source;
+                defaults to ``tables/`` next to it.
+            cache_dir (str, optional): Where grid caches go; defaults to ``tables_dir``, or
+                ``<zip name>_tables/`` for a ZIP source.
+        """
+        self.source = structured_data
+        self.is_zip = zipfile.is_zipfile(structured_data)
+        base_dir = os.path.dirname(os.path.abspath(structured_data))
+        if self.is_zip:
+            self.tables_dir = None
+            self.cache_dir = cache_dir or os.path.splitext(os.path.abspath(structured_data))[0] + "_tables"
+        else:
+            self.tables_dir = tables_dir or os.path.join(base_dir, "tables")
+            self.cache_dir = cache_dir or self.tables_dir
+
+        self.entries = build_table_index(load_structured_data(structured_data).get("elements", []))
+        self.by_file = {entry["file_path"]: entry for entry in self.entries}
+        self.by_table = {}
+        self.by_page = {}
+        for entry in self.entries:
+            self.by_table.setdefault(entry["table_path"], []).append(entry)
+            self.by_page.setdefault(entry["page"], []).append(entry)
+        self._grids = {}
+        self.workbooks_opened = 0
+
+    def tables_on_page(self, page):
+        """Index entries of the tables on a 0-based page."""
+        return list(self.by_page.get(page, []))
+
+    def entries_for_table(self, table_path):
+        """Index entries of a Table element (several when a table was stitched from page parts)."""
+        return list(self.by_table.get(table_path, []))
+
+    def _source_signature(self, file_path):
+        if self.is_zip:
+            with zipfile.ZipFile(self.source) as archive:
+                info = archive.getinfo(file_path)
+            return f"{info.CRC}:{info.file_size}"
+        stat = os.stat(self._local_path(file_path))
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _local_path(self, file_path):
+        return os.path.join(self.tables_dir, os.path.basename(file_path))
+
+    def _cache_path(self, file_path):
+        name = os.path.splitext(os.path.basename(file_path))[0]
+        return os.path.join(self.cache_dir, name + GRID_CACHE_SUFFIX)
+
+    def _read_workbook(self, file_path):
+        from openpyxl import load_workbook
+
+        if self.is_zip:
+            with zipfile.ZipFile(self.source) as archive:
+                handle = io.BytesIO(archive.read(file_path))
+        else:
+            handle = self._local_path(file_path)
+        workbook = load_workbook(handle, read_only=True, data_only=True)
+        self.workbooks_opened += 1
+        try:
+            rows = [[clean_cell(value) for value in row] for row in workbook.active.iter_rows(values_only=True)]
+        finally:
+            workbook.close()
+        width = max((len(row) for row in rows), default=0)
+        return [row + [""] * (width - len(row)) for row in rows]
+
+    def grid(self, file_path):
+        """Rows of one rendition as lists of cell strings, or None if the file is missing."""
+        if file_path in self._grids:
+            return self._grids[file_path]
+
+        try:
+            signature = self._source_signature(file_path)
+        except (KeyError, FileNotFoundError):
+            self._grids[file_path] = None
+            return None
+
+        cache_path = self._cache_path(file_path)
+        rows = None
+        if os.path.exists(cache_path):
+            with open(cache_path, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            if cached.get("source") == signature:
+                rows = [list(row) for row in zip(*cached["columns"])] if cached["columns"] else \
+                    [[] for _ in range(cached["num_rows"])]
+
+        if rows is None:
+            rows = self._read_workbook(file_path)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            columns = [list(column) for column in zip(*rows)]
+            tmp_path = cache_path + ".part"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"source": signature, "num_rows": len(rows), "columns": columns}, f, ensure_ascii=False)
+            os.replace(tmp_path, cache_path)
+
+        self._grids[file_path] = rows
+        return rows
+
+    def table_grid(self, table_path, compact=False):
+        """Rows of all renditions of a Table element, or None if it has none on disk.
+
+        With ``compact``, all-empty columns are dropped from each rendition, which lines
+        the columns up with the TD cells of the hierarchy's TR nodes.
+        """
+        grids = [self.grid(entry["file_path"]) for entry in self.entries_for_table(table_path)]
+        if not grids or any(grid is None for grid in grids):
+            return None
+        if compact:
+            grids = [drop_empty_columns(grid) for grid in grids]
+        return [row for grid in grids for row in grid]
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    input_file = sys.argv[1] if len(sys.argv) > 1 else "texttablestructured_protocol.json"
+    tables_dir = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                                    "..", "tables_protocol")
+    store = TableStore(input_file, tables_dir=tables_dir)
+    started = time.perf_counter()
+    total_rows = sum(len(store.grid(entry["file_path"]) or []) for entry in store.entries)
+    print(f"✅ {len(store.entries)} renditions, {total_rows} rows, {store.workbooks_opened} workbooks opened "
+          f"in {time.perf_counter() - started:.2f}s")
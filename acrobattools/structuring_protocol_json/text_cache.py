@@ -0,0 +1,121 @@
+from tree_walk import child_nodes, first_text, subtree_text
+
+# Aggregated texts of hierarchy nodes, each computed once per node in a post-order pass
+# and read back instead of re-walking the subtree. The SoA scripts' parse_protocol_schedule
+# makes one per call and passes it down to get_node_text; the forms scripts keep walking,
+# which measured faster there (bench_text_cache).
+
+
+def _subtree_text(node, child_texts):
+    # tree_walk.subtree_text: own text then the children's, newlines to spaces, stripped per level
+    text = node.get("text", "") or ""
+    for child_text in child_texts:
+        text += " " + child_text
+    return text.replace('\n', ' ').replace('\r', ' ').strip()
+
+
+def _first_text(node, child_texts):
+    # tree_walk.first_text: own stripped text, else the first child subtree that has one
+    text = (node.get("text") or "").strip()
+    if text:
+        return text
+    return next((child_text for child_text in child_texts if child_text), "")
+
+
+def _collected_text(node, child_texts):
+    # Own stripped text and the non-empty child texts, joined by single spaces
+    parts = [node.get("text").strip()] if node.get("text") else []
+    parts.extend(child_text for child_text in child_texts if child_text)
+    return " ".join(parts)
+
+
+class SubtreeTextCache:
+    """Subtree texts of the nodes of loaded hierarchy trees.
+
+    The first lookup of a node runs one post-order pass over its subtree and stores the
+    text of every node in it, reusing whatever is already stored, so a text is built
+    from its children's texts instead of from the whole subtree again. Entries keep the
+    node they belong to and are only used for that very object.
+
+    Code that changes a tree after its texts were read (``merge_broken_tables`` moving
+    rows between tables) must call ``invalidate`` on every node whose children it changed.
+    """
+
+    KINDS = {"subtree": _subtree_text, "first": _first_text, "collected": _collected_text}
+
+    def __init__(self):
+        self._texts = {kind: {} for kind in self.KINDS}  # kind -> id(node) -> (node, text)
+        self._parents = {}  # id(node) -> parents seen in a pass (a moved row can have two)
+
+    def _cached(self, texts, node):
+        entry = texts.get(id(node))
+        return entry is not None and entry[0] is node
+
+    def build(self, root, kind="subtree"):
+        """Compute and store ``kind`` texts for every node under ``root`` that lacks one."""
+        texts, combine, parents = self._texts[kind], self.KINDS[kind], self._parents
+        stack = [(root, None)]
+        while stack:
+            node, children = stack.pop()
+            if children is None:
+                entry = texts.get(id(node))
+                if entry is not None and entry[0] is node:
+                    continue
+                children = child_nodes(node)
+                stack.append((node, children))
+                stack.extend((child, None) for child in reversed(children))
+                continue
+            for child in children:
+                parents.setdefault(id(child), []).append(node)
+            texts[id(node)] = (node, combine(node, [texts[id(child)][1] for child in children]))
+
+    def text(self, node, kind="subtree"):
+        texts = self._texts[kind]
+        entry = texts.get(id(node))
+        if entry is None or entry[0] is not node:
+            self.build(node, kind)
+            entry = texts[id(node)]
+        return entry[1]
+
+    def subtree_text(self, node):
+        """``tree_walk.subtree_text`` of a node, from the cache."""
+        if not isinstance(node, dict):
+            return subtree_text(node)
+        return self.text(node, "subtree")
+
+    def first_text(self, node):
+        """``tree_walk.first_text`` of a node, from the cache."""
+        if not isinstance(node, dict):
+            return first_text(node)
+        # A node with text of its own needs nothing from below
+        text = (node.get("text") or "").strip()
+        return text if text else self.text(node, "first")
+
+    def collected_text(self, node):
+        """All non-empty stripped texts of a subtree in document order, joined by spaces."""
+        if not isinstance(node, dict):
+            return ""
+        return self.text(node, "collected")
+
+    def invalidate(self, node):
+        """Forget the texts of ``node`` and of every node above it, after its children changed."""
+        stack = [node]
+        seen = set()
+        while stack:
+            current = stack.pop()
+            if id(current) in seen:
+                continue
+            seen.add(id(current))
+            for texts in self._texts.values():
+                if self._cached(texts, current):
+                    del texts[id(current)]
+            stack.extend(self._parents.get(id(current), ()))
+
+    def clear(self):
+        """Drop every entry (and the references to the trees they came from)."""
+        for texts in self._texts.values():
+            texts.clear()
+        self._parents.clear()
+
+    def __len__(self):
+        return sum(len(texts) for texts in self._texts.values())
@@ -0,0 +1,249 @@
+import re
+
+# Traversal of the hierarchical document tree with an explicit stack instead of recursion:
+# no Python frame per node, and no RecursionError however deeply lists and tables are nested.
+# Nodes are the dicts parse_hierarchy produces; only dict children are visited. The root
+# may also be a list of nodes, which is walked as a sequence of roots.
+# The text joins recurse, which is several times faster than the stack on real documents,
+# and switch to the stack for whatever lies more than TEXT_RECURSION_DEPTH levels down.
+
+TEXT_RECURSION_DEPTH = 200
+
+
+def child_nodes(node):
+    children = node.get("children")
+    if not children:
+        return ()
+    return [child for child in children if isinstance(child, dict)]
+
+
+def _roots(root):
+    if isinstance(root, dict):
+        return [root]
+    if isinstance(root, list):
+        return [item for item in root if isinstance(item, dict)]
+    return []
+
+
+def iter_preorder(root, prune=None):
+    """Nodes in document order (a node before its children, children left to right).
+
+    ``prune(node)`` returning True yields the node but skips everything below it.
+    """
+    stack = _roots(root)
+    stack.reverse()
+    while stack:
+        node = stack.pop()
+        yield node
+        if prune is not None and prune(node):
+            continue
+        children = node.get("children")
+        if children:
+            for child in reversed(children):
+                if isinstance(child, dict):
+                    stack.append(child)
+
+
+def iter_postorder(root, prune=None):
+    """Nodes with every node after all of its children (children left to right).
+
+    ``prune(node)`` returning True yields the node without visiting anything below it.
+    """
+    stack = [(node, False) for node in reversed(_roots(root))]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded or (prune is not None and prune(node)):
+            yield node
+            continue
+        stack.append((node, True))
+        stack.extend((child, False) for child in reversed(child_nodes(node)))
+
+
+def iter_with_ancestry(root, prune=None):
+    """``(node, ancestry, depth)`` in document order; ``ancestry`` is the list of nodes from the
+    root down to and including ``node`` (a new list per node), ``depth`` is 0 for the root."""
+    stack = [(node, [node]) for node in reversed(_roots(root))]
+    while stack:
+        node, ancestry = stack.pop()
+        yield node, ancestry, len(ancestry) - 1
+        if prune is not None and prune(node):
+            continue
+        stack.extend((child, ancestry + [child]) for child in reversed(child_nodes(node)))
+
+
+def fold_postorder(root, combine):
+    """Bottom-up value of a tree: ``combine(node, child_values)`` for every node, children first.
+
+    Returns the root's value (None for a root that is not a dict).
+    """
+    if not isinstance(root, dict):
+        return None
+    values = []  # values of finished children, consumed by their parent
+    stack = [(root, None)]
+    while stack:
+        node, child_count = stack.pop()
+        if child_count is None:
+            children = child_nodes(node)
+            stack.append((node, len(children)))
+            stack.extend((child, None) for child in reversed(children))
+            continue
+        if child_count:
+            child_values = values[-child_count:]
+            del values[-child_count:]
+        else:
+            child_values = []
+        values.append(combine(node, child_values))
+    return values[0]
+
+
+class Visitor:
+    """Callbacks for ``walk_visitors``; subclasses override the ones they need.
+
+    ``enter`` is called in document order, ``leave`` once everything below the node has
+    been visited. Both get the node and the ``WalkState`` describing where it is.
+    """
+
+    def enter(self, node, walk):
+        pass
+
+    def leave(self, node, walk):
+        pass
+
+
+class WalkState:
+    """Position of the current node in a ``walk_visitors`` pass.
+
+    ``ancestors``: the nodes from the root down to the parent (shared, do not keep it);
+    ``siblings``: the parent's children list (None for a root) and ``index`` the node's
+    position in it; ``depth``: 0 for a root; ``position``: the node's pre-order number.
+    """
+
+    __slots__ = ("ancestors", "siblings", "index", "depth", "position")
+
+    def __init__(self):
+        self.ancestors = []
+        self.siblings = None
+        self.index = 0
+        self.depth = 0
+        self.position = 0
+
+
+def walk_visitors(root, visitors):
+    """Run several visitors over the tree in a single depth-first pass.
+
+    For each node every visitor's ``enter`` is called (in the order given) before the
+    children are visited, and every ``leave`` after. Returns the number of nodes visited.
+    """
+    enters = [visitor.enter for visitor in visitors]
+    leaves = [visitor.leave for visitor in visitors]
+    walk = WalkState()
+    ancestors = walk.ancestors
+    # (node, siblings, index, position): position is None until the node has been entered
+    stack = [(node, None, index, None) for index, node in reversed(list(enumerate(_roots(root))))]
+    count = 0
+    while stack:
+        node, siblings, index, position = stack.pop()
+        walk.siblings, walk.index = siblings, index
+        if position is not None:
+            ancestors.pop()
+            walk.depth = len(ancestors)
+            walk.position = position
+            for leave in leaves:
+                leave(node, walk)
+            continue
+        walk.depth = len(ancestors)
+        walk.position = count
+        for enter in enters:
+            enter(node, walk)
+        stack.append((node, siblings, index, count))
+        count += 1
+        ancestors.append(node)
+        children = node.get("children")
+        if children:
+            for child_index in range(len(children) - 1, -1, -1):
+                child = children[child_index]
+                if isinstance(child, dict):
+                    stack.append((child, children, child_index, None))
+    return count
+
+
+def find_all(root, predicate, prune=None):
+    """Every node (document order) for which ``predicate(node)`` is true."""
+    return [node for node in iter_preorder(root, prune) if predicate(node)]
+
+
+def find_first(root, predicate, prune=None):
+    """The first node in document order for which ``predicate(node)`` is true, or None."""
+    for node in iter_preorder(root, prune):
+        if predicate(node):
+            return node
+    return None
+
+
+def find_by_name_prefix(root, name_prefix):
+    """Nodes whose name starts with ``name_prefix``, nested matches included, in document order."""
+    return [node for node in iter_preorder(root) if node.get("name", "").startswith(name_prefix)]
+
+
+def find_by_name_pattern(root, pattern):
+    """Nodes whose name matches ``pattern`` (``re.search``), in document order."""
+    search = re.compile(pattern).search
+    return [node for node in iter_preorder(root) if search(node.get("name", ""))]
+
+
+def _joined_text(node, child_texts):
+    text = node.get("text", "") or ""
+    for child_text in child_texts:
+        text += " " + child_text
+    return text.replace('\n', ' ').replace('\r', ' ').strip()
+
+
+def _subtree_text(node, depth):
+    if depth >= TEXT_RECURSION_DEPTH:
+        return fold_postorder(node, _joined_text)
+    text = node.get("text", "") or ""
+    children = node.get("children")
+    if children:
+        for child in children:
+            if isinstance(child, dict):
+                text += " " + _subtree_text(child, depth + 1)
+    return text.replace('\n', ' ').replace('\r', ' ').strip()
+
+
+def subtree_text(node):
+    """The text of a node and all its descendants: each node's text followed by its children's,
+    separated by spaces, with newlines turned into spaces and every level stripped."""
+    if not isinstance(node, dict):
+        return ""
+    return _subtree_text(node, 0)
+
+
+def _first_text(node, depth):
+    if depth >= TEXT_RECURSION_DEPTH:
+        for current in iter_preorder(node):
+            text = (current.get("text") or "").strip()
+            if text:
+                return text
+        return ""
+    text = (node.get("text") or "").strip()
+    if text:
+        return text
+    children = node.get("children")
+    if children:
+        for child in children:
+            if isinstance(child, dict):
+                text = _first_text(child, depth + 1)
+                if text:
+                    return text
+    return ""
+
+
+def first_text(node):
+    """The first non-empty (stripped) text in the subtree, in document order, or ""."""
+    if isinstance(node, dict):
+        return _first_text(node, 0)
+    for root in _roots(node):
+        text = _first_text(root, 0)
+        if text:
+            return text
+    return ""
@@ -52,23 +52,20 @@ import json
 import csv
 import re
 import pandas as pd
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import child_nodes, find_by_name_pattern, first_text, iter_preorder
+from subtree_hash import ResultCache, hash_of, subtree_hashes
+from page_geometry import PageGeometry
 
 
 def get_text(node):
     """
-    Extract text from a node safely and recursively.
-    This can find text nested inside other nodes (e.g., P -> StyleSpan).
+    Extract text from a node safely: its own text, or the first text nested inside it
+    (e.g., P -> StyleSpan), in document order.
     """
-    if not isinstance(node, dict):
-        return ""
-    text = (node.get("text") or "").strip()
-    if text:
-        return text
-    for child in node.get("children", []):
-        text = get_text(child)
-        if text:
-            return text
-    return ""
+    return first_text(node)
 
 
 
@@ -161,9 +158,10 @@ def extract_forms_cleaned(data):
         if not is_valid_form_label(h1_text):
             h1_text = "Unknown Section"
 
-        def find_forms_in_node(node, current_label=None):
-            if not isinstance(node, dict):
-                return
+        # Depth-first with an explicit stack; each entry carries the label inherited from the H2 above it
+        stack = [(h1_node, None)]
+        while stack:
+            node, current_label = stack.pop()
             node_name, node_text = node.get("name", ""), get_text(node)
 
             if node_name.startswith("H2") and is_valid_form_label(node_text) and not is_valid_form_name(node_text):
@@ -182,33 +180,17 @@ def extract_forms_cleaned(data):
                     })
                     seen_forms.add(form_key)
 
-            for child in node.get("children", []):
-                find_forms_in_node(child, current_label)
-
-        find_forms_in_node(h1_node, None)
+            stack.extend((child, current_label) for child in reversed(child_nodes(node)))
 
-    def find_h1_sections(node):
-        if not isinstance(node, dict):
-            return
+    for node in iter_preorder(data):
         if node.get("name", "").startswith("H1"):
             process_h1_section(node)
-        for child in node.get("children", []):
-            find_h1_sections(child)
-
-    find_h1_sections(data)
     return results
 
 
 def find_nodes_by_name_pattern(node, pattern):
-    """Find all nodes matching a name pattern recursively."""
-    if not isinstance(node, dict):
-        return []
-    matches = []
-    if re.search(pattern, node.get("name", "")):
-        matches.append(node)
-    for child in node.get("children", []):
-        matches.extend(find_nodes_by_name_pattern(child, pattern))
-    return matches
+    """Find all nodes matching a name pattern, in document order."""
+    return find_by_name_pattern(node, pattern)
 
 
 # ==============================================================================
@@ -217,15 +199,21 @@ def find_nodes_by_name_pattern(node, pattern):
 
 # ============== NEW HELPER FUNCTIONS - ADD THESE ==================
 
-def is_metadata_table(table_node):
+def is_metadata_table(table_node, geometry=None):
     """
     🔥 FIXED: Detect and skip metadata/header tables containing document information.
     Uses internal recursive text collection to avoid modifying get_text() used elsewhere.
     These tables typically contain: company name, Trial ID, Date, Version, Page numbers, etc.
+    With a PageGeometry (hierarchy built with layout), a table with bounds that sits in the
+    page header or footer area is metadata; any other table is judged by its text.
     """
     if not isinstance(table_node, dict):
         return False
 
+    if geometry is not None:
+        if geometry.is_header_or_footer(table_node):
+            return True
+
     # 🔥 NEW: Internal function to collect ALL text from table (not affecting get_text())
     def get_all_table_text(node):
         """
@@ -474,10 +462,11 @@ def has_option_child(node):
     return False
 
 
-def extract_items_from_form(form_node):
+def extract_items_from_form(form_node, geometry=None):
     """
     Extracts item data, handling rows with TH (question) + TD (options),
     and persistently tracking the Item Group across table breaks.
+    ``geometry`` (a PageGeometry) lets metadata tables be recognised by position.
     """
     items_data = []
     table_nodes = find_nodes_by_name_pattern(form_node, r'^Table')
@@ -487,7 +476,7 @@ def extract_items_from_form(form_node):
 
     for table in table_nodes:
         # 🔥 NEW: Skip metadata tables
-        if is_metadata_table(table):
+        if is_metadata_table(table, geometry):
             print(f"⚠️  Skipping metadata table: {table.get('name', '')}")
             continue
         tr_nodes = find_nodes_by_name_pattern(table, r'^TR')
@@ -956,14 +945,30 @@ def assign_item_order(items):
 # UPDATED MAIN PROCESSING FUNCTION WITH SIMPLE ITEM ORDER
 # ==============================================================================
 
-def process_clinical_forms(json_file_path, template_csv_path="template.xlsx", output_csv_path="Study_Specific_Form.xlsx"):
-    """Main function to process JSON and create the item-based CSV with repeating logic and item order."""
+def form_cache_key(form, geometry=None, hashes=None):
+    """Result cache key of a form's item rows: its subtree hash plus the label and name written into the rows."""
+    mode = "layout" if geometry is not None else "text"
+    return f"form:{mode}:{hash_of(form['Form_Node'], hashes)}:{form['Form Label']}:{form['Form Name']}"
+
+
+def process_clinical_forms(json_file_path, template_csv_path="template.xlsx", output_csv_path="Study_Specific_Form.xlsx",
+                           cache_file=None):
+    """Main function to process JSON and create the item-based CSV with repeating logic and item order.
+
+    With ``cache_file``, the item rows of every form are kept by the form's subtree hash, and
+    forms unchanged since an earlier run (e.g. on the previous protocol version) are not reprocessed.
+    """
     template_df = pd.read_excel(template_csv_path)
     print("✅ Template CSV loaded successfully")
 
     with open(json_file_path, "r", encoding="utf-8") as file:
         data = json.load(file)
     print("✅ JSON data loaded successfully")
+    geometry = PageGeometry.from_tree(data)
+
+    cache = ResultCache(cache_file) if cache_file else None
+    # Hashes saved with the hierarchy (run_hierarchy(..., hashes=True)) are used as they are
+    hashes = subtree_hashes(data) if cache is not None and not isinstance(data.get("hash"), str) else None
 
     extracted_forms = extract_forms_cleaned(data)
     print(f"✅ Found {len(extracted_forms)} forms to process")
@@ -972,7 +977,15 @@ def process_clinical_forms(json_file_path, template_csv_path="template.xlsx", ou
     print("\n🔄 Processing forms with item group repeating logic and sequential item order...")
 
     for form in extracted_forms:
-        items = extract_items_from_form(form['Form_Node'])
+        if cache is not None:
+            cached_rows = cache.get(form_cache_key(form, geometry, hashes))
+            if cached_rows is not None:
+                print(f"  > Form '{form['Form Name']}': unchanged, reusing {len(cached_rows)} cached item rows.")
+                all_item_rows.extend(cached_rows)
+                continue
+
+        form_rows = []
+        items = extract_items_from_form(form['Form_Node'], geometry)
         print(f"  > Form '{form['Form Name']}': Found {len(items)} unique items.")
 
         if not items:
@@ -1079,7 +1092,15 @@ def process_clinical_forms(json_file_path, template_csv_path="template.xlsx", ou
             else:
                 item_row['Unnamed: 26'] = ""
 
-            all_item_rows.append(item_row)
+            form_rows.append(item_row)
+
+        all_item_rows.extend(form_rows)
+        if cache is not None:
+            cache.put(form_cache_key(form, geometry, hashes), form_rows)
+
+    if cache is not None:
+        cache.save()
+        print(f"♻️ Forms reused from cache: {cache.hits}, processed: {cache.misses}")
 
     final_df = pd.DataFrame(all_item_rows, columns=template_df.columns)
     final_df = pd.concat([template_df, final_df], ignore_index=True)
@@ -1093,7 +1114,14 @@ if __name__ == "__main__":
 
     import sys
 
-    json_file = sys.argv[1] if len(sys.argv) > 1 else None
+    parser = argparse.ArgumentParser(description="Build the study specific form sheet from an eCRF hierarchy.")
+    parser.add_argument("json_file", nargs="?", help="Hierarchy JSON of the eCRF")
+    parser.add_argument("--cache", help="Keep item rows by form subtree hash in this file, "
+                                        "to skip forms unchanged since the last run")
+    args = parser.parse_args()
+
+    cache_file = args.cache
+    json_file = args.json_file
     if not json_file:
         print("Please provide JSON input file path as argument.")
         sys.exit(1)
@@ -1105,7 +1133,8 @@ if __name__ == "__main__":
         print("=" * 80)
         print("CLINICAL FORMS PROCESSING - WITH SEQUENTIAL ITEM ORDER (1, 2, 3...)")
         print("=" * 80)
-        process_clinical_forms(json_file, template_csv_path="template.xlsx", output_csv_path="Study_Specific_Form.xlsx")
+        process_clinical_forms(json_file, template_csv_path="template.xlsx", output_csv_path="Study_Specific_Form.xlsx",
+                               cache_file=cache_file)
         print("\n🎯 PROCESSING COMPLETE!")
         print("✅ Key features of this version:")
         print("   1. ✅ Correctly handles items in <TH> + <TD> row structures.")
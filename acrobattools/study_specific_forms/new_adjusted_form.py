@@ -2,23 +2,19 @@ import json
 import csv
 import re
 import pandas as pd
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import child_nodes, find_by_name_pattern, first_text, iter_preorder
+from page_geometry import PageGeometry
 
 
 def get_text(node):
     """
-    Extract text from a node safely and recursively.
-    This can find text nested inside other nodes (e.g., P -> StyleSpan).
+    Extract text from a node safely: its own text, or the first text nested inside it
+    (e.g., P -> StyleSpan), in document order.
     """
-    if not isinstance(node, dict):
-        return ""
-    text = (node.get("text") or "").strip()
-    if text:
-        return text
-    for child in node.get("children", []):
-        text = get_text(child)
-        if text:
-            return text
-    return ""
+    return first_text(node)
 
 
 
@@ -111,9 +107,10 @@ def extract_forms_cleaned(data):
         if not is_valid_form_label(h1_text):
             h1_text = "Unknown Section"
 
-        def find_forms_in_node(node, current_label=None):
-            if not isinstance(node, dict):
-                return
+        # Depth-first with an explicit stack; each entry carries the label inherited from the H2 above it
+        stack = [(h1_node, None)]
+        while stack:
+            node, current_label = stack.pop()
             node_name, node_text = node.get("name", ""), get_text(node)
 
             if node_name.startswith("H2") and is_valid_form_label(node_text) and not is_valid_form_name(node_text):
@@ -132,33 +129,17 @@ def extract_forms_cleaned(data):
                     })
                     seen_forms.add(form_key)
 
-            for child in node.get("children", []):
-                find_forms_in_node(child, current_label)
-
-        find_forms_in_node(h1_node, None)
+            stack.extend((child, current_label) for child in reversed(child_nodes(node)))
 
-    def find_h1_sections(node):
-        if not isinstance(node, dict):
-            return
+    for node in iter_preorder(data):
         if node.get("name", "").startswith("H1"):
             process_h1_section(node)
-        for child in node.get("children", []):
-            find_h1_sections(child)
-
-    find_h1_sections(data)
     return results
 
 
 def find_nodes_by_name_pattern(node, pattern):
-    """Find all nodes matching a name pattern recursively."""
-    if not isinstance(node, dict):
-        return []
-    matches = []
-    if re.search(pattern, node.get("name", "")):
-        matches.append(node)
-    for child in node.get("children", []):
-        matches.extend(find_nodes_by_name_pattern(child, pattern))
-    return matches
+    """Find all nodes matching a name pattern, in document order."""
+    return find_by_name_pattern(node, pattern)
 
 
 # ==============================================================================
@@ -167,15 +148,21 @@ def find_nodes_by_name_pattern(node, pattern):
 
 # ============== NEW HELPER FUNCTIONS - ADD THESE ==================
 
-def is_metadata_table(table_node):
+def is_metadata_table(table_node, geometry=None):
     """
     🔥 FIXED: Detect and skip metadata/header tables containing document information.
     Uses internal recursive text collection to avoid modifying get_text() used elsewhere.
     These tables typically contain: company name, Trial ID, Date, Version, Page numbers, etc.
+    With a PageGeometry (hierarchy built with layout), a table with bounds that sits in the
+    page header or footer area is metadata; any other table is judged by its text.
     """
     if not isinstance(table_node, dict):
         return False
 
+    if geometry is not None:
+        if geometry.is_header_or_footer(table_node):
+            return True
+
     # 🔥 NEW: Internal function to collect ALL text from table (not affecting get_text())
     def get_all_table_text(node):
         """
@@ -424,10 +411,11 @@ def has_option_child(node):
     return False
 
 
-def extract_items_from_form(form_node):
+def extract_items_from_form(form_node, geometry=None):
     """
     Extracts item data, handling rows with TH (question) + TD (options),
     and persistently tracking the Item Group across table breaks.
+    ``geometry`` (a PageGeometry) lets metadata tables be recognised by position.
     """
     items_data = []
     table_nodes = find_nodes_by_name_pattern(form_node, r'^Table')
@@ -437,7 +425,7 @@ def extract_items_from_form(form_node):
 
     for table in table_nodes:
         # 🔥 NEW: Skip metadata tables
-        if is_metadata_table(table):
+        if is_metadata_table(table, geometry):
             print(f"⚠️  Skipping metadata table: {table.get('name', '')}")
             continue
         tr_nodes = find_nodes_by_name_pattern(table, r'^TR')
@@ -914,6 +902,7 @@ def process_clinical_forms(json_file_path, template_csv_path, output_csv_path):
     with open(json_file_path, "r", encoding="utf-8") as file:
         data = json.load(file)
     print("✅ JSON data loaded successfully")
+    geometry = PageGeometry.from_tree(data)
 
     extracted_forms = extract_forms_cleaned(data)
     print(f"✅ Found {len(extracted_forms)} forms to process")
@@ -922,7 +911,7 @@ def process_clinical_forms(json_file_path, template_csv_path, output_csv_path):
     print("\n🔄 Processing forms with item group repeating logic and sequential item order...")
 
     for form in extracted_forms:
-        items = extract_items_from_form(form['Form_Node'])
+        items = extract_items_from_form(form['Form_Node'], geometry)
         print(f"  > Form '{form['Form Name']}': Found {len(items)} unique items.")
 
         if not items:
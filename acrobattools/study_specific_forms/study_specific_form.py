@@ -66,23 +66,18 @@ import json
 import csv
 import re
 import pandas as pd
+import os
+import sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "structuring_protocol_json"))
+from tree_walk import child_nodes, find_by_name_pattern, first_text, iter_preorder
 
 
 def get_text(node):
     """
-    Extract text from a node safely and recursively.
-    This can find text nested inside other nodes (e.g., P -> StyleSpan).
+    Extract text from a node safely: its own text, or the first text nested inside it
+    (e.g., P -> StyleSpan), in document order.
     """
-    if not isinstance(node, dict):
-        return ""
-    text = (node.get("text") or "").strip()
-    if text:
-        return text
-    for child in node.get("children", []):
-        text = get_text(child)
-        if text:
-            return text
-    return ""
+    return first_text(node)
 
 
 def is_valid_form_name(text):
@@ -151,8 +146,10 @@ def extract_forms_cleaned(data):
         h1_text = get_text(h1_node)
         if not is_valid_form_label(h1_text): h1_text = "Unknown Section"
 
-        def find_forms_in_node(node, current_label=None):
-            if not isinstance(node, dict): return
+        # Depth-first with an explicit stack; each entry carries the label inherited from the H2 above it
+        stack = [(h1_node, None)]
+        while stack:
+            node, current_label = stack.pop()
             node_name, node_text = node.get("name", ""), get_text(node)
             if node_name.startswith("H2") and is_valid_form_label(node_text) and not is_valid_form_name(node_text):
                 current_label = node_text
@@ -164,26 +161,16 @@ def extract_forms_cleaned(data):
                         {"Form Label": form_label, "Form Name": form_name, "H1_Text": h1_text, "Form_Node": node,
                          "Parent_H1_Node": h1_node})
                     seen_forms.add(form_key)
-            for child in node.get("children", []): find_forms_in_node(child, current_label)
-
-        find_forms_in_node(h1_node, None)
+            stack.extend((child, current_label) for child in reversed(child_nodes(node)))
 
-    def find_h1_sections(node):
-        if not isinstance(node, dict): return
+    for node in iter_preorder(data):
         if node.get("name", "").startswith("H1"): process_h1_section(node)
-        for child in node.get("children", []): find_h1_sections(child)
-
-    find_h1_sections(data)
     return results
 
 
 def find_nodes_by_name_pattern(node, pattern):
-    """Find all nodes matching a name pattern recursively."""
-    if not isinstance(node, dict): return []
-    matches = []
-    if re.search(pattern, node.get("name", "")): matches.append(node)
-    for child in node.get("children", []): matches.extend(find_nodes_by_name_pattern(child, pattern))
-    return matches
+    """Find all nodes matching a name pattern, in document order."""
+    return find_by_name_pattern(node, pattern)
 
 
 # ==============================================================================